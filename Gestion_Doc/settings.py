@@ -68,11 +68,68 @@ GCP_SERVICE_ACCOUNT_JSON = os.path.join(BASE_DIR, 'Usuario', 'service_account.js
 # Nombre de tu bucket en GCS
 GCP_BUCKET_NAME = "#"
 
+# Conexiones HTTP del cliente GCS compartido (plantillas_documentos_tecnicos.cliente_gcs)
+GCS_POOL_CONEXIONES = 32
+
+# Existencia de blobs (plantillas rotas): segundos en cache y hasta cuántas
+# rutas se preguntan una a una (HEAD) antes de listar el prefijo completo.
+# Solo se listan prefijos de al menos GCS_EXISTENCIA_MIN_NIVELES carpetas
+# (nunca el bucket entero); si el común es más corto se lista por carpeta
+GCS_EXISTENCIA_TTL_S = 60
+GCS_EXISTENCIA_MAX_HEAD = 8
+GCS_EXISTENCIA_MIN_NIVELES = 2
+
+# Operaciones masivas en GCS (mover / borrar carpetas): hilos y tamaño
+# de lote de la batch API (máximo 100)
+GCS_HILOS_OPERACIONES = 16
+GCS_LOTE_BATCH = 100
+
+# URLs firmadas del repositorio: se renuevan este margen antes de expirar
+PREVIEW_MARGEN_SEGUNDOS = 120
+
+# Descargas: se sirven por streaming en trozos de DESCARGA_CHUNK_BYTES;
+# sobre DESCARGA_MAX_BYTES_PROXY se redirige a una URL firmada corta
+DESCARGA_CHUNK_BYTES = 1024 * 1024
+DESCARGA_MAX_BYTES_PROXY = 20 * 1024 * 1024
+DESCARGA_URL_FIRMADA_SEGUNDOS = 300
+
+# Subidas: chunk de la subida resumable de GCS para archivos grandes
+# (múltiplo de 256 KiB) y timeout por request
+GCS_SUBIDA_CHUNK_BYTES = 8 * 1024 * 1024
+GCS_SUBIDA_TIMEOUT_S = 120
+
 
 # Credenciales del service account
 GOOGLE_DRIVE_SERVICE_ACCOUNT_FILE = os.path.join(BASE_DIR, 'Usuario', 'service_account.json')
 GOOGLE_DRIVE_FOLDER_ID = "#"
 
+# ------------------------------
+# Cache de estructuras de documentos (.docx)
+# ------------------------------
+ESTRUCTURA_CACHE_MAX_ITEMS = 64          # LRU en memoria por proceso
+ESTRUCTURA_CACHE_MAX_FILAS_BD = 5000     # filas en estructura_documento_cache
+ESTRUCTURA_CACHE_DIAS_BD = 30            # días sin uso antes de expulsar
+ESTRUCTURA_CACHE_TOQUE_S = 3600          # un hit actualiza ultimo_uso a lo más cada N s
+ESTRUCTURA_CACHE_PURGA_CADA_S = 3600     # purga de la tabla a lo más cada N s (0 = nunca)
+ESTRUCTURA_BACKEND_XML = "etree"         # parser de los XML grandes: "etree" | "lxml"
+VALIDACION_PLANES_MAX_ITEMS = 128        # planes de validación compilados por proceso
+VALIDACION_RQ_TTL_S = 60                 # vigencia de requerimiento → versión en memoria
+VALIDACION_LOTE_MAX_ARCHIVOS = 50        # archivos por lote (validar_lote_ajax)
+VALIDACION_LOTE_CONCURRENCIA = 4         # hilos de extracción por lote
+
+# ------------------------------
+# Pool de extracción de estructuras (procesos)
+# Opcional: cada worker web (gunicorn/uvicorn) crea EXTRACCION_PROCESOS
+# procesos propios, o sea workers × EXTRACCION_PROCESOS procesos extra.
+# Con 0 se extrae en el hilo de la request.
+# ------------------------------
+EXTRACCION_PROCESOS = 0                  # 0 = extraer en el hilo de la request
+EXTRACCION_MAX_COLA = 8                  # trabajos esperando antes de rechazar
+EXTRACCION_ESPERA_COLA_S = 30            # espera máxima por un proceso libre
+EXTRACCION_TIMEOUT_S = 60                # tiempo máximo por documento
+EXTRACCION_MAX_RSS_MB = 1024             # memoria máxima por proceso trabajador
+EXTRACCION_TRABAJOS_POR_PROCESO = 200    # reciclar el proceso tras N trabajos
+
 # Microsoft OAuth
 MICROSOFT_CLIENT_ID = "#"
 MICROSOFT_CLIENT_SECRET = "#"
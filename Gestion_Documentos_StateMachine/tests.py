@@ -1,3 +1,92 @@
-from django.test import TestCase
+import json
+import threading
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from Gestion_Documentos_StateMachine import views
+
+
+class _PlanFalso:
+    version_id = 7
+
+    def validar(self, estructura):
+        if estructura["metadata"]["plantilla"] == "malo.docx":
+            return {"status": "ERROR", "faltantes": ["X"]}
+        return {"status": "OK"}
+
+
+# ======================================================================
+# VALIDACIÓN EN LOTE (NDJSON)
+# ======================================================================
+@override_settings(VALIDACION_LOTE_CONCURRENCIA=2)
+class ValidarLoteTests(SimpleTestCase):
+
+    def _request(self, *nombres):
+        archivos = [SimpleUploadedFile(n, b"PK docx") for n in nombres]
+        request = RequestFactory().post(
+            "/documentos/validar-lote/1/", {"archivos": archivos}
+        )
+        request.user = SimpleNamespace(is_authenticated=True)
+        return request
+
+    def _validar(self, request, extraer):
+        with mock.patch.object(views, "plan_validacion_requerimiento",
+                               return_value=_PlanFalso()), \
+                mock.patch.object(views, "generar_estructura_cacheada",
+                                  side_effect=extraer):
+            response = views.validar_lote_ajax(request, 1)
+            return response, [json.loads(linea) for linea in response.streaming_content]
+
+    def test_una_linea_por_archivo(self):
+        def extraer(fuente, perfil, nombre, huellas):
+            return {"metadata": {"plantilla": nombre}}
+
+        response, lineas = self._validar(self._request("bueno.docx", "malo.docx"), extraer)
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(lineas[0], {"tipo": "inicio", "total": 2, "version_id": 7})
+        por_archivo = {l["archivo"]: l for l in lineas[1:-1]}
+        self.assertEqual(por_archivo["bueno.docx"]["status"], "OK")
+        self.assertEqual(por_archivo["malo.docx"]["diferencias"]["faltantes"], ["X"])
+        self.assertEqual(lineas[-1]["tipo"], "fin")
+        self.assertEqual((lineas[-1]["ok"], lineas[-1]["error"]), (1, 1))
+
+    def test_error_de_lectura_no_corta_el_lote(self):
+        def extraer(fuente, perfil, nombre, huellas):
+            if nombre == "roto.docx":
+                raise ValueError("no es un zip")
+            return {"metadata": {"plantilla": nombre}}
+
+        _, lineas = self._validar(self._request("roto.docx", "bueno.docx"), extraer)
+
+        por_archivo = {l["archivo"]: l for l in lineas[1:-1]}
+        self.assertEqual(por_archivo["roto.docx"]["status"], "ERROR_LECTURA")
+        self.assertIn("no es un zip", por_archivo["roto.docx"]["error"])
+        self.assertEqual(lineas[-1]["error"], 1)
+
+    def test_cada_resultado_sale_apenas_termina(self):
+        liberar_lento = threading.Event()
+
+        def extraer(fuente, perfil, nombre, huellas):
+            if nombre == "lento.docx":
+                self.assertTrue(liberar_lento.wait(5))
+            return {"metadata": {"plantilla": nombre}}
+
+        with mock.patch.object(views, "plan_validacion_requerimiento",
+                               return_value=_PlanFalso()), \
+                mock.patch.object(views, "generar_estructura_cacheada",
+                                  side_effect=extraer):
+            response = views.validar_lote_ajax(self._request("lento.docx", "rapido.docx"), 1)
+            contenido = iter(response.streaming_content)
+
+            self.assertEqual(json.loads(next(contenido))["tipo"], "inicio")
+            # El archivo lento sigue bloqueado: el rápido ya salió
+            self.assertEqual(json.loads(next(contenido))["archivo"], "rapido.docx")
+
+            liberar_lento.set()
+            self.assertEqual(json.loads(next(contenido))["archivo"], "lento.docx")
+            self.assertEqual(json.loads(next(contenido))["tipo"], "fin")
+            self.assertRaises(StopIteration, next, contenido)
@@ -20,6 +20,11 @@ urlpatterns = [
         validar_controles_doc_ajax,
         name="validar_controles_doc_ajax"),
 
+    # AJAX validación en lote (NDJSON)
+    path("documentos/validar-lote/<int:requerimiento_id>/",
+        views.validar_lote_ajax,
+        name="validar_lote_ajax"),
+
     # Descargar plantilla copiada al RQ
     path(
        "descargar-plantilla/<int:requerimiento_id>/",
@@ -3,24 +3,31 @@
 # ============================================================
 from plantillas_documentos_tecnicos.utils_documentos import (
     obtener_plantilla_usada,
-    obtener_estructura_plantilla_usada,
     extract_blob_name_from_signed_url,
 )
-import uuid
+from plantillas_documentos_tecnicos.formato_estructura import cargar_estructura_version
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
-from django.db import connection, transaction
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.db import close_old_connections, connection, transaction
 from django.contrib.auth.decorators import login_required
 from datetime import datetime, timedelta
 from django.conf import settings
 import json
 import os
 import tempfile
-from plantillas_documentos_tecnicos.leer_estructura_plantilla_word import (
-    generar_estructura
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from plantillas_documentos_tecnicos.leer_estructura_plantilla_word import MAX_BYTES_EN_MEMORIA
+from plantillas_documentos_tecnicos.cache_estructuras import generar_estructura_cacheada
+from plantillas_documentos_tecnicos.cliente_gcs import obtener_bucket
+from plantillas_documentos_tecnicos.ejecutor_extraccion import EjecutorSaturado
+from plantillas_documentos_tecnicos.subidas_gcs import SubidaGCS
+from plantillas_documentos_tecnicos.planes_validacion import (
+    PlanValidacion,
+    plan_validacion_requerimiento,
 )
-from google.cloud import storage
 
 from .state_machine import DocumentoTecnicoStateMachine
 from decimal import Decimal
@@ -33,7 +40,6 @@ import re
 from plantillas_documentos_tecnicos.leer_estructura_plantilla_word import (
     generar_estructura as extraer_controles_contenido_desde_file
 )
-from pathlib import Path
 from plantillas_documentos_tecnicos.views import comparar_estructuras
 
 
@@ -204,18 +210,20 @@ def to_json_safe(data):
 
 
 def extraer_controles_contenido_desde_gcs(gcs_path):
-    """Descarga archivo desde GCS y extrae controles con generar_estructura()."""
-    client = storage.Client()
-    bucket = client.bucket(settings.GCP_BUCKET_NAME)
+    """
+    Descarga archivo desde GCS y extrae controles con generar_estructura().
+    La descarga queda en memoria (pasa a disco solo sobre MAX_BYTES_EN_MEMORIA).
+    """
+    bucket = obtener_bucket()
     blob = bucket.blob(gcs_path)
 
-    with tempfile.NamedTemporaryFile(suffix=".docx", delete=False) as tmp:
-        blob.download_to_filename(tmp.name)
-        tmp_path = tmp.name
-
-    estructura = extraer_controles_contenido_desde_file(tmp_path)
+    with tempfile.SpooledTemporaryFile(max_size=MAX_BYTES_EN_MEMORIA) as buffer:
+        blob.download_to_file(buffer)
+        buffer.seek(0)
+        estructura = extraer_controles_contenido_desde_file(
+            buffer, nombre=os.path.basename(gcs_path)
+        )
 
-    os.remove(tmp_path)
     return estructura
 
 
@@ -242,29 +250,21 @@ def obtener_estructura_plantilla_referencia(tipo_id):
     """Obtiene la estructura JSON de plantilla_tipo_doc versión_actual."""
     with connection.cursor() as cursor:
         cursor.execute("""
-            SELECT pe.estructura_json
+            SELECT pt.version_actual_id
             FROM plantilla_tipo_doc pt
-            JOIN plantilla_estructura_version pe ON pe.id = pt.version_actual_id
             WHERE pt.tipo_documento_id = %s
         """, [tipo_id])
         row = cursor.fetchone()
 
-    if not row:
-        return None
+        if not row or not row[0]:
+            return None
 
-    estructura = row[0]
-    return json.loads(estructura) if isinstance(estructura, str) else estructura
+        return cargar_estructura_version(cursor, row[0])
 
 
 def extraer_controles_archivo_temporal(archivo_fileobj):
-    """Guarda temporalmente y extrae controles de archivo subido."""
-    with tempfile.NamedTemporaryFile(suffix=".docx", delete=False) as tmp:
-        tmp.write(archivo_fileobj.read())
-        tmp_path = tmp.name
-
-    estructura = extraer_controles_contenido_desde_file(tmp_path)
-    os.remove(tmp_path)
-    return estructura
+    """Extrae controles de archivo subido, leyéndolo desde memoria."""
+    return extraer_controles_contenido_desde_file(archivo_fileobj)
 
 
 def validar_contra_plantilla(estructura_subida, estructura_base):
@@ -274,104 +274,13 @@ def validar_contra_plantilla(estructura_subida, estructura_base):
       - tablas Word
       - excels embebidos
       - imágenes
-    Es compatible con la NUEVA estructura 2025 (filas, n_filas, n_columnas).
-    """
-
-    dif = {
-        "tablas_word": {"faltantes": [], "sobrantes": []},
-        "excels": {"faltantes": [], "sobrantes": []},
-        "imagenes": {"faltantes": [], "sobrantes": []},
-        "detalles": [],
-        "status": "OK"
-    }
-
-    # ============================================================
-    # 🔵 TABLAS WORD
-    # ============================================================
-    base_tab = {(t.get("n_filas", 0), t.get("n_columnas", 0)) for t in estructura_base.get("tablas_word", [])}
-    sub_tab  = {(t.get("n_filas", 0), t.get("n_columnas", 0)) for t in estructura_subida.get("tablas_word", [])}
-
-    dif["tablas_word"]["faltantes"] = list(base_tab - sub_tab)
-    dif["tablas_word"]["sobrantes"] = list(sub_tab - base_tab)
-
-    # ============================================================
-    # 🔵 EXCELS embebidos
-    # ============================================================
-    base_exc = {e.get("excel"): e for e in estructura_base.get("excels", [])}
-    sub_exc  = {e.get("excel"): e for e in estructura_subida.get("excels", [])}
-
-    dif["excels"]["faltantes"] = list(set(base_exc.keys()) - set(sub_exc.keys()))
-    dif["excels"]["sobrantes"] = list(set(sub_exc.keys()) - set(base_exc.keys()))
-
-    # === Comparación por Excel ===
-    for excel_name in base_exc:
-
-        if excel_name not in sub_exc:
-            continue
-
-        b = base_exc[excel_name]
-        s = sub_exc[excel_name]
-
-        # Diccionarios tabla → tabla
-        b_tab = {t.get("tabla"): t for t in b.get("tablas", [])}
-        s_tab = {t.get("tabla"): t for t in s.get("tablas", [])}
-
-        # Tablas faltantes / extra
-        for falt in (set(b_tab.keys()) - set(s_tab.keys())):
-            dif["excels"]["faltantes"].append(f"{excel_name}:{falt}")
-
-        for sob in (set(s_tab.keys()) - set(b_tab.keys())):
-            dif["excels"]["sobrantes"].append(f"{excel_name}:{sob}")
-
-        # Comparación interna de tablas
-        for tname in b_tab:
-
-            if tname not in s_tab:
-                continue
-
-            bt = b_tab[tname]
-            st = s_tab[tname]
+    Es compatible con la NUEVA estructura 2025 (filas, n_filas, n_columnas)
+    y con tablas reducidas a huellas (huellas + muestra, sin filas).
 
-            # === Nueva estructura ===
-            # columnas = primera fila
-            # registros = resto
-            bt_cols = bt.get("filas", [[]])[0] if bt.get("filas") else []
-            st_cols = st.get("filas", [[]])[0] if st.get("filas") else []
-
-            if len(bt_cols) != len(st_cols):
-                dif["detalles"].append(
-                    f"Excel {excel_name} > Tabla {tname}: distinta cantidad de columnas."
-                )
-
-            if bt.get("n_filas") != st.get("n_filas"):
-                dif["detalles"].append(
-                    f"Excel {excel_name} > Tabla {tname}: distinta cantidad de filas."
-                )
-
-    # ============================================================
-    # 🔵 IMÁGENES
-    # ============================================================
-    base_imgs = {i.get("nombre") for i in estructura_base.get("imagenes", [])}
-    sub_imgs  = {i.get("nombre") for i in estructura_subida.get("imagenes", [])}
-
-    dif["imagenes"]["faltantes"] = list(base_imgs - sub_imgs)
-    dif["imagenes"]["sobrantes"] = list(sub_imgs - base_imgs)
-
-    # ============================================================
-    # 🔵 STATUS GLOBAL
-    # ============================================================
-    if any([
-        dif["tablas_word"]["faltantes"],
-        dif["tablas_word"]["sobrantes"],
-        dif["excels"]["faltantes"],
-        dif["excels"]["sobrantes"],
-        dif["imagenes"]["faltantes"],
-        dif["imagenes"]["sobrantes"],
-        dif["detalles"],
-    ]):
-        dif["status"] = "ERROR"
-
-    return dif
+    Las vistas usan el plan compilado y cacheado de la versión
+    (plan_validacion_requerimiento); esto compila uno al vuelo.
+    """
+    return PlanValidacion(estructura_base).validar(estructura_subida)
 
 
 
@@ -385,8 +294,7 @@ def subir_archivo_version(requerimiento_id, archivo, sufijo):
     stamp = datetime.now().strftime("%Y%m%d-%H%M")
     filename = f"docs/RQ-{requerimiento_id}/RQ-{requerimiento_id}-{sufijo}-{stamp}{extension}"
 
-    client = storage.Client()
-    bucket = client.bucket(settings.GCP_BUCKET_NAME)
+    bucket = obtener_bucket()
     blob = bucket.blob(filename)
 
     blob.upload_from_file(archivo)
@@ -821,38 +729,37 @@ def detalle_documento(request, requerimiento_id):
     # ===============================
     # VALIDACIÓN ESTRUCTURAL 2025 (solo eventos con archivo)
     # ===============================
+    subida = None
     if evento in eventos_con_archivo and archivo:
         try:
-            # 1) Guardar archivo temporal
-            tmp_path = Path(tempfile.gettempdir()) / f"{uuid.uuid4()}.docx"
-            with open(tmp_path, "wb") as f:
-                for chunk in archivo.chunks():
-                    f.write(chunk)
-
-            # 2) Estructura del archivo subido
-            estructura_archivo = generar_estructura(str(tmp_path))
+            # 1) Una lectura del archivo subido: sha256 + buffer rebobinado.
+            #    El destino depende de la versión nueva: nada va a GCS
+            #    hasta confirmar la subida dentro de la transacción
+            mime_type, _ = mimetypes.guess_type(clean(archivo.name))
+            subida = SubidaGCS(content_type=mime_type, sobrescribir=False).consumir(archivo)
+
+            # 2) Estructura desde el buffer (sin volver a hashearlo)
+            estructura_archivo = generar_estructura_cacheada(
+                subida.fuente,
+                perfil="validation",
+                nombre=archivo.name,
+                huellas=True,
+                sha256=subida.sha256,
+                tamano=subida.tamano,
+            )
         except Exception as e:
             messages.error(request, f"Error al leer estructura del archivo: {e}")
-            try:
-                tmp_path.unlink(missing_ok=True)
-            except Exception:
-                pass
             return redirect("documentos:detalle_documento", requerimiento_id)
-        finally:
-            try:
-                tmp_path.unlink(missing_ok=True)
-            except Exception:
-                pass
 
-        # 3) Estructura de la plantilla usada (versión REAL del RQ)
+        # 3) Plan de validación de la plantilla usada (versión REAL del RQ)
         try:
-            estructura_plantilla, version_id = obtener_estructura_plantilla_usada(requerimiento_id)
+            plan = plan_validacion_requerimiento(requerimiento_id)
         except Exception as e:
             messages.error(request, f"⚠ No se encontró la estructura de la plantilla usada: {e}")
             return redirect("documentos:detalle_documento", requerimiento_id)
 
         # 4) Validación estructural estricta
-        dif = validar_contra_plantilla(estructura_archivo, estructura_plantilla)
+        dif = plan.validar(estructura_archivo)
 
         if dif.get("status") == "ERROR":
             messages.error(
@@ -925,8 +832,7 @@ def detalle_documento(request, requerimiento_id):
 
                     from plantillas_documentos_tecnicos.utils_documentos import inicializar_version_inicial
 
-                    storage_client = storage.Client()
-                    bucket = storage_client.bucket(settings.GCP_BUCKET_NAME)
+                    bucket = obtener_bucket()
 
                     inicializar_version_inicial(
                         cursor=cursor,
@@ -977,21 +883,10 @@ def detalle_documento(request, requerimiento_id):
                             f"RQ-{requerimiento_id}/{nueva_version}/{nombre_archivo}"
                         )
 
-                        storage_client = storage.Client()
-                        bucket = storage_client.bucket(settings.GCP_BUCKET_NAME)
-
-                        mime_type, _ = mimetypes.guess_type(nombre_archivo)
-                        blob = bucket.blob(ruta_final)
-
-                        try:
-                            archivo.file.seek(0)
-                        except Exception:
-                            pass
-
-                        blob.upload_from_file(
-                            archivo.file,
-                            content_type=mime_type or "application/octet-stream",
-                        )
+                        # Validación aprobada: recién ahora se crea el objeto
+                        with subida:
+                            subida.confirmar(ruta_final)
+                        blob = obtener_bucket().blob(ruta_final)
 
                         signed_url = blob.generate_signed_url(
                             version="v4",
@@ -1051,8 +946,7 @@ def descargar_plantilla_rq(request, requerimiento_id):
 
     ruta = row[0]
 
-    client = storage.Client()
-    bucket = client.bucket(settings.GCP_BUCKET_NAME)
+    bucket = obtener_bucket()
     blob = bucket.blob(ruta)
 
     signed_url = blob.generate_signed_url(
@@ -1128,12 +1022,10 @@ def subir_archivo_documento(request, requerimiento_id):
             f"{version_actual}/{nombre_archivo}"
         )
 
-        client = storage.Client()
-        bucket = client.bucket(settings.GCP_BUCKET_NAME)
-        blob = bucket.blob(ruta_final)
-
-        archivo.file.seek(0)
-        blob.upload_from_file(archivo.file)
+        with SubidaGCS(ruta_final, archivo.content_type) as subida:
+            subida.consumir(archivo)
+            subida.confirmar()
+        blob = obtener_bucket().blob(ruta_final)
 
         signed_url = blob.generate_signed_url(
             version="v4", expiration=timedelta(days=7)
@@ -1175,14 +1067,8 @@ def prevalidar_controles(request, requerimiento_id):
         messages.error(request, "❌ Debes seleccionar un archivo.")
         return redirect("documentos:detalle_documento", requerimiento_id=requerimiento_id)
 
-    # guardar temporalmente
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as tmp:
-        for chunk in archivo.chunks():
-            tmp.write(chunk)
-        tmp_path = tmp.name
-
-    controles_subido = set(extraer_controles_contenido_desde_file(tmp_path) or [])
-    os.unlink(tmp_path)
+    # se lee directo desde el archivo subido (sin temporal)
+    controles_subido = set(extraer_controles_contenido_desde_file(archivo) or [])
 
     # obtener plantilla RQ o versión_actual
     ruta_plantilla = None
@@ -1242,6 +1128,17 @@ def validar_controles_doc_ajax(request, requerimiento_id):
     """
     Valida el archivo subido contra la estructura EXACTA
     de la versión de plantilla usada en este requerimiento.
+
+    La lectura del .docx pasa por generar_estructura_cacheada: en el
+    pool de extracción (ejecutor_extraccion) si EXTRACCION_PROCESOS > 0,
+    si no en el hilo de la request. Pool saturado → 503.
+
+    POST "modo":
+      "completo" (defecto) → todas las diferencias (validar_contra_plantilla)
+      "estado"             → {"status", "primer_error"}: se lee el .docx
+                             solo hasta la primera diferencia
+                             (PlanValidacion.estado: memoria acotada,
+                             sin pasar por el pool)
     """
 
     if request.method != "POST":
@@ -1252,30 +1149,199 @@ def validar_controles_doc_ajax(request, requerimiento_id):
         return JsonResponse({"error": "No se recibió archivo"}, status=400)
 
     # ------------------------------------------------------------
-    # 1) Obtener estructura de la PLANTILLA USADA (desde BD)
+    # 1) Plan de validación de la PLANTILLA USADA (BD solo si no
+    #    está en memoria)
     # ------------------------------------------------------------
     try:
-        estructura_plantilla, version_id = obtener_estructura_plantilla_usada(requerimiento_id)
+        plan = plan_validacion_requerimiento(requerimiento_id)
     except Exception as e:
         return JsonResponse({"error": str(e)})
 
+    if request.POST.get("modo") == "estado":
+        try:
+            estado = plan.estado(archivo)
+        except Exception as e:
+            return JsonResponse({"error": f"Error leyendo archivo: {e}"})
+        return JsonResponse(estado)
+
     # ------------------------------------------------------------
     # 2) Generar estructura del archivo SUBIDO
     # ------------------------------------------------------------
     try:
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".docx")
-        for chunk in archivo.chunks():
-            tmp.write(chunk)
-        tmp.close()
-
-        estructura_archivo = generar_estructura(tmp.name)
+        estructura_archivo = generar_estructura_cacheada(
+            archivo, perfil="validation", huellas=True
+        )
+    except EjecutorSaturado as e:
+        return JsonResponse({"error": str(e)}, status=503)
     except Exception as e:
         return JsonResponse({"error": f"Error leyendo archivo: {e}"})
 
     # ------------------------------------------------------------
     # 3) Validación estructural
     # ------------------------------------------------------------
-    dif = validar_contra_plantilla(estructura_archivo, estructura_plantilla)
+    dif = plan.validar(estructura_archivo)
 
     return JsonResponse(dif)
 
+
+
+# ============================================================
+# 7) VALIDACIÓN EN LOTE (NDJSON)
+# ============================================================
+EXTENSIONES_LOTE = (".docx", ".docm", ".dotx")
+
+
+def _config_lote(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def _archivos_lote(request):
+    """
+    [(nombre, fuente | None, error | None)] de los archivos del POST:
+    "archivos" (varios) y/o .zip, cuyos .docx se leen a memoria.
+    Los que no se pueden validar vienen con su error.
+    """
+    max_archivos = _config_lote("VALIDACION_LOTE_MAX_ARCHIVOS", 50)
+    max_bytes = _config_lote("VALIDACION_LOTE_MAX_BYTES_ARCHIVO", MAX_BYTES_EN_MEMORIA)
+
+    salida = []
+    for archivo in request.FILES.getlist("archivos"):
+        if not archivo.name.lower().endswith(".zip"):
+            salida.append((archivo.name, archivo, None))
+            continue
+
+        try:
+            with zipfile.ZipFile(archivo) as z:
+                for info in z.infolist():
+                    nombre = info.filename
+                    base = os.path.basename(nombre)
+                    if (info.is_dir() or nombre.startswith("__MACOSX/")
+                            or base.startswith("~$")
+                            or not base.lower().endswith(EXTENSIONES_LOTE)):
+                        continue
+                    if info.file_size > max_bytes:
+                        salida.append((nombre, None, "Archivo demasiado grande."))
+                        continue
+                    salida.append((nombre, z.read(info), None))
+                    if len(salida) > max_archivos:
+                        break
+        except zipfile.BadZipFile:
+            salida.append((archivo.name, None, "ZIP inválido."))
+
+        if len(salida) > max_archivos:
+            break
+
+    return salida
+
+
+def _estructura_lote(fuente, nombre):
+    """
+    Extracción con reintentos cortos si el pool está saturado. Corre en
+    un hilo del lote: al terminar cierra su conexión a BD (el hilo no
+    pasa por request_finished).
+    """
+    intentos = _config_lote("VALIDACION_LOTE_REINTENTOS", 3)
+    try:
+        for intento in range(intentos + 1):
+            try:
+                return generar_estructura_cacheada(
+                    fuente, perfil="validation", nombre=os.path.basename(nombre), huellas=True
+                )
+            except EjecutorSaturado:
+                if intento == intentos:
+                    raise
+                time.sleep(0.5 * (intento + 1))
+    finally:
+        close_old_connections()
+
+
+@login_required
+def validar_lote_ajax(request, requerimiento_id):
+    """
+    Valida varios archivos (campo "archivos": .docx sueltos y/o .zip)
+    contra la plantilla usada en el RQ. Un solo plan de validación para
+    todo el lote; los archivos se extraen en paralelo en un pool de
+    VALIDACION_LOTE_CONCURRENCIA hilos y cada resultado sale apenas
+    está listo, como una línea JSON (application/x-ndjson):
+
+      {"tipo": "inicio", "total": n, "version_id": ...}
+      {"tipo": "archivo", "archivo": ..., "status": "OK" | "ERROR", "diferencias": {...}, "ms": ...}
+      {"tipo": "archivo", "archivo": ..., "status": "ERROR_LECTURA", "error": ...}
+      {"tipo": "fin", "total": n, "ok": n, "error": n, "ms": ...}
+    """
+
+    if request.method != "POST":
+        return JsonResponse({"error": "Método no permitido"}, status=405)
+
+    try:
+        archivos = _archivos_lote(request)
+    except Exception as e:
+        return JsonResponse({"error": f"Error leyendo archivos: {e}"}, status=400)
+
+    if not archivos:
+        return JsonResponse({"error": "No se recibieron archivos .docx"}, status=400)
+
+    max_archivos = _config_lote("VALIDACION_LOTE_MAX_ARCHIVOS", 50)
+    if len(archivos) > max_archivos:
+        return JsonResponse(
+            {"error": f"Máximo {max_archivos} archivos por lote."}, status=400
+        )
+
+    try:
+        plan = plan_validacion_requerimiento(requerimiento_id)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=404)
+
+    def validar_uno(nombre, fuente, error):
+        if error:
+            return {"tipo": "archivo", "archivo": nombre, "status": "ERROR_LECTURA", "error": error}
+
+        inicio = time.perf_counter()
+        try:
+            estructura = _estructura_lote(fuente, nombre)
+        except Exception as e:
+            return {
+                "tipo": "archivo", "archivo": nombre,
+                "status": "ERROR_LECTURA", "error": f"Error leyendo archivo: {e}",
+            }
+        dif = plan.validar(estructura)
+        return {
+            "tipo": "archivo",
+            "archivo": nombre,
+            "status": dif["status"],
+            "diferencias": dif,
+            "ms": round((time.perf_counter() - inicio) * 1000, 1),
+        }
+
+    def lineas():
+        inicio = time.perf_counter()
+        conteo = {"OK": 0, "ERROR": 0}
+        yield json.dumps({
+            "tipo": "inicio", "total": len(archivos), "version_id": plan.version_id,
+        }) + "\n"
+
+        hilos = ThreadPoolExecutor(
+            max_workers=max(1, _config_lote("VALIDACION_LOTE_CONCURRENCIA", 4))
+        )
+        try:
+            futuros = [hilos.submit(validar_uno, *a) for a in archivos]
+            for futuro in as_completed(futuros):
+                resultado = futuro.result()
+                conteo["OK" if resultado["status"] == "OK" else "ERROR"] += 1
+                yield json.dumps(resultado, ensure_ascii=False, default=str) + "\n"
+        finally:
+            # Cliente desconectado (GeneratorExit): no seguir extrayendo
+            hilos.shutdown(wait=False, cancel_futures=True)
+
+        yield json.dumps({
+            "tipo": "fin",
+            "total": len(archivos),
+            "ok": conteo["OK"],
+            "error": conteo["ERROR"],
+            "ms": round((time.perf_counter() - inicio) * 1000, 1),
+        }) + "\n"
+
+    response = StreamingHttpResponse(lineas(), content_type="application/x-ndjson")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,119 @@
+# ======================================================================
+# previews.py — URLs firmadas de previsualización, en lote
+# - get_preview_urls(blobs): todas las de una página del repositorio
+#   1) memoria del proceso (TTL hasta expires_at - margen)
+#   2) UNA consulta a FilePreview por los nombres que faltan
+#   3) firma local (V4, sin red) de las que siguen faltando
+#   4) UN upsert (bulk_create con update_conflicts) de las nuevas
+# - Una URL se da por vencida PREVIEW_MARGEN_SEGUNDOS antes de
+#   expires_at: nunca se entrega un enlace a punto de expirar
+# ======================================================================
+
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import FilePreview
+
+PREVIEW_EXPIRATION_MINUTES = 60
+
+# Entradas en memoria (nombre de blob → (url, expires_at))
+MAX_EN_MEMORIA = 5000
+
+_lock = threading.Lock()
+_memoria = OrderedDict()
+
+
+def _margen():
+    return timedelta(seconds=getattr(settings, "PREVIEW_MARGEN_SEGUNDOS", 120))
+
+
+def _vigente(expires_at, ahora):
+    return expires_at is not None and expires_at - _margen() > ahora
+
+
+def _minutos_restantes(expires_at, ahora):
+    return int((expires_at - ahora).total_seconds() / 60)
+
+
+def _recordar(nuevas):
+    with _lock:
+        for nombre, dato in nuevas.items():
+            _memoria[nombre] = dato
+            _memoria.move_to_end(nombre)
+        while len(_memoria) > MAX_EN_MEMORIA:
+            _memoria.popitem(last=False)
+
+
+def _firmar(blob, expiracion):
+    try:
+        return blob.generate_signed_url(version="v4", expiration=expiracion, method="GET")
+    except Exception:
+        return ""
+
+
+def get_preview_urls(blobs) -> dict:
+    """
+    {blob.name: (url, minutos_restantes)} para todos los blobs.
+    Una URL que no se pudo firmar vuelve como "" y no se guarda.
+    """
+    blobs = {b.name: b for b in blobs}
+    ahora = timezone.now()
+    salida = {}
+
+    # 1) Memoria
+    with _lock:
+        for nombre in blobs:
+            dato = _memoria.get(nombre)
+            if dato is not None and _vigente(dato[1], ahora):
+                _memoria.move_to_end(nombre)
+                salida[nombre] = (dato[0], _minutos_restantes(dato[1], ahora))
+
+    faltan = [n for n in blobs if n not in salida]
+    if not faltan:
+        return salida
+
+    # 2) BD: una sola consulta
+    desde_bd = {}
+    for nombre, url, expires_at in FilePreview.objects.filter(
+        blob_name__in=faltan
+    ).values_list("blob_name", "signed_url", "expires_at"):
+        if url and _vigente(expires_at, ahora):
+            desde_bd[nombre] = (url, expires_at)
+            salida[nombre] = (url, _minutos_restantes(expires_at, ahora))
+    _recordar(desde_bd)
+
+    # 3) Firmar las que faltan (local, con la llave del service account)
+    expiracion = timedelta(minutes=PREVIEW_EXPIRATION_MINUTES)
+    expires_at = ahora + expiracion
+    nuevas = {}
+    for nombre in faltan:
+        if nombre in salida:
+            continue
+        url = _firmar(blobs[nombre], expiracion)
+        salida[nombre] = (url, PREVIEW_EXPIRATION_MINUTES)
+        if url:
+            nuevas[nombre] = (url, expires_at)
+
+    # 4) Un solo upsert
+    if nuevas:
+        FilePreview.objects.bulk_create(
+            [
+                FilePreview(blob_name=nombre, signed_url=url, expires_at=vence)
+                for nombre, (url, vence) in nuevas.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["blob_name"],
+            update_fields=["signed_url", "expires_at"],
+        )
+        _recordar(nuevas)
+
+    return salida
+
+
+def get_or_create_preview_url(blob):
+    """Genera o reutiliza enlace de previsualización temporal"""
+    return get_preview_urls([blob])[blob.name]
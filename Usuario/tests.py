@@ -1,3 +1,82 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from Usuario import previews
+from Usuario.models import FilePreview
+
+
+class _BlobFalso:
+    def __init__(self, name, falla=False):
+        self.name = name
+        self.falla = falla
+        self.firmas = 0
+
+    def generate_signed_url(self, version, expiration, method):
+        self.firmas += 1
+        if self.falla:
+            raise ValueError("sin llave")
+        return f"https://firmada/{self.name}?n={self.firmas}"
+
+
+def _urls(previsualizaciones):
+    return {nombre: url for nombre, (url, _) in previsualizaciones.items()}
+
+
+# ======================================================================
+# URLS DE PREVISUALIZACIÓN EN LOTE
+# ======================================================================
+@override_settings(PREVIEW_MARGEN_SEGUNDOS=120)
+class PreviewUrlsTests(TestCase):
+
+    def setUp(self):
+        parche = mock.patch.object(previews, "_memoria", previews.OrderedDict())
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def test_primera_pagina_firma_y_guarda_en_un_upsert(self):
+        blobs = [_BlobFalso(f"docs/{i}.pdf") for i in range(3)]
+        with self.assertNumQueries(2):
+            urls = previews.get_preview_urls(blobs)
+
+        self.assertEqual(urls["docs/0.pdf"], ("https://firmada/docs/0.pdf?n=1", 60))
+        self.assertEqual(FilePreview.objects.count(), 3)
+
+    def test_segunda_vez_sale_de_memoria(self):
+        blobs = [_BlobFalso("docs/a.pdf"), _BlobFalso("docs/b.pdf")]
+        primera = previews.get_preview_urls(blobs)
+        with self.assertNumQueries(0):
+            segunda = previews.get_preview_urls(blobs)
+        self.assertEqual(_urls(segunda), _urls(primera))
+        self.assertEqual([b.firmas for b in blobs], [1, 1])
+
+    def test_otro_proceso_lee_la_bd_sin_firmar(self):
+        blobs = [_BlobFalso("docs/a.pdf"), _BlobFalso("docs/b.pdf")]
+        primera = previews.get_preview_urls(blobs)
+        previews._memoria.clear()
+
+        with self.assertNumQueries(1):
+            segunda = previews.get_preview_urls(blobs)
+        self.assertEqual(_urls(segunda), _urls(primera))
+        self.assertEqual([b.firmas for b in blobs], [1, 1])
+
+    def test_url_por_vencer_se_vuelve_a_firmar(self):
+        FilePreview.objects.create(
+            blob_name="docs/a.pdf",
+            signed_url="https://vieja",
+            expires_at=timezone.now() + timedelta(seconds=60),
+        )
+        blob = _BlobFalso("docs/a.pdf")
+
+        url, minutos = previews.get_preview_urls([blob])["docs/a.pdf"]
+
+        self.assertEqual((url, minutos), ("https://firmada/docs/a.pdf?n=1", 60))
+        self.assertEqual(FilePreview.objects.get().signed_url, url)
+
+    def test_firma_fallida_no_se_guarda(self):
+        urls = previews.get_preview_urls([_BlobFalso("docs/a.pdf", falla=True)])
+        self.assertEqual(urls["docs/a.pdf"], ("", 60))
+        self.assertFalse(FilePreview.objects.exists())
+        self.assertEqual(len(previews._memoria), 0)
@@ -5,7 +5,6 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
-from django.utils import timezone
 from django.db import connection, transaction
 
 #from plantillas_documentos_tecnicos.utils_documentos import extract_blob_name_from_signed_url
@@ -13,19 +12,23 @@ from plantillas_documentos_tecnicos.utils_documentos import (
     extract_blob_name_from_gcs_path,
     extract_blob_name_from_signed_url,
     inicializar_version_inicial,
-    insertar_documento_generado
+    insertar_documento_generado,
+    plantillas_vigentes,
 )
+from plantillas_documentos_tecnicos.cliente_gcs import obtener_bucket
+from plantillas_documentos_tecnicos.descargas_gcs import respuesta_descarga
+from plantillas_documentos_tecnicos.operaciones_gcs import eliminar_objetos
+from plantillas_documentos_tecnicos.subidas_gcs import SubidaGCS
+from plantillas_documentos_tecnicos.planes_validacion import olvidar_requerimiento
 
 
 # === Utilidades y librerías externas ===
-from google.cloud import storage
-from django.conf import settings
 from collections import Counter, defaultdict
-from datetime import datetime, timedelta
+from datetime import datetime
 import json, re, unidecode, csv, openpyxl, traceback
 
-# === Modelos locales ===
-from .models import FilePreview
+# === Previsualización (URLs firmadas en lote) ===
+from .previews import get_preview_urls
 
 # === Librerías especializadas ===
 from openpyxl import load_workbook
@@ -52,9 +55,6 @@ def clean(x):
     return x.strip("_")
 
 
-# Duración de previsualización en minutos
-PREVIEW_EXPIRATION_MINUTES = 60  
-
 # Tipos MIME permitidos (puedes ampliar)
 ALLOWED_MIME_TYPES = [
     "application/vnd.ms-excel",
@@ -66,35 +66,6 @@ ALLOWED_MIME_TYPES = [
     "image/png",
 ]
 
-# Cliente de Google Cloud Storage
-storage_client = storage.Client.from_service_account_json(settings.GCP_SERVICE_ACCOUNT_JSON)
-bucket = storage_client.bucket(settings.GCP_BUCKET_NAME)
-
-
-def get_or_create_preview_url(blob):
-    """Genera o reutiliza enlace de previsualización temporal"""
-    try:
-        preview = FilePreview.objects.get(blob_name=blob.name)
-        if preview.is_expired():
-            raise FilePreview.DoesNotExist
-        remaining_minutes = int((preview.expires_at - timezone.now()).total_seconds() / 60)
-        return preview.signed_url, remaining_minutes
-    except FilePreview.DoesNotExist:
-        try:
-            url = blob.generate_signed_url(
-                version="v4",
-                expiration=timedelta(minutes=PREVIEW_EXPIRATION_MINUTES),
-                method="GET"
-            )
-        except Exception:
-            url = ""
-        expires_at = timezone.now() + timedelta(minutes=PREVIEW_EXPIRATION_MINUTES)
-        FilePreview.objects.update_or_create(
-            blob_name=blob.name,
-            defaults={"signed_url": url, "expires_at": expires_at}
-        )
-        return url, PREVIEW_EXPIRATION_MINUTES
-
 @login_required
 def inicio(request):
     return render(request, "usuario_inicio.html")
@@ -343,24 +314,14 @@ def eliminar_proyecto(request, proyecto_id):
 
             signed_urls = [r[0] for r in cursor.fetchall() if r[0]]
 
-        storage_client = storage.Client()
-        bucket = storage_client.bucket(settings.GCP_BUCKET_NAME)
-
-        # ============================================================
-        # 3️⃣ Eliminar archivos individuales por signed_url
-        # ============================================================
-        for url in signed_urls:
-            blob_name = extract_blob_name_from_signed_url(url)
-            if blob_name:
-                blob = bucket.blob(blob_name)
-                if blob.exists():
-                    blob.delete()
-
         # ============================================================
-        # 4️⃣ Eliminar carpeta del proyecto completa
+        # 3️⃣ + 4️⃣ Eliminar archivos individuales por signed_url y la
+        #         carpeta del proyecto completa (en lotes)
         # ============================================================
-        for blob in bucket.list_blobs(prefix=base_folder):
-            blob.delete()
+        borrado = eliminar_objetos(
+            [extract_blob_name_from_signed_url(url) for url in signed_urls],
+            [base_folder],
+        )
 
         # ============================================================
         # 5️⃣ Eliminar datos en BD (en orden correcto)
@@ -416,7 +377,11 @@ def eliminar_proyecto(request, proyecto_id):
                     WHERE id = %s
                 """, [proyecto_id])
 
-        messages.success(request, "🗑️ Proyecto eliminado correctamente (BD + GCS).")
+        messages.success(
+            request,
+            f"🗑️ Proyecto eliminado correctamente (BD + GCS: {borrado['objetos']} archivos en "
+            f"{(borrado['listado_ms'] + borrado['borrado_ms']) / 1000:.1f} s)."
+        )
         return redirect("usuario:lista_proyectos")
 
     except Exception as e:
@@ -677,7 +642,7 @@ def list_files(request):
     folders, files = [], []
 
     try:
-        iterator = bucket.list_blobs(prefix=prefix, delimiter="/")
+        iterator = obtener_bucket().list_blobs(prefix=prefix, delimiter="/")
         page = next(iterator.pages)
 
         # --------------------------------------------------------
@@ -695,13 +660,13 @@ def list_files(request):
             })
 
         # --------------------------------------------------------
-        # ARCHIVOS
+        # ARCHIVOS (URLs de previsualización de toda la página juntas)
         # --------------------------------------------------------
-        for blob in page:
-            if blob.name.endswith("/"):
-                continue
+        blobs = [blob for blob in page if not blob.name.endswith("/")]
+        previews = get_preview_urls(blobs)
 
-            preview_url, remaining = get_or_create_preview_url(blob)
+        for blob in blobs:
+            preview_url, remaining = previews[blob.name]
 
             files.append({
                 "id": blob.name,
@@ -758,8 +723,9 @@ def upload_file(request):
 
         blob_name = f"{folder}{uploaded_file.name}" if folder else uploaded_file.name
         try:
-            blob = bucket.blob(blob_name)
-            blob.upload_from_file(uploaded_file, content_type=uploaded_file.content_type)
+            with SubidaGCS(blob_name, uploaded_file.content_type) as subida:
+                subida.consumir(uploaded_file)
+                subida.confirmar()
         except Exception as e:
             return HttpResponse(f"Error al subir archivo: {e}")
 
@@ -770,11 +736,8 @@ def upload_file(request):
 @login_required
 def download_file(request, file_id):
     try:
-        blob = bucket.blob(file_id)
-        if blob.exists():
-            content = blob.download_as_bytes()
-            response = HttpResponse(content, content_type=blob.content_type or "application/octet-stream")
-            response['Content-Disposition'] = f'attachment; filename="{blob.name.split("/")[-1]}"'
+        response = respuesta_descarga(request, file_id)
+        if response is not None:
             return response
     except Exception as e:
         return HttpResponse(f"Error al descargar archivo: {e}", status=500)
@@ -784,7 +747,7 @@ def download_file(request, file_id):
 @login_required
 def delete_file(request, file_id):
     try:
-        blob = bucket.blob(file_id)
+        blob = obtener_bucket().blob(file_id)
         if blob.exists():
             blob.delete()
     except Exception as e:
@@ -802,7 +765,7 @@ def new_folder(request):
                 folder_name += "/"
             blob_name = f"{current_folder}{folder_name}" if current_folder else folder_name
             try:
-                blob = bucket.blob(blob_name)
+                blob = obtener_bucket().blob(blob_name)
                 blob.upload_from_string("")  # GCS no tiene carpetas reales
             except Exception as e:
                 return HttpResponse(f"Error al crear carpeta: {e}", status=500)
@@ -814,7 +777,6 @@ def new_folder(request):
 @login_required
 def nuevo_requerimiento(request, proyecto_id):
     from plantillas_documentos_tecnicos.utils_documentos import inicializar_version_inicial
-    from google.cloud import storage
 
     # ---------------------------------------------------------
     # 1) GET → Mostrar formulario nuevo_requerimiento_unico.html
@@ -931,8 +893,11 @@ def nuevo_requerimiento(request, proyecto_id):
             proy_nom = clean(proy_nom)
 
             # Cargar bucket
-            storage_client = storage.Client()
-            bucket = storage_client.bucket(settings.GCP_BUCKET_NAME)
+            bucket = obtener_bucket()
+
+            # Plantilla vigente de todos los tipos elegidos (una consulta)
+            plantillas = {}
+            plantillas_vigentes(cursor, documentos_ids, plantillas)
 
             # Crear requerimientos uno por documento
             for doc_id in documentos_ids:
@@ -999,7 +964,8 @@ def nuevo_requerimiento(request, proyecto_id):
                     bucket=bucket,
                     requerimiento_id=req_id,
                     ruta_plantilla=carpeta_plantilla,
-                    codigo_documento=codigo
+                    codigo_documento=codigo,
+                    plantillas=plantillas,
                 )
 
                 # HITOS
@@ -1215,11 +1181,8 @@ def eliminar_requerimiento(request, requerimiento_id):
         folder_tipo     = f"{base_folder}Documentos_Tecnicos/{categoria_nom}/{tipo_nom}/"
         folder_rq       = f"{folder_tipo}RQ-{requerimiento_id}/"
 
-        storage_client = storage.Client()
-        bucket = storage_client.bucket(settings.GCP_BUCKET_NAME)
-
         # ============================================================
-        # 2️⃣ Eliminar archivos individuales via signed_url
+        # 2️⃣ Archivos individuales via signed_url
         # ============================================================
         with connection.cursor() as cursor:
             cursor.execute("""
@@ -1230,21 +1193,10 @@ def eliminar_requerimiento(request, requerimiento_id):
 
             signed_urls = [r[0] for r in cursor.fetchall() if r[0]]
 
-        for url in signed_urls:
-            blob_name = extract_blob_name_from_signed_url(url)
-            if blob_name:
-                blob = bucket.blob(blob_name)
-                if blob.exists():
-                    blob.delete()
+        blob_names = [extract_blob_name_from_signed_url(url) for url in signed_urls]
 
         # ============================================================
-        # 3️⃣ Eliminar carpeta RQ-x completa
-        # ============================================================
-        for blob in bucket.list_blobs(prefix=folder_rq):
-            blob.delete()
-
-        # ============================================================
-        # 4️⃣ Verificar si quedan otros requerimientos del MISMO TIPO
+        # 3️⃣ Verificar si quedan otros requerimientos del MISMO TIPO
         # ============================================================
         with connection.cursor() as cursor:
             cursor.execute("""
@@ -1258,11 +1210,12 @@ def eliminar_requerimiento(request, requerimiento_id):
             otros = cursor.fetchone()[0]
 
         # ============================================================
-        # 5️⃣ Si no quedan → borrar el tipo completo
+        # 4️⃣ Borrar en GCS: archivos + carpeta RQ-x (o el tipo completo
+        #    si no quedan otros RQ), en lotes
         # ============================================================
-        if otros == 0:
-            for blob in bucket.list_blobs(prefix=folder_tipo):
-                blob.delete()
+        borrado = eliminar_objetos(
+            blob_names, [folder_tipo] if otros == 0 else [folder_rq]
+        )
 
         # ============================================================
         # 6️⃣ Borrar documentos_generados asociados
@@ -1288,7 +1241,14 @@ def eliminar_requerimiento(request, requerimiento_id):
                 WHERE id = %s
             """, [requerimiento_id])
 
-        messages.success(request, "🗑️ Requerimiento eliminado correctamente.")
+        olvidar_requerimiento(requerimiento_id)
+
+        messages.success(
+            request,
+            f"🗑️ Requerimiento eliminado correctamente "
+            f"({borrado['objetos']} archivos en "
+            f"{(borrado['listado_ms'] + borrado['borrado_ms']) / 1000:.1f} s)."
+        )
         return redirect("usuario:detalle_proyecto", proyecto_id=proyecto_id)
 
     except Exception as e:
@@ -1322,7 +1282,6 @@ def crear_proyecto(request):
         inicializar_version_inicial,
         extract_blob_name_from_gcs_path
     )
-    from google.cloud import storage
 
     if "proyecto_temp" not in request.session:
         request.session["proyecto_temp"] = {}
@@ -1500,8 +1459,7 @@ def crear_proyecto(request):
             }
 
             # --------------------- STORAGE ---------------------
-            storage_client = storage.Client()
-            bucket = storage_client.bucket(settings.GCP_BUCKET_NAME)
+            bucket = obtener_bucket()
 
             cliente_nom = clean(resumen.get("cliente_nombre") or "Cliente")
             proyecto_nom = clean(resumen.get("nombre") or "Proyecto")
@@ -1616,6 +1574,10 @@ def crear_proyecto(request):
                         # ==========================================================
                         #  REQUERIMIENTOS + ÁRBOL COMPLETO DE GCS + VERSIÓN INICIAL
                         # ==========================================================
+                        # Plantilla vigente de todos los tipos elegidos (una consulta)
+                        plantillas = {}
+                        plantillas_vigentes(cursor, documentos_roles.keys(), plantillas)
+
                         for doc_id, datos in documentos_roles.items():
 
                             # ----------------------------------------------
@@ -1684,7 +1646,8 @@ def crear_proyecto(request):
                                 bucket=bucket,
                                 requerimiento_id=req_id,
                                 ruta_plantilla=plantilla_path,
-                                codigo_documento=codigo_documento
+                                codigo_documento=codigo_documento,
+                                plantillas=plantillas,
                             )
 
                             # ----------------------------------------------
@@ -0,0 +1,380 @@
+# ======================================================================
+# cache_estructuras.py — Cache de estructuras extraídas de .docx
+# - Clave: SHA-256 de los bytes del archivo + VERSION_EXTRACTOR
+#          (+ perfil, si la extracción fue parcial; + "huellas" si las
+#          tablas se guardaron como huellas)
+# - Nivel 1: LRU en memoria del proceso
+# - Nivel 2: tabla estructura_documento_cache (EstructuraDocumentoCache)
+# - Misma entrada => misma estructura, sin volver a parsear el .docx
+# - Acepta ruta, bytes o archivo subido (sin pasar por disco)
+# ======================================================================
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from plantillas_documentos_tecnicos.leer_estructura_plantilla_word import (
+    PERFILES,
+    SECCIONES,
+    VERSION_EXTRACTOR,
+    EstructuraDocumento,
+    fuente_rebobinable,
+    generar_estructura,
+    leer_bytes_fuente,
+    nombre_fuente,
+    resolver_perfil,
+)
+from plantillas_documentos_tecnicos.huellas_tablas import aplicar_huellas
+
+TAMANO_BLOQUE_HASH = 1024 * 1024
+
+
+def _config(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+# ======================================================================
+# LRU EN MEMORIA
+# ======================================================================
+class _LRUEstructuras:
+    """
+    LRU thread-safe. Guarda la estructura serializada (JSON) para que
+    cada hit entregue una copia independiente al llamador.
+    """
+
+    def __init__(self):
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            valor = self._datos.get(clave)
+            if valor is not None:
+                self._datos.move_to_end(clave)
+            return valor
+
+    def set(self, clave, valor):
+        max_items = _config("ESTRUCTURA_CACHE_MAX_ITEMS", 64)
+        with self._lock:
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            while len(self._datos) > max(max_items, 0):
+                self._datos.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+_lru = _LRUEstructuras()
+
+_stats_lock = threading.Lock()
+_stats = {"hits_memoria": 0, "hits_bd": 0, "misses": 0}
+
+
+def _contar(campo):
+    with _stats_lock:
+        _stats[campo] += 1
+
+
+def estadisticas_cache() -> dict:
+    """
+    Contadores del proceso actual y razón de aciertos.
+    """
+    with _stats_lock:
+        datos = dict(_stats)
+
+    total = datos["hits_memoria"] + datos["hits_bd"] + datos["misses"]
+    hits = datos["hits_memoria"] + datos["hits_bd"]
+
+    datos.update({
+        "consultas": total,
+        "hit_ratio": round(hits / total, 4) if total else 0.0,
+        "items_memoria": len(_lru),
+        "max_items_memoria": _config("ESTRUCTURA_CACHE_MAX_ITEMS", 64),
+        "version_extractor": VERSION_EXTRACTOR,
+    })
+    return datos
+
+
+def reiniciar_cache():
+    """Vacía el LRU y los contadores (no toca la tabla persistente)."""
+    _lru.clear()
+    with _stats_lock:
+        for k in _stats:
+            _stats[k] = 0
+
+
+# ======================================================================
+# HASH DEL ARCHIVO
+# ======================================================================
+def sha256_archivo(docx_path) -> str:
+    return _sha256_y_tamano(docx_path)[0]
+
+
+def _sha256_y_tamano(fuente):
+    """
+    (sha256, tamaño en bytes) de una ruta, bytes / memoryview o file-like
+    (UploadedFile incluido). Los archivos quedan rebobinados.
+    """
+    h = hashlib.sha256()
+
+    if isinstance(fuente, (bytes, bytearray, memoryview)):
+        h.update(fuente)
+        return h.hexdigest(), memoryview(fuente).nbytes
+
+    tamano = 0
+    if isinstance(fuente, (str, os.PathLike)):
+        with open(fuente, "rb") as f:
+            for bloque in iter(lambda: f.read(TAMANO_BLOQUE_HASH), b""):
+                h.update(bloque)
+                tamano += len(bloque)
+        return h.hexdigest(), tamano
+
+    fuente.seek(0)
+    if hasattr(fuente, "chunks"):
+        bloques = fuente.chunks(TAMANO_BLOQUE_HASH)
+    else:
+        bloques = iter(lambda: fuente.read(TAMANO_BLOQUE_HASH), b"")
+    for bloque in bloques:
+        h.update(bloque)
+        tamano += len(bloque)
+    fuente.seek(0)
+    return h.hexdigest(), tamano
+
+
+def _version_perfil(secciones, huellas=False) -> str:
+    """
+    Valor de version_extractor para una extracción. La completa usa
+    VERSION_EXTRACTOR tal cual; las parciales le agregan el perfil y las
+    de tablas con huellas "/huellas".
+    """
+    sufijo = "/huellas" if huellas else ""
+
+    if secciones == PERFILES["full"]:
+        return VERSION_EXTRACTOR + sufijo
+
+    for nombre, perfil in PERFILES.items():
+        if perfil == secciones:
+            return f"{VERSION_EXTRACTOR}/{nombre}{sufijo}"
+
+    firma = hashlib.sha1(",".join(sorted(secciones)).encode()).hexdigest()[:8]
+    return f"{VERSION_EXTRACTOR}/s-{firma}{sufijo}"
+
+
+# ======================================================================
+# NIVEL PERSISTENTE
+# ======================================================================
+def _leer_bd(sha, version):
+    from plantillas_documentos_tecnicos.models import EstructuraDocumentoCache
+
+    fila = (
+        EstructuraDocumentoCache.objects
+        .filter(sha256=sha, version_extractor=version)
+        .only("id", "estructura_json", "ultimo_uso")
+        .first()
+    )
+    if fila is None:
+        return None
+
+    # Un hit es una lectura: ultimo_uso (y hits) se tocan a lo más una vez
+    # por ESTRUCTURA_CACHE_TOQUE_S, suficiente para la expulsión por días
+    ahora = timezone.now()
+    toque = timedelta(seconds=_config("ESTRUCTURA_CACHE_TOQUE_S", 3600))
+    if fila.ultimo_uso is None or fila.ultimo_uso < ahora - toque:
+        EstructuraDocumentoCache.objects.filter(id=fila.id).update(
+            hits=F("hits") + 1,
+            ultimo_uso=ahora,
+        )
+    return fila.estructura_json
+
+
+def _guardar_bd(sha, version, estructura, tamano):
+    from plantillas_documentos_tecnicos.models import EstructuraDocumentoCache
+
+    EstructuraDocumentoCache.objects.update_or_create(
+        sha256=sha,
+        version_extractor=version,
+        defaults={
+            "estructura_json": estructura,
+            "tamano_bytes": tamano,
+            "ultimo_uso": timezone.now(),
+        },
+    )
+    _purgar_si_toca()
+
+
+_purga_lock = threading.Lock()
+_ultima_purga = None
+
+
+def _purgar_si_toca():
+    """
+    La purga recorre la tabla: se corre a lo más una vez cada
+    ESTRUCTURA_CACHE_PURGA_CADA_S segundos por proceso (0 = nunca desde
+    las requests).
+    """
+    global _ultima_purga
+    cada = _config("ESTRUCTURA_CACHE_PURGA_CADA_S", 3600)
+    if not cada:
+        return
+
+    ahora = time.monotonic()
+    with _purga_lock:
+        if _ultima_purga is not None and ahora - _ultima_purga < cada:
+            return
+        _ultima_purga = ahora
+    purgar_cache_persistente()
+
+
+def purgar_cache_persistente():
+    """
+    Expulsión del nivel persistente:
+      - filas de versiones antiguas del extractor
+      - filas sin uso hace más de ESTRUCTURA_CACHE_DIAS_BD días
+      - exceso sobre ESTRUCTURA_CACHE_MAX_FILAS_BD (menos usadas primero)
+    """
+    from plantillas_documentos_tecnicos.models import EstructuraDocumentoCache
+
+    qs = EstructuraDocumentoCache.objects
+    qs.exclude(
+        Q(version_extractor=VERSION_EXTRACTOR)
+        | Q(version_extractor__startswith=f"{VERSION_EXTRACTOR}/")
+    ).delete()
+
+    dias = _config("ESTRUCTURA_CACHE_DIAS_BD", 30)
+    if dias:
+        qs.filter(ultimo_uso__lt=timezone.now() - timedelta(days=dias)).delete()
+
+    max_filas = _config("ESTRUCTURA_CACHE_MAX_FILAS_BD", 5000)
+    if max_filas:
+        sobrantes = list(
+            qs.order_by("-ultimo_uso").values_list("id", flat=True)[max_filas:]
+        )
+        if sobrantes:
+            qs.filter(id__in=sobrantes).delete()
+
+
+# ======================================================================
+# API PRINCIPAL
+# ======================================================================
+def _buscar(sha, version):
+    """LRU y luego BD. Devuelve la estructura (dict) o None."""
+    clave = (sha, version)
+
+    serializada = _lru.get(clave)
+    if serializada is not None:
+        _contar("hits_memoria")
+        return json.loads(serializada)
+
+    try:
+        estructura = _leer_bd(sha, version)
+    except Exception:
+        # La cache nunca debe impedir la validación
+        estructura = None
+
+    if estructura is not None:
+        _contar("hits_bd")
+        _lru.set(clave, json.dumps(estructura))
+    return estructura
+
+
+def generar_estructura_cacheada(docx_path, perfil="full", nombre=None,
+                                huellas=False, sha256=None, tamano=None) -> dict:
+    """
+    Igual que generar_estructura(docx_path, perfil), pero reutiliza la
+    estructura ya extraída si los bytes del archivo son idénticos.
+
+    docx_path acepta lo mismo que generar_estructura: ruta, bytes,
+    memoryview, UploadedFile o file-like (sin archivo temporal).
+
+    Una estructura completa cacheada sirve para cualquier perfil; una
+    parcial solo para su mismo perfil (el resto sigue siendo perezoso).
+    Con huellas=True una completa cacheada se reduce a huellas al vuelo.
+
+    sha256 / tamano: si el llamador ya los calculó al leer el archivo
+    (subidas_gcs.SubidaGCS) no se vuelve a recorrer para el hash.
+    """
+    secciones = resolver_perfil(perfil)
+    version = _version_perfil(secciones, huellas)
+    parcial = secciones != PERFILES["full"]
+    nombre = nombre_fuente(docx_path, nombre)
+    docx_path = fuente_rebobinable(docx_path)
+
+    # Para un perfil parcial los bytes se conservan (secciones perezosas)
+    fuente = leer_bytes_fuente(docx_path) if parcial else None
+    if sha256:
+        sha, tamano = sha256, tamano or 0
+    else:
+        sha, tamano = _sha256_y_tamano(fuente if parcial else docx_path)
+
+    estructura = _buscar(sha, VERSION_EXTRACTOR)
+    if estructura is not None:
+        if huellas:
+            aplicar_huellas(estructura)
+        return _con_nombre(estructura, nombre)
+
+    if version != VERSION_EXTRACTOR:
+        estructura = _buscar(sha, version)
+        if estructura is not None:
+            if parcial:
+                estructura = EstructuraDocumento(
+                    estructura,
+                    fuente=fuente,
+                    pendientes=set(SECCIONES) - secciones,
+                    huellas=huellas,
+                )
+            return _con_nombre(estructura, nombre)
+
+    _contar("misses")
+    estructura = _extraer(fuente if parcial else docx_path, secciones, nombre, huellas)
+
+    # Para una EstructuraDocumento, json.dumps solo ve lo ya calculado
+    serializada = json.dumps(estructura)
+    _lru.set((sha, version), serializada)
+
+    try:
+        _guardar_bd(sha, version, json.loads(serializada), tamano)
+    except Exception:
+        pass
+
+    return estructura
+
+
+def _extraer(docx_path, secciones, nombre, huellas=False):
+    """
+    Extracción real: en el pool de procesos si está habilitado
+    (EXTRACCION_PROCESOS > 0, apagado por defecto), si no en el hilo
+    actual.
+    """
+    from plantillas_documentos_tecnicos.ejecutor_extraccion import obtener_ejecutor
+
+    ejecutor = obtener_ejecutor()
+    if ejecutor is None:
+        return generar_estructura(
+            docx_path, perfil=secciones, nombre=nombre, huellas=huellas
+        )
+    return ejecutor.ejecutar(
+        docx_path, perfil=secciones, nombre=nombre, huellas=huellas
+    )
+
+
+def _con_nombre(estructura, nombre):
+    """
+    metadata.plantilla depende del nombre del archivo, no de su contenido.
+    """
+    metadata = estructura.get("metadata")
+    if isinstance(metadata, dict):
+        metadata["plantilla"] = nombre
+    return estructura
@@ -0,0 +1,115 @@
+# ======================================================================
+# cliente_gcs.py — Cliente de Cloud Storage compartido por el proceso
+# - Se crea la primera vez que se pide (nunca al importar un módulo)
+# - Credenciales: GCP_SERVICE_ACCOUNT_JSON si el archivo existe; si no,
+#   las credenciales por defecto del entorno (ADC)
+# - Una sola sesión HTTP con pool de conexiones (GCS_POOL_CONEXIONES),
+#   reutilizada por todas las vistas e hilos
+# - Después de un fork (gunicorn --preload, multiprocessing) el proceso
+#   hijo arma su propio cliente: los sockets no se comparten
+# ======================================================================
+
+import os
+import threading
+
+from django.conf import settings
+
+_lock = threading.Lock()
+_cliente = None
+# Credenciales, proyecto y sesión HTTP con que se armó _cliente
+# (cliente_para_lotes arma otro cliente con lo mismo)
+_base = None
+_buckets = {}
+
+
+def _config(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def _credenciales():
+    from google.auth import default as credenciales_por_defecto
+    from google.cloud import storage
+    from google.oauth2 import service_account
+
+    ruta = _config("GCP_SERVICE_ACCOUNT_JSON", None)
+    if ruta and os.path.exists(ruta):
+        credenciales = service_account.Credentials.from_service_account_file(
+            ruta, scopes=storage.Client.SCOPE
+        )
+        return credenciales, credenciales.project_id
+
+    return credenciales_por_defecto(scopes=storage.Client.SCOPE)
+
+
+def _crear_base():
+    from google.auth.transport.requests import AuthorizedSession
+    from requests.adapters import HTTPAdapter
+
+    credenciales, proyecto = _credenciales()
+
+    conexiones = max(1, int(_config("GCS_POOL_CONEXIONES", 32)))
+    sesion = AuthorizedSession(credenciales)
+    adaptador = HTTPAdapter(pool_connections=conexiones, pool_maxsize=conexiones)
+    sesion.mount("https://", adaptador)
+
+    return {"credenciales": credenciales, "proyecto": proyecto, "sesion": sesion}
+
+
+def _crear_cliente(base):
+    from google.cloud import storage
+
+    return storage.Client(
+        project=base["proyecto"], credentials=base["credenciales"], _http=base["sesion"]
+    )
+
+
+def obtener_cliente():
+    """storage.Client del proceso (se crea una vez, thread-safe)."""
+    global _cliente, _base
+    cliente = _cliente
+    if cliente is not None:
+        return cliente
+
+    with _lock:
+        if _cliente is None:
+            _base = _crear_base()
+            _cliente = _crear_cliente(_base)
+        return _cliente
+
+
+def cliente_para_lotes():
+    """
+    Cliente aparte (mismas credenciales y sesión HTTP) para client.batch():
+    el batch abierto vive en el cliente, y en el compartido capturaría las
+    llamadas de otras vistas / hilos.
+    """
+    obtener_cliente()
+    return _crear_cliente(_base)
+
+
+def obtener_bucket(nombre=None):
+    """Bucket (por defecto GCP_BUCKET_NAME) sobre el cliente compartido."""
+    nombre = nombre or settings.GCP_BUCKET_NAME
+    bucket = _buckets.get(nombre)
+    if bucket is not None:
+        return bucket
+
+    cliente = obtener_cliente()
+    with _lock:
+        bucket = _buckets.get(nombre)
+        if bucket is None:
+            bucket = _buckets[nombre] = cliente.bucket(nombre)
+        return bucket
+
+
+def reiniciar_cliente():
+    """Descarta cliente y buckets (el próximo uso crea uno nuevo)."""
+    global _cliente, _base, _lock
+    _lock = threading.Lock()
+    _cliente = None
+    _base = None
+    _buckets.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reiniciar_cliente)
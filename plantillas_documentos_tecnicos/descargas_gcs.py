@@ -0,0 +1,143 @@
+# ======================================================================
+# descargas_gcs.py — Descargas desde GCS sin cargar el archivo entero
+# - respuesta_descarga(request, blob_name): UNA lectura de metadata
+#   (get_blob: existe, tamaño, etag, generación) y luego:
+#     If-None-Match con el mismo ETag  → 304
+#     tamaño > DESCARGA_MAX_BYTES_PROXY → redirect a URL firmada corta
+#                                          (el archivo no pasa por el worker)
+#     Range: bytes=...                  → 206 con ese tramo (416 si no cabe)
+#     resto                             → 200
+# - El cuerpo sale en un StreamingHttpResponse leyendo de a
+#   DESCARGA_CHUNK_BYTES, fijado a la generación leída (si el objeto se
+#   reemplaza a mitad de la descarga no se mezclan versiones)
+# ======================================================================
+
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.http import (
+    HttpResponse,
+    HttpResponseNotModified,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
+from django.utils.http import content_disposition_header, http_date
+
+from plantillas_documentos_tecnicos.cliente_gcs import obtener_bucket
+
+_RE_RANGO = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _config(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def _etag(blob):
+    etag = blob.etag or ""
+    return etag if etag.startswith('"') else f'"{etag}"'
+
+
+def _coincide_etag(cabecera, etag):
+    if not cabecera:
+        return False
+    if cabecera.strip() == "*":
+        return True
+    candidatos = [c.strip().removeprefix("W/") for c in cabecera.split(",")]
+    return etag in candidatos
+
+
+def _rango(cabecera, tamano):
+    """
+    (inicio, fin) inclusivo de "bytes=a-b" / "a-" / "-n"; None si no hay
+    rango usable (se sirve completo, p.ej. varios rangos); False si no se
+    puede satisfacer (416), p.ej. "-0" o cualquier rango de un archivo vacío.
+    """
+    if not cabecera:
+        return None
+    m = _RE_RANGO.match(cabecera.strip())
+    if not m:
+        return None
+
+    a, b = m.groups()
+    if a == "" and b == "":
+        return None
+    if a == "":
+        n = int(b)
+        if n == 0 or tamano == 0:
+            return False
+        return max(tamano - n, 0), tamano - 1
+
+    inicio = int(a)
+    fin = min(int(b), tamano - 1) if b else tamano - 1
+    if inicio >= tamano or inicio > fin:
+        return False
+    return inicio, fin
+
+
+def _trozos(blob, inicio, fin):
+    chunk = _config("DESCARGA_CHUNK_BYTES", 1024 * 1024)
+    pos = inicio
+    while pos <= fin:
+        hasta = min(pos + chunk - 1, fin)
+        yield blob.download_as_bytes(start=pos, end=hasta, checksum=None)
+        pos = hasta + 1
+
+
+def respuesta_descarga(request, blob_name, content_type=None, nombre=None):
+    """
+    Respuesta HTTP para descargar blob_name (attachment). None si el blob
+    no existe (la vista decide el 404).
+    """
+    blob = obtener_bucket().get_blob(blob_name)
+    if blob is None:
+        return None
+
+    nombre = nombre or blob_name.rsplit("/", 1)[-1]
+    disposicion = content_disposition_header(True, nombre)
+    etag = _etag(blob)
+    tamano = blob.size or 0
+
+    if _coincide_etag(request.headers.get("If-None-Match"), etag):
+        respuesta = HttpResponseNotModified()
+        respuesta["ETag"] = etag
+        return respuesta
+
+    # Archivos grandes: directo desde GCS con una URL firmada corta
+    if tamano > _config("DESCARGA_MAX_BYTES_PROXY", 20 * 1024 * 1024):
+        url = blob.generate_signed_url(
+            version="v4",
+            expiration=timedelta(seconds=_config("DESCARGA_URL_FIRMADA_SEGUNDOS", 300)),
+            method="GET",
+            response_disposition=disposicion,
+        )
+        return HttpResponseRedirect(url)
+
+    rango = _rango(request.headers.get("Range"), tamano)
+    if_range = request.headers.get("If-Range")
+    if rango is not None and if_range and if_range.strip() != etag:
+        # El cliente tiene otra versión: va el archivo completo
+        rango = None
+
+    if rango is False:
+        respuesta = HttpResponse(status=416)
+        respuesta["Content-Range"] = f"bytes */{tamano}"
+        respuesta["Accept-Ranges"] = "bytes"
+        return respuesta
+
+    inicio, fin = rango or (0, tamano - 1)
+    respuesta = StreamingHttpResponse(
+        _trozos(blob, inicio, fin) if tamano else iter(()),
+        status=206 if rango else 200,
+        content_type=content_type or blob.content_type or "application/octet-stream",
+    )
+    respuesta["Content-Length"] = str(fin - inicio + 1 if tamano else 0)
+    if rango:
+        respuesta["Content-Range"] = f"bytes {inicio}-{fin}/{tamano}"
+    respuesta["Accept-Ranges"] = "bytes"
+    respuesta["ETag"] = etag
+    if blob.updated:
+        respuesta["Last-Modified"] = http_date(blob.updated.timestamp())
+    respuesta["Content-Disposition"] = disposicion
+    respuesta["Cache-Control"] = "private, no-cache"
+    return respuesta
@@ -0,0 +1,396 @@
+# ======================================================================
+# diff_estructuras.py — Diff por árbol de hashes entre dos estructuras
+# - Árbol (arbol_estructura): por tabla su clave_tabla, tamaño y los
+#   bloques de Merkle de sus filas (ver huellas_tablas); por excel su
+#   clave y sus tablas. Va precalculado en resumen_json ("arbol").
+# - Recorrido de arriba hacia abajo:
+#     sección (digest)  → igual: no se mira
+#     tabla   (clave)   → igual: no se mira
+#     bloque  (hash)    → igual: esas filas no se leen
+#     fila              → solo dentro de los bloques distintos
+#   Así el costo depende de lo que cambió, no del tamaño del documento.
+# - Resultado por tabla emparejada: filas modificadas (con sus celdas
+#   antes / después), agregadas y eliminadas (con su texto), y cambio de
+#   columnas / encabezado. Tablas nuevas / eliminadas se describen por
+#   su id y su fila de encabezado (no por la clave hex).
+# - Emparejamiento: por clave, luego por id; si no, en orden entre
+#   tablas Word del mismo ancho o tablas Excel de la misma hoja. Los
+#   excels se emparejan solo por nombre.
+#
+# Tablas que solo traen huellas (sin "filas") quedan en rangos de filas
+# distintas: sin el contenido no se puede bajar a fila / columna.
+# ======================================================================
+
+import hashlib
+import json
+
+from plantillas_documentos_tecnicos.huellas_tablas import (
+    clave_tabla,
+    con_huellas,
+    fila_encabezado,
+)
+
+# Cambia cuando cambia la forma del resultado (invalida los diffs
+# guardados, ver diffs_versiones.py)
+VERSION_DIFF = "2"
+
+# Máximo de filas listadas por tabla (el resto solo se cuenta)
+LIMITE_FILAS_DETALLE = 50
+
+# Largo máximo del texto de una fila en el resultado
+LARGO_TEXTO_FILA = 160
+
+
+def _lista(valor):
+    return valor if isinstance(valor, list) else []
+
+
+def _texto_fila(fila) -> str:
+    """Celdas no vacías de la fila separadas por " | " (recortado)."""
+    if not isinstance(fila, list):
+        return ""
+    texto = " | ".join(str(c).strip() for c in fila if c not in (None, "") and str(c).strip())
+    if len(texto) > LARGO_TEXTO_FILA:
+        texto = texto[:LARGO_TEXTO_FILA - 1] + "…"
+    return texto
+
+
+def _celda(fila, j):
+    return fila[j] if j < len(fila) else None
+
+
+def _digest(obj) -> str:
+    texto = json.dumps(obj, sort_keys=True, ensure_ascii=False,
+                       separators=(",", ":"), default=str)
+    return hashlib.blake2b(texto.encode("utf-8"), digest_size=16).hexdigest()
+
+
+# ======================================================================
+# ÁRBOL DE HASHES
+# ======================================================================
+def _id_tabla_word(t):
+    return f"{t.get('origen') or 'document'}#{t.get('index')}"
+
+
+def _id_tabla_excel(t):
+    return f"{t.get('worksheet')}!{t.get('tabla') or t.get('rango')}"
+
+
+def _nodo_tabla(tabla, identidad):
+    reducida = con_huellas(tabla)
+    huellas = reducida["huellas"]
+    return {
+        "id": identidad,
+        "clave": clave_tabla(reducida),
+        "n_filas": tabla.get("n_filas", 0),
+        "n_columnas": tabla.get("n_columnas", 0),
+        "filas_por_bloque": huellas.get("filas_por_bloque", 1),
+        "bloques": huellas.get("bloques") or [],
+    }
+
+
+def arbol_estructura(estructura) -> dict:
+    """
+    Árbol de hashes de tablas_word y excels (sirve con filas completas o
+    con huellas; ambas formas dan el mismo árbol).
+    """
+    if not isinstance(estructura, dict):
+        estructura = {}
+
+    tablas_word = [
+        _nodo_tabla(t, _id_tabla_word(t))
+        for t in _lista(estructura.get("tablas_word")) if isinstance(t, dict)
+    ]
+
+    excels = []
+    for e in _lista(estructura.get("excels")):
+        if not isinstance(e, dict):
+            continue
+        nodos = [
+            _nodo_tabla(t, _id_tabla_excel(t))
+            for t in _lista(e.get("tablas")) if isinstance(t, dict)
+        ]
+        atributos = {k: v for k, v in e.items() if k != "tablas"}
+        excels.append({
+            "excel": e.get("excel"),
+            "clave": _digest({**atributos, "tablas": [n["clave"] for n in nodos]}),
+            "tablas": nodos,
+        })
+
+    return {"tablas_word": tablas_word, "excels": excels}
+
+
+# ======================================================================
+# EMPAREJAMIENTO
+# ======================================================================
+def _emparejar(nodos_a, nodos_b, clave, identidad, grupo=None):
+    """
+    (pares, solo_a, solo_b) entre dos listas de nodos, en orden:
+      1) misma clave          → iguales, no se devuelven
+      2) misma identidad      → par (misma tabla, contenido distinto)
+      3) en orden, mismo grupo (ancho de la tabla Word, hoja del Excel)
+         → par; sin grupo no hay este paso
+    Devuelve índices de las listas originales.
+    """
+    claves_b = {}
+    for j, n in enumerate(nodos_b):
+        claves_b.setdefault(clave(n), []).append(j)
+
+    libres_a, usados_b = [], set()
+    for i, n in enumerate(nodos_a):
+        candidatos = claves_b.get(clave(n))
+        if candidatos:
+            usados_b.add(candidatos.pop(0))
+        else:
+            libres_a.append(i)
+    libres_b = [j for j in range(len(nodos_b)) if j not in usados_b]
+
+    pares = []
+    por_id = {}
+    for j in libres_b:
+        por_id.setdefault(identidad(nodos_b[j]), []).append(j)
+    sin_par = []
+    for i in libres_a:
+        candidatos = por_id.get(identidad(nodos_a[i]))
+        if candidatos:
+            j = candidatos.pop(0)
+            pares.append((i, j))
+            libres_b.remove(j)
+        else:
+            sin_par.append(i)
+
+    if grupo is None:
+        return sorted(pares), sin_par, libres_b
+
+    solo_a = []
+    desde = 0
+    for i in sin_par:
+        g = grupo(nodos_a[i])
+        j = next(
+            (j for j in libres_b[desde:] if grupo(nodos_b[j]) == g),
+            None,
+        )
+        if j is None:
+            solo_a.append(i)
+            continue
+        pares.append((i, j))
+        desde = libres_b.index(j)
+        libres_b.remove(j)
+
+    return sorted(pares), solo_a, libres_b
+
+
+# ======================================================================
+# DIFF DE UNA TABLA
+# ======================================================================
+def _rangos_distintos(nodo_a, nodo_b):
+    """
+    [(desde_a, hasta_a, desde_b, hasta_b)] de filas que pueden diferir,
+    según los bloques de Merkle. Sin bloques comparables: toda la tabla.
+    """
+    n_a, n_b = nodo_a.get("n_filas", 0), nodo_b.get("n_filas", 0)
+    bloques_a, bloques_b = nodo_a.get("bloques") or [], nodo_b.get("bloques") or []
+    fpb = nodo_a.get("filas_por_bloque", 1)
+
+    if not bloques_a or not bloques_b or fpb != nodo_b.get("filas_por_bloque", 1):
+        return [(0, n_a, 0, n_b)]
+
+    if n_a == n_b:
+        rangos = []
+        for k, (x, y) in enumerate(zip(bloques_a, bloques_b)):
+            if x == y:
+                continue
+            desde, hasta = k * fpb, min((k + 1) * fpb, n_a)
+            if rangos and rangos[-1][1] == desde:
+                rangos[-1] = (rangos[-1][0], hasta, rangos[-1][2], hasta)
+            else:
+                rangos.append((desde, hasta, desde, hasta))
+        return rangos
+
+    # Distinto largo: se saltan los bloques iniciales iguales
+    iguales = 0
+    for x, y in zip(bloques_a, bloques_b):
+        if x != y:
+            break
+        iguales += 1
+    desde = min(iguales * fpb, n_a, n_b)
+    return [(desde, n_a, desde, n_b)]
+
+
+def _columnas_distintas(fila_a, fila_b):
+    ancho = max(len(fila_a), len(fila_b))
+    return [
+        j for j in range(ancho)
+        if (fila_a[j] if j < len(fila_a) else None) != (fila_b[j] if j < len(fila_b) else None)
+    ]
+
+
+def _diff_filas(filas_a, filas_b, desde_a, hasta_a, desde_b, hasta_b, salida):
+    """
+    Diff de un tramo: se recortan prefijo y sufijo iguales y el resto se
+    empareja por posición (modificadas); lo que sobra es agregado /
+    eliminado. Índices de fila absolutos (de la versión actual "a").
+    """
+    while desde_a < hasta_a and desde_b < hasta_b and filas_a[desde_a] == filas_b[desde_b]:
+        desde_a += 1
+        desde_b += 1
+    while hasta_a > desde_a and hasta_b > desde_b and filas_a[hasta_a - 1] == filas_b[hasta_b - 1]:
+        hasta_a -= 1
+        hasta_b -= 1
+
+    comunes = min(hasta_a - desde_a, hasta_b - desde_b)
+    for k in range(comunes):
+        fila_a, fila_b = filas_a[desde_a + k], filas_b[desde_b + k]
+        if fila_a != fila_b:
+            columnas = _columnas_distintas(fila_a, fila_b)
+            salida["filas_modificadas"].append({
+                "fila": desde_a + k,
+                "columnas": columnas,
+                "celdas": [
+                    {"columna": j, "antes": _celda(fila_b, j), "despues": _celda(fila_a, j)}
+                    for j in columnas
+                ],
+            })
+    salida["filas_agregadas"].extend(
+        {"fila": i, "texto": _texto_fila(filas_a[i])}
+        for i in range(desde_a + comunes, hasta_a)
+    )
+    salida["filas_eliminadas"].extend(
+        {"fila": i, "texto": _texto_fila(filas_b[i])}
+        for i in range(desde_b + comunes, hasta_b)
+    )
+
+
+def diff_tabla(nodo_a, nodo_b, tabla_a=None, tabla_b=None) -> dict:
+    """
+    Diferencias entre dos versiones de la misma tabla (a = actual,
+    b = anterior). Con las filas de ambas baja a fila / columna; si no,
+    entrega los rangos de filas cuyo bloque cambió.
+    """
+    salida = {
+        "tabla": nodo_a.get("id"),
+        "antes": {"n_filas": nodo_b.get("n_filas"), "n_columnas": nodo_b.get("n_columnas")},
+        "despues": {"n_filas": nodo_a.get("n_filas"), "n_columnas": nodo_a.get("n_columnas")},
+    }
+    rangos = _rangos_distintos(nodo_a, nodo_b)
+
+    filas_a = (tabla_a or {}).get("filas")
+    filas_b = (tabla_b or {}).get("filas")
+    if not isinstance(filas_a, list) or not isinstance(filas_b, list):
+        salida["rangos_distintos"] = [[d, h] for d, h, _, _ in rangos]
+        return salida
+
+    salida.update({"filas_modificadas": [], "filas_agregadas": [], "filas_eliminadas": []})
+    for desde_a, hasta_a, desde_b, hasta_b in rangos:
+        _diff_filas(filas_a, filas_b, desde_a, hasta_a, desde_b, hasta_b, salida)
+
+    columnas = set()
+    for m in salida["filas_modificadas"]:
+        columnas.update(m["columnas"])
+    salida["columnas_cambiadas"] = sorted(columnas)
+
+    if filas_a and filas_b and filas_a[0] != filas_b[0]:
+        encabezado_a, encabezado_b = filas_a[0], filas_b[0]
+        salida["encabezado"] = [
+            {"columna": j, "antes": _celda(encabezado_b, j), "despues": _celda(encabezado_a, j)}
+            for j in _columnas_distintas(encabezado_a, encabezado_b)
+        ]
+
+    # Totales reales; las listas se cortan en LIMITE_FILAS_DETALLE
+    salida["totales"] = {}
+    for campo in ("filas_modificadas", "filas_agregadas", "filas_eliminadas"):
+        salida["totales"][campo] = len(salida[campo])
+        del salida[campo][LIMITE_FILAS_DETALLE:]
+    return salida
+
+
+# ======================================================================
+# DIFF DE SECCIONES
+# ======================================================================
+def _por_clave(nodo):
+    return nodo["clave"]
+
+
+def _por_id(nodo):
+    return nodo["id"]
+
+
+def _ancho(nodo):
+    return nodo.get("n_columnas")
+
+
+def _hoja(nodo):
+    # id de tabla Excel: "hoja!tabla" o "hoja!rango"
+    return nodo["id"].rsplit("!", 1)[0]
+
+
+def _descripcion(nodo, tabla):
+    """id de la tabla + su fila de encabezado, para tablas sin par."""
+    encabezado = _texto_fila(fila_encabezado(tabla))
+    return f"{nodo['id']}: {encabezado}" if encabezado else nodo["id"]
+
+
+def _diff_tablas(nodos_a, nodos_b, tablas_a, tablas_b, grupo):
+    pares, solo_a, solo_b = _emparejar(nodos_a, nodos_b, _por_clave, _por_id, grupo)
+
+    def tabla(tablas, i):
+        return tablas[i] if i < len(tablas) else None
+
+    return {
+        "nuevas": [_descripcion(nodos_a[i], tabla(tablas_a, i)) for i in sorted(solo_a)],
+        "eliminadas": [_descripcion(nodos_b[j], tabla(tablas_b, j)) for j in sorted(solo_b)],
+        "modificadas": [
+            diff_tabla(nodos_a[i], nodos_b[j], tabla(tablas_a, i), tabla(tablas_b, j))
+            for i, j in pares
+        ],
+    }
+
+
+def _tablas_dict(lista):
+    return [t for t in _lista(lista) if isinstance(t, dict)]
+
+
+def diff_tablas_word(estructura_a, estructura_b, arbol_a=None, arbol_b=None) -> dict:
+    """{"nuevas", "eliminadas", "modificadas"} de tablas_word (a = actual)."""
+    arbol_a = arbol_a or arbol_estructura(estructura_a)
+    arbol_b = arbol_b or arbol_estructura(estructura_b)
+    return _diff_tablas(
+        arbol_a["tablas_word"], arbol_b["tablas_word"],
+        _tablas_dict((estructura_a or {}).get("tablas_word")),
+        _tablas_dict((estructura_b or {}).get("tablas_word")),
+        _ancho,
+    )
+
+
+def diff_excels(estructura_a, estructura_b, arbol_a=None, arbol_b=None) -> dict:
+    """
+    {"nuevos", "eliminados", "modificados"} de excels embebidos (por
+    nombre). Un excel con el mismo nombre y distinto contenido va a
+    "modificados", con el diff de sus tablas emparejadas por hoja.
+    """
+    arbol_a = arbol_a or arbol_estructura(estructura_a)
+    arbol_b = arbol_b or arbol_estructura(estructura_b)
+    nodos_a, nodos_b = arbol_a["excels"], arbol_b["excels"]
+
+    excels_a = [e for e in _lista((estructura_a or {}).get("excels")) if isinstance(e, dict)]
+    excels_b = [e for e in _lista((estructura_b or {}).get("excels")) if isinstance(e, dict)]
+
+    pares, solo_a, solo_b = _emparejar(
+        nodos_a, nodos_b, _por_clave, lambda n: n["excel"]
+    )
+
+    modificados = []
+    for i, j in pares:
+        tablas = _diff_tablas(
+            nodos_a[i]["tablas"], nodos_b[j]["tablas"],
+            _tablas_dict(excels_a[i].get("tablas")) if i < len(excels_a) else [],
+            _tablas_dict(excels_b[j].get("tablas")) if j < len(excels_b) else [],
+            _hoja,
+        )
+        modificados.append({"excel": nodos_a[i]["excel"], **tablas})
+
+    return {
+        "nuevos": sorted(str(nodos_a[i]["excel"]) for i in solo_a),
+        "eliminados": sorted(str(nodos_b[j]["excel"]) for j in solo_b),
+        "modificados": modificados,
+    }
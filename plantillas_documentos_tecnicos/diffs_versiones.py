@@ -0,0 +1,96 @@
+# ======================================================================
+# diffs_versiones.py — Diffs persistidos entre versiones de plantilla
+# - Una versión subida no cambia: el diff (comparar_estructuras) entre
+#   dos versiones se calcula una vez y queda en plantilla_diff_version
+#   (DiffVersionPlantilla), por par (version_id, version_anterior_id)
+# - subir_plantilla lo calcula contra la versión que reemplaza
+# - Pares sin diff guardado (versiones antiguas, pares pedidos a mano)
+#   se calculan y guardan la primera vez que se consultan
+# - Filas con otra VERSION_DIFF se recalculan como si no existieran
+# ======================================================================
+
+import logging
+
+from django.db import DatabaseError, connection
+from django.db.models import Q
+
+from plantillas_documentos_tecnicos.diff_estructuras import VERSION_DIFF
+from plantillas_documentos_tecnicos.formato_estructura import (
+    cargar_digests_version,
+    cargar_estructura_version,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def calcular_diff_versiones(cursor, version_id, version_anterior_id,
+                            estructura_actual=None) -> dict:
+    """
+    comparar_estructuras() entre dos versiones guardadas. Si los digests
+    dicen que no hay cambios no se carga ningún payload.
+    estructura_actual: la estructura completa de version_id, si ya se tiene.
+    """
+    from plantillas_documentos_tecnicos.views import (
+        comparar_estructuras,
+        sin_cambios_estructurales,
+    )
+
+    digests_actual = cargar_digests_version(cursor, version_id)
+    digests_anterior = cargar_digests_version(cursor, version_anterior_id)
+
+    if sin_cambios_estructurales(digests_actual, digests_anterior):
+        estructura_actual = estructura_anterior = {}
+    else:
+        if estructura_actual is None:
+            estructura_actual = cargar_estructura_version(cursor, version_id) or {}
+        estructura_anterior = cargar_estructura_version(cursor, version_anterior_id) or {}
+
+    return comparar_estructuras(
+        estructura_actual, estructura_anterior, digests_actual, digests_anterior
+    )
+
+
+def guardar_diff_versiones(version_id, version_anterior_id, diff):
+    from plantillas_documentos_tecnicos.models import DiffVersionPlantilla
+
+    DiffVersionPlantilla.objects.update_or_create(
+        version_id=version_id,
+        version_anterior_id=version_anterior_id,
+        defaults={"version_diff": VERSION_DIFF, "diff_json": diff},
+    )
+
+
+def obtener_diff_versiones(version_id, version_anterior_id) -> dict:
+    """
+    Diff guardado del par; si no existe (o es de otra VERSION_DIFF) se
+    calcula y se guarda.
+    """
+    from plantillas_documentos_tecnicos.models import DiffVersionPlantilla
+
+    guardado = (
+        DiffVersionPlantilla.objects
+        .filter(version_id=version_id, version_anterior_id=version_anterior_id)
+        .values_list("version_diff", "diff_json")
+        .first()
+    )
+    if guardado is not None and guardado[0] == VERSION_DIFF:
+        return guardado[1]
+
+    with connection.cursor() as cursor:
+        diff = calcular_diff_versiones(cursor, version_id, version_anterior_id)
+
+    try:
+        guardar_diff_versiones(version_id, version_anterior_id, diff)
+    except DatabaseError:
+        # Sin guardar igual sirve; se reintenta en la próxima consulta
+        logger.exception("No se pudo guardar el diff %s → %s", version_anterior_id, version_id)
+    return diff
+
+
+def borrar_diffs_version(version_id):
+    """Borra los diffs donde participa la versión (al eliminarla)."""
+    from plantillas_documentos_tecnicos.models import DiffVersionPlantilla
+
+    DiffVersionPlantilla.objects.filter(
+        Q(version_id=version_id) | Q(version_anterior_id=version_id)
+    ).delete()
@@ -0,0 +1,401 @@
+# ======================================================================
+# ejecutor_extraccion.py — generar_estructura() fuera del hilo web
+# - Pool acotado de procesos trabajadores (se reutilizan entre trabajos)
+# - Timeout por trabajo y tope de memoria (RSS) por proceso: el proceso
+#   que se pasa se mata y se reemplaza, el worker web queda libre
+# - Cola acotada: si está llena el trabajo se rechaza (EjecutorSaturado)
+# - Métricas: profundidad de cola, en ejecución, rechazos, timeouts...
+# - Opcional (EXTRACCION_PROCESOS > 0, apagado por defecto): cada
+#   proceso web arma su propio pool, o sea workers × EXTRACCION_PROCESOS
+#   procesos Python extra, y la request que lo usa espera el resultado
+# ======================================================================
+
+import atexit
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from plantillas_documentos_tecnicos.leer_estructura_plantilla_word import (
+    SECCIONES,
+    EstructuraDocumento,
+    fuente_rebobinable,
+    generar_estructura,
+    leer_bytes_fuente,
+    nombre_fuente,
+    resolver_perfil,
+)
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Cada cuánto se revisa tiempo / memoria del proceso mientras trabaja
+INTERVALO_REVISION_S = 0.05
+
+_PAGINA = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+# ======================================================================
+# ERRORES
+# ======================================================================
+class ErrorExtraccion(Exception):
+    """Error al extraer la estructura en un proceso trabajador."""
+
+
+class EjecutorSaturado(ErrorExtraccion):
+    """Todos los procesos ocupados y la cola llena."""
+
+
+class ExtraccionTiempoAgotado(ErrorExtraccion):
+    """El trabajo superó EXTRACCION_TIMEOUT_S."""
+
+
+class ExtraccionMemoriaExcedida(ErrorExtraccion):
+    """El proceso superó EXTRACCION_MAX_RSS_MB."""
+
+
+# ======================================================================
+# PROCESO TRABAJADOR
+# ======================================================================
+def _bucle_trabajador(conn):
+    """
+    Corre en el proceso hijo: recibe (bytes, secciones, nombre, huellas) y responde
+    con la estructura serializada en JSON (solo las secciones calculadas).
+    """
+    while True:
+        try:
+            trabajo = conn.recv()
+        except (EOFError, OSError):
+            return
+        if trabajo is None:
+            return
+
+        fuente, secciones, nombre, huellas = trabajo
+        try:
+            estructura = generar_estructura(
+                fuente, perfil=secciones, nombre=nombre, huellas=huellas
+            )
+            conn.send(("ok", json.dumps(estructura)))
+        except Exception as e:
+            conn.send(("error", type(e).__name__, str(e)))
+
+
+def _rss_bytes(pid):
+    """Memoria residente del proceso, o None si no se puede medir."""
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * _PAGINA
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _Trabajador:
+    def __init__(self, contexto):
+        self.conn, hijo = contexto.Pipe()
+        self.proceso = contexto.Process(
+            target=_bucle_trabajador,
+            args=(hijo,),
+            name="extraccion-docx",
+            daemon=True,
+        )
+        self.proceso.start()
+        hijo.close()
+        self.trabajos = 0
+
+    def detener(self, forzar=False):
+        try:
+            if forzar:
+                self.proceso.kill()
+            else:
+                self.conn.send(None)
+            self.proceso.join(1)
+            if self.proceso.is_alive():
+                self.proceso.kill()
+                self.proceso.join(1)
+        except Exception:
+            pass
+        finally:
+            self.conn.close()
+
+
+# ======================================================================
+# EJECUTOR
+# ======================================================================
+class EjecutorExtraccion:
+    """
+    Pool de procesos para generar_estructura(). ejecutar() bloquea solo
+    al hilo que llama y devuelve lo mismo que generar_estructura().
+    """
+
+    def __init__(
+        self,
+        max_procesos=2,
+        max_cola=8,
+        timeout_s=60,
+        espera_cola_s=30,
+        max_rss_mb=1024,
+        trabajos_por_proceso=200,
+        metodo_inicio="spawn",
+    ):
+        self.max_procesos = max(1, int(max_procesos))
+        self.max_cola = max(0, int(max_cola))
+        self.timeout_s = timeout_s
+        self.espera_cola_s = espera_cola_s
+        self.max_rss = int(max_rss_mb * 1024 * 1024) if max_rss_mb else None
+        self.trabajos_por_proceso = trabajos_por_proceso
+
+        self._contexto = multiprocessing.get_context(metodo_inicio)
+        self._cond = threading.Condition()
+        self._libres = []
+        self._vivos = 0
+        self._esperando = 0
+        self._ejecutando = 0
+        self._cerrado = False
+
+        self._stats = {
+            "completados": 0,
+            "errores": 0,
+            "rechazados": 0,
+            "timeouts": 0,
+            "excedidos_memoria": 0,
+            "procesos_reiniciados": 0,
+            "cola_maxima": 0,
+            "tiempo_total_ms": 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # Métricas
+    # ------------------------------------------------------------------
+    def _contar(self, campo, n=1):
+        with self._cond:
+            self._stats[campo] += n
+
+    def metricas(self) -> dict:
+        with self._cond:
+            datos = dict(self._stats)
+            datos.update({
+                "en_cola": self._esperando,
+                "en_ejecucion": self._ejecutando,
+                "procesos_vivos": self._vivos,
+                "procesos_libres": len(self._libres),
+                "max_procesos": self.max_procesos,
+                "max_cola": self.max_cola,
+            })
+
+        hechos = datos["completados"] + datos["errores"]
+        datos["tiempo_medio_ms"] = (
+            round(datos["tiempo_total_ms"] / hechos, 1) if hechos else 0.0
+        )
+        datos["tiempo_total_ms"] = round(datos["tiempo_total_ms"], 1)
+        return datos
+
+    # ------------------------------------------------------------------
+    # Procesos
+    # ------------------------------------------------------------------
+    def _tomar(self):
+        with self._cond:
+            if self._cerrado:
+                raise EjecutorSaturado("El ejecutor de extracción está detenido.")
+
+            if not self._libres and self._vivos >= self.max_procesos:
+                if self._esperando >= self.max_cola:
+                    self._stats["rechazados"] += 1
+                    raise EjecutorSaturado(
+                        "El servidor está procesando demasiados documentos; "
+                        "intenta nuevamente en unos segundos."
+                    )
+
+                self._esperando += 1
+                self._stats["cola_maxima"] = max(
+                    self._stats["cola_maxima"], self._esperando
+                )
+                try:
+                    hay_proceso = self._cond.wait_for(
+                        lambda: self._libres or self._vivos < self.max_procesos,
+                        timeout=self.espera_cola_s,
+                    )
+                finally:
+                    self._esperando -= 1
+
+                if not hay_proceso:
+                    self._stats["rechazados"] += 1
+                    raise EjecutorSaturado(
+                        "Tiempo de espera agotado para procesar el documento; "
+                        "intenta nuevamente en unos segundos."
+                    )
+
+            self._ejecutando += 1
+            if self._libres:
+                return self._libres.pop()
+            self._vivos += 1
+
+        try:
+            return _Trabajador(self._contexto)
+        except Exception:
+            with self._cond:
+                self._vivos -= 1
+                self._ejecutando -= 1
+                self._cond.notify()
+            raise
+
+    def _devolver(self, trabajador):
+        trabajador.trabajos += 1
+        reciclar = (
+            self.trabajos_por_proceso
+            and trabajador.trabajos >= self.trabajos_por_proceso
+        )
+
+        with self._cond:
+            self._ejecutando -= 1
+            if reciclar or self._cerrado:
+                self._vivos -= 1
+            else:
+                self._libres.append(trabajador)
+            self._cond.notify()
+
+        if reciclar or self._cerrado:
+            trabajador.detener()
+
+    def _descartar(self, trabajador):
+        trabajador.detener(forzar=True)
+        with self._cond:
+            self._ejecutando -= 1
+            self._vivos -= 1
+            self._stats["procesos_reiniciados"] += 1
+            self._cond.notify()
+
+    def _esperar_respuesta(self, trabajador, timeout_s):
+        limite = time.monotonic() + timeout_s if timeout_s else None
+        pid = trabajador.proceso.pid
+
+        while not trabajador.conn.poll(INTERVALO_REVISION_S):
+            if not trabajador.proceso.is_alive():
+                raise ErrorExtraccion(
+                    "El proceso de extracción terminó inesperadamente."
+                )
+
+            if limite is not None and time.monotonic() > limite:
+                self._contar("timeouts")
+                raise ExtraccionTiempoAgotado(
+                    f"La lectura del documento superó {timeout_s} s."
+                )
+
+            if self.max_rss:
+                rss = _rss_bytes(pid)
+                if rss is not None and rss > self.max_rss:
+                    self._contar("excedidos_memoria")
+                    raise ExtraccionMemoriaExcedida(
+                        "La lectura del documento superó el límite de memoria "
+                        f"({self.max_rss // (1024 * 1024)} MB)."
+                    )
+
+        return trabajador.conn.recv()
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+    def ejecutar(self, fuente, perfil="full", nombre=None, timeout_s=None,
+                 huellas=False):
+        """
+        Igual que generar_estructura(fuente, perfil, nombre, huellas), pero en un
+        proceso del pool. Lanza EjecutorSaturado, ExtraccionTiempoAgotado,
+        ExtraccionMemoriaExcedida o ErrorExtraccion.
+        """
+        secciones = resolver_perfil(perfil)
+        nombre = nombre_fuente(fuente, nombre)
+        datos = leer_bytes_fuente(fuente_rebobinable(fuente))
+
+        trabajador = self._tomar()
+        inicio = time.perf_counter()
+        try:
+            trabajador.conn.send((datos, secciones, nombre, huellas))
+            respuesta = self._esperar_respuesta(
+                trabajador, timeout_s or self.timeout_s
+            )
+        except BaseException:
+            self._descartar(trabajador)
+            self._contar("errores")
+            self._contar("tiempo_total_ms", (time.perf_counter() - inicio) * 1000)
+            raise
+
+        self._devolver(trabajador)
+        self._contar("tiempo_total_ms", (time.perf_counter() - inicio) * 1000)
+
+        if respuesta[0] != "ok":
+            self._contar("errores")
+            _, tipo, mensaje = respuesta
+            raise ErrorExtraccion(mensaje or tipo)
+
+        self._contar("completados")
+        estructura = json.loads(respuesta[1])
+
+        pendientes = set(SECCIONES) - secciones
+        if pendientes:
+            # Lo no calculado se carga perezosamente en este proceso
+            return EstructuraDocumento(
+                estructura, fuente=datos, pendientes=pendientes, huellas=huellas
+            )
+        return estructura
+
+    def cerrar(self):
+        with self._cond:
+            self._cerrado = True
+            libres, self._libres = self._libres, []
+            self._vivos -= len(libres)
+            self._cond.notify_all()
+
+        for trabajador in libres:
+            trabajador.detener()
+
+
+# ======================================================================
+# INSTANCIA DEL PROCESO
+# ======================================================================
+_ejecutor = None
+_ejecutor_lock = threading.Lock()
+
+
+def obtener_ejecutor():
+    """
+    Ejecutor compartido del proceso web, creado al primer uso según
+    settings. None si EXTRACCION_PROCESOS = 0 (extracción en el hilo).
+    """
+    global _ejecutor
+
+    if _ejecutor is not None:
+        return _ejecutor
+
+    procesos = getattr(settings, "EXTRACCION_PROCESOS", 0)
+    if not procesos:
+        return None
+
+    with _ejecutor_lock:
+        if _ejecutor is None:
+            _ejecutor = EjecutorExtraccion(
+                max_procesos=procesos,
+                max_cola=getattr(settings, "EXTRACCION_MAX_COLA", 8),
+                timeout_s=getattr(settings, "EXTRACCION_TIMEOUT_S", 60),
+                espera_cola_s=getattr(settings, "EXTRACCION_ESPERA_COLA_S", 30),
+                max_rss_mb=getattr(settings, "EXTRACCION_MAX_RSS_MB", 1024),
+                trabajos_por_proceso=getattr(settings, "EXTRACCION_TRABAJOS_POR_PROCESO", 200),
+                metodo_inicio=getattr(settings, "EXTRACCION_METODO_INICIO", "spawn"),
+            )
+            atexit.register(_ejecutor.cerrar)
+    return _ejecutor
+
+
+def metricas_ejecutor() -> dict:
+    ejecutor = obtener_ejecutor()
+    if ejecutor is None:
+        return {"habilitado": False}
+    return {"habilitado": True, **ejecutor.metricas()}
@@ -0,0 +1,173 @@
+# ======================================================================
+# existencia_gcs.py — ¿Qué blobs existen? en lote, con cache corta
+# - blobs_existentes(rutas) → set de las rutas que existen en el bucket
+# - Muchas rutas: UN listado (solo nombres) del prefijo común, p.ej.
+#   "Plantillas/Documentos_Tecnicos/", que queda como set
+# - Pocas rutas (GCS_EXISTENCIA_MAX_HEAD o menos): un HEAD por ruta, en
+#   paralelo
+# - Prefijo común vacío o corto (menos de GCS_EXISTENCIA_MIN_NIVELES
+#   carpetas): nunca se lista el bucket entero; las rutas se agrupan por
+#   sus primeras carpetas y cada grupo se resuelve por separado (las
+#   rutas más cortas que eso van por HEAD)
+# - Todo queda en memoria GCS_EXISTENCIA_TTL_S segundos; las vistas que
+#   suben / borran / mueven plantillas avisan (marcar_existencia,
+#   invalidar_existencia) para no mostrar datos viejos dentro del TTL
+# - Lo vencido se barre al escribir (a lo más una vez por TTL), así la
+#   cache no crece con rutas que ya nadie consulta
+# ======================================================================
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from plantillas_documentos_tecnicos.cliente_gcs import obtener_bucket
+
+_lock = threading.Lock()
+_rutas = {}      # ruta → (existe, vence)
+_listados = {}   # prefijo → (set de nombres, vence)
+_stats = {"listados": 0, "heads": 0, "hits": 0, "purgadas": 0}
+_proxima_purga = 0.0
+
+
+def _config(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def _prefijo_comun(rutas) -> str:
+    """Carpeta común más profunda de las rutas ("" si no hay)."""
+    rutas = list(rutas)
+    inicio, fin = min(rutas), max(rutas)
+    n = 0
+    while n < min(len(inicio), len(fin)) and inicio[n] == fin[n]:
+        n += 1
+    return inicio[:n].rpartition("/")[0] + "/" if "/" in inicio[:n] else ""
+
+
+def _en_cache(ruta, ahora):
+    """True / False si se sabe (vigente), None si hay que preguntar."""
+    dato = _rutas.get(ruta)
+    if dato is not None and dato[1] > ahora:
+        return dato[0]
+    for prefijo, (nombres, vence) in _listados.items():
+        if vence > ahora and ruta.startswith(prefijo):
+            return ruta in nombres
+    return None
+
+
+def _purgar_vencidos(ahora):
+    """Saca rutas y listados vencidos. Llamar con _lock tomado."""
+    global _proxima_purga
+    if ahora < _proxima_purga:
+        return
+    _proxima_purga = ahora + _config("GCS_EXISTENCIA_TTL_S", 60)
+
+    vencidas = [r for r, (_, vence) in _rutas.items() if vence <= ahora]
+    for ruta in vencidas:
+        del _rutas[ruta]
+    vencidos = [p for p, (_, vence) in _listados.items() if vence <= ahora]
+    for prefijo in vencidos:
+        del _listados[prefijo]
+    _stats["purgadas"] += len(vencidas) + len(vencidos)
+
+
+def _listar(prefijo):
+    nombres = {
+        b.name for b in obtener_bucket().list_blobs(
+            prefix=prefijo, fields="items(name),nextPageToken"
+        )
+    }
+    ahora = time.monotonic()
+    with _lock:
+        _purgar_vencidos(ahora)
+        _listados[prefijo] = (nombres, ahora + _config("GCS_EXISTENCIA_TTL_S", 60))
+        _stats["listados"] += 1
+    return nombres
+
+
+def _heads(rutas):
+    bucket = obtener_bucket()
+    rutas = list(rutas)
+    with ThreadPoolExecutor(max_workers=min(len(rutas), 8)) as pool:
+        existe = dict(zip(rutas, pool.map(lambda r: bucket.blob(r).exists(), rutas)))
+
+    ahora = time.monotonic()
+    vence = ahora + _config("GCS_EXISTENCIA_TTL_S", 60)
+    with _lock:
+        _purgar_vencidos(ahora)
+        for ruta, valor in existe.items():
+            _rutas[ruta] = (valor, vence)
+        _stats["heads"] += len(rutas)
+    return {r for r, valor in existe.items() if valor}
+
+
+def _consultar(rutas) -> set:
+    """Rutas que existen, preguntando a GCS (HEADs o listados)."""
+    if len(rutas) <= _config("GCS_EXISTENCIA_MAX_HEAD", 8):
+        return _heads(rutas)
+
+    niveles = max(1, _config("GCS_EXISTENCIA_MIN_NIVELES", 2))
+    prefijo = _prefijo_comun(rutas)
+    if prefijo.count("/") >= niveles:
+        return rutas & _listar(prefijo)
+
+    grupos = {}
+    for ruta in rutas:
+        partes = ruta.split("/")
+        carpeta = "/".join(partes[:niveles]) + "/" if len(partes) > niveles else None
+        grupos.setdefault(carpeta, set()).add(ruta)
+
+    cortas = grupos.pop(None, set())
+    existentes = _heads(cortas) if cortas else set()
+    for grupo in grupos.values():
+        existentes |= _consultar(grupo)
+    return existentes
+
+
+def blobs_existentes(rutas) -> set:
+    """Subconjunto de rutas que existen en el bucket (rutas vacías no)."""
+    rutas = {r for r in rutas if r}
+    existentes = set()
+    pendientes = set()
+
+    ahora = time.monotonic()
+    with _lock:
+        for ruta in rutas:
+            valor = _en_cache(ruta, ahora)
+            if valor is None:
+                pendientes.add(ruta)
+            elif valor:
+                existentes.add(ruta)
+        _stats["hits"] += len(rutas) - len(pendientes)
+
+    if not pendientes:
+        return existentes
+    return existentes | _consultar(pendientes)
+
+
+def marcar_existencia(ruta, existe=True):
+    """La vista acaba de subir (o borrar) este blob: actualizar la cache."""
+    ahora = time.monotonic()
+    with _lock:
+        _purgar_vencidos(ahora)
+        _rutas[ruta] = (existe, ahora + _config("GCS_EXISTENCIA_TTL_S", 60))
+        for prefijo, (nombres, _) in _listados.items():
+            if ruta.startswith(prefijo):
+                (nombres.add if existe else nombres.discard)(ruta)
+
+
+def invalidar_existencia(prefijo=""):
+    """Olvida todo lo conocido bajo prefijo (p.ej. al mover una carpeta)."""
+    with _lock:
+        for ruta in [r for r in _rutas if r.startswith(prefijo)]:
+            del _rutas[ruta]
+        for p in [p for p in _listados if p.startswith(prefijo) or prefijo.startswith(p)]:
+            del _listados[p]
+
+
+def estadisticas_existencia() -> dict:
+    with _lock:
+        datos = dict(_stats)
+        datos.update({"rutas": len(_rutas), "listados_en_cache": len(_listados)})
+    return datos
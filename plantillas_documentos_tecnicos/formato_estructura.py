@@ -0,0 +1,439 @@
+# ======================================================================
+# formato_estructura.py — Almacenamiento compacto de estructura_json
+# (tabla plantilla_estructura_version)
+#
+# Columnas:
+#   formato               0 = legado (JSONB completo en estructura_json)
+#                         1 = compacto v1 (este módulo)
+#   estructura_compacta   BYTEA: JSON compacto v1 comprimido con zlib
+#   resumen_json          JSONB pequeño: lo que usan validación y firma
+#                         estructural (nunca carga el payload completo),
+#                         + firma, digests por sección y árbol de hashes
+#                         de las tablas (diff_estructuras) precalculados
+#   tamano_json           bytes del JSON original (métricas)
+#   manifiesto_partes     JSONB: CRC-32 / tamaño de cada part del .docx
+#                         (extracción incremental al re-subir, ver
+#                         generar_estructura_incremental)
+#
+# JSON compacto v1:
+#   - listas de dicts  => columnas  {"@t": formas, "@f": forma por fila,
+#                                    "@c": {clave: columna}}
+#   - matrices (filas) => columnas  {"@m": largo por fila, "@c": [columna]}
+#   - columnas de solo strings => índices a la tabla "s" (interning)
+#   - dicts con claves "@..." propias => {"@o": dict}
+#   - todo lo demás queda tal cual
+# La decodificación devuelve exactamente el mismo dict (orden incluido).
+# ======================================================================
+
+import json
+import zlib
+
+from psycopg.types.json import Json
+
+from plantillas_documentos_tecnicos.diff_estructuras import arbol_estructura
+from plantillas_documentos_tecnicos.leer_estructura_plantilla_word import (
+    digests_estructura,
+    extract_structural_signature,
+)
+
+FORMATO_LEGADO = 0
+FORMATO_COMPACTO = 1
+
+NIVEL_ZLIB = 6
+
+
+# ======================================================================
+# CODIFICACIÓN
+# ======================================================================
+class _Codificador:
+    def __init__(self):
+        self.strings = []
+        self._indices = {}
+
+    def _interned(self, texto):
+        idx = self._indices.get(texto)
+        if idx is None:
+            idx = self._indices[texto] = len(self.strings)
+            self.strings.append(texto)
+        return idx
+
+    def columna(self, valores):
+        if valores and all(isinstance(v, str) for v in valores):
+            return {"@s": [self._interned(v) for v in valores]}
+        return [self.valor(v) for v in valores]
+
+    def valor(self, v):
+        if isinstance(v, dict):
+            salida = {k: self.valor(x) for k, x in v.items()}
+            if any(k.startswith("@") for k in v):
+                return {"@o": salida}
+            return salida
+
+        if isinstance(v, list) and v:
+            if all(isinstance(x, dict) for x in v):
+                return self._lista_dicts(v)
+            if all(isinstance(x, list) for x in v):
+                return self._matriz(v)
+            return [self.valor(x) for x in v]
+
+        return v
+
+    def _lista_dicts(self, filas):
+        formas, indice_forma = [], {}
+        por_fila = []
+        columnas = {}
+
+        for fila in filas:
+            claves = tuple(fila)
+            idx = indice_forma.get(claves)
+            if idx is None:
+                idx = indice_forma[claves] = len(formas)
+                formas.append(list(claves))
+            por_fila.append(idx)
+            for k, x in fila.items():
+                columnas.setdefault(k, []).append(x)
+
+        return {
+            "@t": formas,
+            "@f": por_fila,
+            "@c": {k: self.columna(vals) for k, vals in columnas.items()},
+        }
+
+    def _matriz(self, filas):
+        ancho = max(len(f) for f in filas)
+        columnas = [
+            self.columna([f[j] for f in filas if j < len(f)])
+            for j in range(ancho)
+        ]
+        return {"@m": [len(f) for f in filas], "@c": columnas}
+
+
+def _decodificar(v, strings):
+    if isinstance(v, list):
+        return [_decodificar(x, strings) for x in v]
+    if not isinstance(v, dict):
+        return v
+
+    if len(v) == 1 and "@o" in v:
+        return {k: _decodificar(x, strings) for k, x in v["@o"].items()}
+    if len(v) == 1 and "@s" in v:
+        return [strings[i] for i in v["@s"]]
+
+    if "@t" in v:
+        formas = v["@t"]
+        columnas = {k: iter(_decodificar(c, strings)) for k, c in v["@c"].items()}
+        return [
+            {k: next(columnas[k]) for k in formas[idx]}
+            for idx in v["@f"]
+        ]
+
+    if "@m" in v:
+        columnas = [iter(_decodificar(c, strings)) for c in v["@c"]]
+        return [
+            [next(columnas[j]) for j in range(largo)]
+            for largo in v["@m"]
+        ]
+
+    return {k: _decodificar(x, strings) for k, x in v.items()}
+
+
+def empaquetar(estructura) -> bytes:
+    """estructura (dict JSON) => bytes comprimidos en formato compacto v1."""
+    cod = _Codificador()
+    cuerpo = cod.valor(estructura)
+    compacto = {"v": FORMATO_COMPACTO, "s": cod.strings, "e": cuerpo}
+    texto = json.dumps(compacto, ensure_ascii=False, separators=(",", ":"))
+    return zlib.compress(texto.encode("utf-8"), NIVEL_ZLIB)
+
+
+def desempaquetar(datos) -> dict:
+    """Inverso de empaquetar()."""
+    compacto = json.loads(zlib.decompress(bytes(datos)).decode("utf-8"))
+    if compacto.get("v") != FORMATO_COMPACTO:
+        raise ValueError(f"Formato de estructura no soportado: {compacto.get('v')}")
+    return _decodificar(compacto["e"], compacto["s"])
+
+
+# ======================================================================
+# RESUMEN (columnas pequeñas para rutas calientes)
+# ======================================================================
+def resumir_estructura(estructura) -> dict:
+    """
+    Estructura reducida con las mismas claves que la completa, pero solo
+    lo que leen validar_contra_plantilla, extract_structural_signature,
+    evaluar_calidad_estructura y extract_aliases_from_estructura:
+      - controles: alias, tag, tipo
+      - tablas_word: n_filas, n_columnas
+      - excels: nombre y tablas (nombre, rango, tamaño y fila de encabezado)
+      - imagenes: nombre, content_type
+    + "firma" (extract_structural_signature), "digests" (digests_estructura)
+    y "arbol" (arbol_estructura) calculados sobre la estructura COMPLETA.
+    """
+    if not isinstance(estructura, dict):
+        return {}
+
+    def lista(clave):
+        valor = estructura.get(clave)
+        return [x for x in valor if isinstance(x, dict)] if isinstance(valor, list) else []
+
+    excels = []
+    for e in lista("excels"):
+        tablas = []
+        for t in e.get("tablas") or []:
+            if not isinstance(t, dict):
+                continue
+            # Tablas con huellas: la fila de encabezado viene en la muestra
+            filas = t.get("filas") or (t.get("muestra") or {}).get("inicio") or []
+            tablas.append({
+                "worksheet": t.get("worksheet"),
+                "tabla": t.get("tabla"),
+                "rango": t.get("rango"),
+                "filas": filas[:1],
+                "n_filas": t.get("n_filas"),
+                "n_columnas": t.get("n_columnas"),
+            })
+        excels.append({"excel": e.get("excel"), "tablas": tablas})
+
+    metadata = estructura.get("metadata")
+    return {
+        "controles": [
+            {"alias": c.get("alias"), "tag": c.get("tag"), "tipo": c.get("tipo")}
+            for c in lista("controles")
+        ],
+        "tablas_word": [
+            {"n_filas": t.get("n_filas", 0), "n_columnas": t.get("n_columnas", 0)}
+            for t in lista("tablas_word")
+        ],
+        "excels": excels,
+        "imagenes": [
+            {"nombre": i.get("nombre"), "content_type": i.get("content_type")}
+            for i in lista("imagenes")
+        ],
+        "metadata": {
+            "plantilla": metadata.get("plantilla") if isinstance(metadata, dict) else None,
+            "resumen": True,
+        },
+        "firma": extract_structural_signature(estructura),
+        "digests": digests_estructura(estructura),
+        "arbol": arbol_estructura(estructura),
+    }
+
+
+# ======================================================================
+# LECTURA / ESCRITURA EN plantilla_estructura_version
+# ======================================================================
+def _normalizar(estructura):
+    if isinstance(estructura, str):
+        return json.loads(estructura)
+    # Copia JSON pura (sin subclases perezosas, tuplas, etc.)
+    return json.loads(json.dumps(estructura))
+
+
+def columnas_estructura(estructura) -> dict:
+    """Valores de las columnas nuevas para una estructura completa."""
+    estructura = _normalizar(estructura)
+    texto = json.dumps(estructura, ensure_ascii=False, separators=(",", ":"))
+    return {
+        "formato": FORMATO_COMPACTO,
+        "estructura_compacta": empaquetar(estructura),
+        "resumen_json": resumir_estructura(estructura),
+        "tamano_json": len(texto.encode("utf-8")),
+    }
+
+
+def guardar_estructura_version(cursor, version_id, estructura, manifiesto=None):
+    """
+    INSERT de la estructura de una versión en formato compacto.
+    estructura_json queda NULL (el payload va en estructura_compacta).
+    manifiesto: el de generar_estructura_incremental(), si se tiene.
+    """
+    cols = columnas_estructura(estructura)
+    cursor.execute("""
+        INSERT INTO plantilla_estructura_version
+            (version_id, estructura_json, formato, estructura_compacta,
+             resumen_json, tamano_json, manifiesto_partes)
+        VALUES (%s, NULL, %s, %s, %s, %s, %s)
+    """, [
+        version_id,
+        cols["formato"],
+        cols["estructura_compacta"],
+        Json(cols["resumen_json"]),
+        cols["tamano_json"],
+        Json(manifiesto) if manifiesto is not None else None,
+    ])
+
+
+def _fila_a_estructura(formato, compacta, legado):
+    if formato == FORMATO_COMPACTO and compacta is not None:
+        return desempaquetar(compacta)
+    if isinstance(legado, str):
+        return json.loads(legado)
+    return legado
+
+
+def cargar_estructura_version(cursor, version_id):
+    """Estructura completa (dict) de una versión, o None si no existe."""
+    cursor.execute("""
+        SELECT formato, estructura_compacta, estructura_json
+        FROM plantilla_estructura_version
+        WHERE version_id = %s
+        ORDER BY id DESC LIMIT 1
+    """, [version_id])
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return _fila_a_estructura(*row)
+
+
+def cargar_resumen_version(cursor, version_id):
+    """
+    Resumen (ver resumir_estructura) de una versión, o None si no existe.
+    Solo lee resumen_json; las filas legado se resumen al vuelo.
+    """
+    cursor.execute("""
+        SELECT resumen_json,
+               CASE WHEN resumen_json IS NULL THEN estructura_json END
+        FROM plantilla_estructura_version
+        WHERE version_id = %s
+        ORDER BY id DESC LIMIT 1
+    """, [version_id])
+    row = cursor.fetchone()
+    if not row:
+        return None
+
+    resumen, legado = row
+    if resumen is not None:
+        return json.loads(resumen) if isinstance(resumen, str) else resumen
+    if isinstance(legado, str):
+        legado = json.loads(legado)
+    return resumir_estructura(legado)
+
+
+def cargar_manifiesto_version(cursor, version_id):
+    """Manifiesto de parts de una versión, o None (versión sin manifiesto)."""
+    cursor.execute("""
+        SELECT manifiesto_partes
+        FROM plantilla_estructura_version
+        WHERE version_id = %s
+        ORDER BY id DESC LIMIT 1
+    """, [version_id])
+    row = cursor.fetchone()
+    if not row or row[0] is None:
+        return None
+    return json.loads(row[0]) if isinstance(row[0], str) else row[0]
+
+
+def cargar_digests_version(cursor, version_id):
+    """
+    Digests precalculados de una versión (ver digests_estructura) con su
+    árbol de hashes en "arbol" (si lo tiene), o None.
+    """
+    cursor.execute("""
+        SELECT resumen_json -> 'digests', resumen_json -> 'arbol'
+        FROM plantilla_estructura_version
+        WHERE version_id = %s
+        ORDER BY id DESC LIMIT 1
+    """, [version_id])
+    row = cursor.fetchone()
+    if not row or row[0] is None:
+        return None
+
+    def valor(v):
+        return json.loads(v) if isinstance(v, str) else v
+
+    digests = valor(row[0])
+    digests["arbol"] = valor(row[1])
+    return digests
+
+
+def completar_resumenes(cursor, lote=50, clave="digests") -> int:
+    """
+    Recalcula resumen_json de las filas compactas cuyo resumen aún no
+    tiene `clave` (p.ej. "digests", "arbol"). Devuelve cuántas.
+    """
+    total = 0
+    while True:
+        cursor.execute("""
+            SELECT id, estructura_compacta
+            FROM plantilla_estructura_version
+            WHERE formato = %s
+              AND (resumen_json IS NULL OR NOT (resumen_json ? %s))
+            ORDER BY id
+            LIMIT %s
+        """, [FORMATO_COMPACTO, clave, lote])
+        filas = cursor.fetchall()
+        if not filas:
+            return total
+
+        for fila_id, compacta in filas:
+            cursor.execute("""
+                UPDATE plantilla_estructura_version
+                SET resumen_json = %s
+                WHERE id = %s
+            """, [Json(resumir_estructura(desempaquetar(compacta))), fila_id])
+        total += len(filas)
+
+
+def compactar_filas_legado(cursor, lote=50) -> int:
+    """
+    Pasa a formato compacto las filas con formato = 0. estructura_json se
+    conserva (ver verificar_compactas). Devuelve cuántas.
+    """
+    total = 0
+    while True:
+        cursor.execute("""
+            SELECT id, estructura_json
+            FROM plantilla_estructura_version
+            WHERE formato = %s AND estructura_json IS NOT NULL
+            ORDER BY id
+            LIMIT %s
+        """, [FORMATO_LEGADO, lote])
+        filas = cursor.fetchall()
+        if not filas:
+            return total
+
+        for fila_id, estructura in filas:
+            cols = columnas_estructura(estructura)
+            cursor.execute("""
+                UPDATE plantilla_estructura_version
+                SET formato = %s,
+                    estructura_compacta = %s,
+                    resumen_json = %s,
+                    tamano_json = %s
+                WHERE id = %s
+            """, [
+                cols["formato"],
+                cols["estructura_compacta"],
+                Json(cols["resumen_json"]),
+                cols["tamano_json"],
+                fila_id,
+            ])
+        total += len(filas)
+
+
+def verificar_compactas(cursor, lote=50) -> dict:
+    """
+    Compara estructura_compacta con estructura_json en las filas que
+    todavía tienen las dos. {"verificadas": n, "distintas": [ids]}.
+    """
+    salida = {"verificadas": 0, "distintas": []}
+    ultimo_id = 0
+    while True:
+        cursor.execute("""
+            SELECT id, estructura_compacta, estructura_json
+            FROM plantilla_estructura_version
+            WHERE formato = %s AND estructura_json IS NOT NULL AND id > %s
+            ORDER BY id
+            LIMIT %s
+        """, [FORMATO_COMPACTO, ultimo_id, lote])
+        filas = cursor.fetchall()
+        if not filas:
+            return salida
+
+        for fila_id, compacta, legado in filas:
+            if isinstance(legado, str):
+                legado = json.loads(legado)
+            if compacta is None or desempaquetar(compacta) != legado:
+                salida["distintas"].append(fila_id)
+        salida["verificadas"] += len(filas)
+        ultimo_id = filas[-1][0]
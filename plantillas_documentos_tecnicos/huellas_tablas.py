@@ -0,0 +1,205 @@
+# ======================================================================
+# huellas_tablas.py — Tablas representadas por huellas en vez de filas
+# - Huella por fila: blake2b (8 bytes) del JSON de la fila
+# - Huella de la tabla: hash acumulado (rolling) de las huellas de fila
+# - Bloques: árbol de Merkle sobre las filas, a lo más MAX_BLOQUES
+#   hojas; cuando se llenan, se combinan de a pares y cada bloque pasa
+#   a cubrir el doble de filas (filas_por_bloque = 1, 2, 4, ...)
+# - Muestra acotada: primeras MUESTRA_INICIO filas y últimas MUESTRA_FIN
+#   (si la muestra ya cubre toda la tabla no se guardan bloques)
+#
+# Se calcula fila a fila mientras se parsea (AcumuladorHuellas), así
+# memoria y tamaño del JSON no dependen del largo de la tabla. Una tabla
+# con "filas" completas y su versión con huellas dan la misma clave_tabla.
+#
+# Tabla con huellas:
+#   {..., "n_filas", "n_columnas", "origen" | "worksheet"/"tabla"/"rango",
+#    "huellas": {"tabla": hex, "filas_por_bloque": n, "bloques": [hex]},
+#    "muestra": {"inicio": [[...]], "fin": [[...]]}}
+# ======================================================================
+
+import hashlib
+import json
+from collections import deque
+
+MUESTRA_INICIO = 5
+MUESTRA_FIN = 2
+MAX_BLOQUES = 32
+
+_BYTES_FILA = 8
+_BYTES_TABLA = 16
+
+# Claves que describen el contenido; el resto (index, nombre, rango...)
+# entra tal cual a clave_tabla()
+_CLAVES_CONTENIDO = ("filas", "huellas", "muestra")
+
+
+def _h(datos, n=_BYTES_FILA):
+    return hashlib.blake2b(datos, digest_size=n).digest()
+
+
+def huella_fila(fila) -> bytes:
+    """Huella de una fila ya JSON-serializable (lista de celdas)."""
+    texto = json.dumps(fila, ensure_ascii=False, separators=(",", ":"), default=str)
+    return _h(texto.encode("utf-8"))
+
+
+class AcumuladorHuellas:
+    """
+    Recibe las filas de UNA tabla en orden (agregar) y entrega huellas,
+    muestra y tamaño (resultado). Memoria O(MAX_BLOQUES + muestra).
+    """
+
+    def __init__(self):
+        self.n_filas = 0
+        self.n_columnas = 0
+        self._tabla = hashlib.blake2b(digest_size=_BYTES_TABLA)
+        self._filas_por_bloque = 1
+        self._nivel_bloque = 0
+        self._bloques = []
+        # Pila (nivel, hash) del bloque en curso, como un contador binario
+        self._pila = []
+        self._inicio = []
+        self._fin = deque(maxlen=MUESTRA_FIN)
+
+    def agregar(self, fila):
+        if not self.n_filas:
+            self.n_columnas = len(fila)
+        self.n_filas += 1
+
+        if len(self._inicio) < MUESTRA_INICIO:
+            self._inicio.append(fila)
+        elif MUESTRA_FIN:
+            self._fin.append(fila)
+
+        h = huella_fila(fila)
+        self._tabla.update(h)
+
+        pila = self._pila
+        pila.append((0, h))
+        while len(pila) > 1 and pila[-1][0] == pila[-2][0]:
+            nivel, derecho = pila.pop()
+            _, izquierdo = pila.pop()
+            pila.append((nivel + 1, _h(izquierdo + derecho)))
+
+        if pila[0][0] == self._nivel_bloque:
+            self._bloques.append(pila.pop()[1])
+            if len(self._bloques) >= MAX_BLOQUES:
+                self._bloques = [
+                    _h(self._bloques[i] + self._bloques[i + 1])
+                    for i in range(0, len(self._bloques), 2)
+                ]
+                self._filas_por_bloque *= 2
+                self._nivel_bloque += 1
+
+    def _bloque_parcial(self):
+        if not self._pila:
+            return None
+        h = self._pila[-1][1]
+        for _, izquierdo in reversed(self._pila[:-1]):
+            h = _h(izquierdo + h)
+        return h
+
+    def resultado(self) -> dict:
+        bloques = list(self._bloques)
+        parcial = self._bloque_parcial()
+        if parcial is not None:
+            bloques.append(parcial)
+
+        # Tabla chica: la muestra ya trae todas las filas
+        if self.n_filas <= MUESTRA_INICIO + MUESTRA_FIN:
+            bloques = []
+
+        return {
+            "n_filas": self.n_filas,
+            "n_columnas": self.n_columnas,
+            "huellas": {
+                "tabla": self._tabla.hexdigest(),
+                "filas_por_bloque": self._filas_por_bloque,
+                "bloques": [b.hex() for b in bloques],
+            },
+            "muestra": {
+                "inicio": self._inicio,
+                "fin": list(self._fin),
+            },
+        }
+
+
+# ======================================================================
+# CONVERSIÓN / LECTURA
+# ======================================================================
+def tiene_huellas(tabla) -> bool:
+    return isinstance(tabla, dict) and isinstance(tabla.get("huellas"), dict)
+
+
+def con_huellas(tabla) -> dict:
+    """
+    Copia de la tabla con "filas" reemplazadas por huellas + muestra.
+    Las que ya tienen huellas (o no son dict) se devuelven tal cual.
+    """
+    if not isinstance(tabla, dict) or tiene_huellas(tabla):
+        return tabla
+
+    acumulador = AcumuladorHuellas()
+    for fila in tabla.get("filas") or []:
+        acumulador.agregar(fila)
+    calculado = acumulador.resultado()
+
+    salida = {k: v for k, v in tabla.items() if k != "filas"}
+    salida["huellas"] = calculado["huellas"]
+    salida["muestra"] = calculado["muestra"]
+    return salida
+
+
+def aplicar_huellas(estructura):
+    """
+    Pasa a huellas todas las tablas (tablas_word y tablas de excels) de
+    una estructura completa. Modifica y devuelve la misma estructura.
+    """
+    if not isinstance(estructura, dict):
+        return estructura
+
+    tablas_word = estructura.get("tablas_word")
+    if isinstance(tablas_word, list):
+        estructura["tablas_word"] = [con_huellas(t) for t in tablas_word]
+
+    excels = estructura.get("excels")
+    if isinstance(excels, list):
+        for excel in excels:
+            if isinstance(excel, dict) and isinstance(excel.get("tablas"), list):
+                excel["tablas"] = [con_huellas(t) for t in excel["tablas"]]
+
+    return estructura
+
+
+def huella_tabla(tabla):
+    """Huella (hex) del contenido de la tabla, con o sin filas completas."""
+    if not isinstance(tabla, dict):
+        return None
+    return con_huellas(tabla)["huellas"]["tabla"]
+
+
+def clave_tabla(tabla):
+    """
+    Clave estable de una tabla: sus atributos (índice, nombre, rango,
+    tamaño...) + huella del contenido. Igual para la versión con filas y
+    la versión con huellas de la misma tabla.
+    """
+    if not isinstance(tabla, dict):
+        return None
+
+    atributos = {k: v for k, v in tabla.items() if k not in _CLAVES_CONTENIDO}
+    atributos["huella"] = huella_tabla(tabla)
+    texto = json.dumps(atributos, sort_keys=True, ensure_ascii=False, default=str)
+    return _h(texto.encode("utf-8"), _BYTES_TABLA).hex()
+
+
+def fila_encabezado(tabla) -> list:
+    """Primera fila (encabezados), desde filas o desde la muestra."""
+    if not isinstance(tabla, dict):
+        return []
+    filas = tabla.get("filas")
+    if filas:
+        return filas[0]
+    inicio = (tabla.get("muestra") or {}).get("inicio")
+    return inicio[0] if inicio else []
@@ -10,14 +10,41 @@
 # ======================================================================
 
 import zipfile
+import tempfile
+import shutil
+from contextlib import contextmanager
 import xml.etree.ElementTree as ET
+from lxml import etree as lxml_etree
 from openpyxl import load_workbook
+from openpyxl.formula.translate import Translator
+from openpyxl.styles.numbers import (
+    builtin_format_code,
+    is_date_format,
+    is_timedelta_format,
+)
+from openpyxl.utils.cell import coordinate_to_tuple, range_boundaries
+from openpyxl.utils.datetime import (
+    CALENDAR_MAC_1904,
+    CALENDAR_WINDOWS_1900,
+    from_ISO8601,
+    from_excel,
+)
+from openpyxl.utils.escape import unescape
 from openpyxl.worksheet.formula import ArrayFormula
 from io import BytesIO
 import re
 import json
 import os
+import posixpath
 import datetime
+import hashlib
+
+from plantillas_documentos_tecnicos.huellas_tablas import (
+    AcumuladorHuellas,
+    clave_tabla,
+    con_huellas,
+    fila_encabezado,
+)
 
 # Namespaces Word
 NS_ALL = {
@@ -31,6 +58,15 @@ NS_W = {"w": NS_ALL["w"]}
 # Namespace Excel
 NS_XL = {"s": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
 
+# Versión del formato que produce generar_estructura().
+# Subirla cuando cambie la salida: invalida las estructuras cacheadas.
+VERSION_EXTRACTOR = "2025.2"
+
+# Parser de los part XML grandes (document / header / footer, hojas y
+# sharedStrings de Excel): "etree" (xml.etree) o "lxml". Misma salida.
+BACKENDS_XML = ("etree", "lxml")
+BACKEND_XML_DEFECTO = "etree"
+
 
 # ======================================================================
 # FIRMA ESTRUCTURAL — SE MANTIENE IGUAL
@@ -93,6 +129,155 @@ def extract_structural_signature(estructura: dict) -> dict:
     return firma
 
 
+# ======================================================================
+# DIGESTS POR SECCIÓN
+# Se calculan una vez al guardar la versión (van en resumen_json) para
+# que comparar / validar / versionar partan con una igualdad O(1):
+#   firma       → digest de extract_structural_signature()
+#   secciones   → por sección, digest del conjunto de claves que compara
+#                 comparar_estructuras (alias, clave_tabla, excel, imagen)
+#   validacion  → por sección, digest de lo que mira
+#                 validar_contra_plantilla (+ "total")
+# Una estructura que trae "digests" (resumen de BD) los usa tal cual.
+# Igual digest => esa parte no tiene diferencias.
+# ======================================================================
+def digest_json(obj) -> str:
+    texto = json.dumps(obj, sort_keys=True, ensure_ascii=False,
+                       separators=(",", ":"), default=str)
+    return hashlib.blake2b(texto.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _lista(valor):
+    return valor if isinstance(valor, list) else []
+
+
+def _clave_dict(d):
+    if not isinstance(d, dict):
+        return None
+    try:
+        return json.dumps(d, sort_keys=True)
+    except Exception:
+        return str(d)
+
+
+def clave_excel(excel):
+    """Excel = sus atributos + clave_tabla de cada tabla."""
+    if not isinstance(excel, dict):
+        return None
+    return _clave_dict({
+        **{k: v for k, v in excel.items() if k != "tablas"},
+        "tablas": [clave_tabla(t) for t in _lista(excel.get("tablas"))],
+    })
+
+
+def _clave_control(item):
+    if isinstance(item, dict):
+        return item.get("alias") or item.get("tag")
+    if isinstance(item, str):
+        return item.strip()
+    return None
+
+
+_FUNCIONES_CLAVE = {
+    "controles": _clave_control,
+    "tablas_word": clave_tabla,
+    "excels": clave_excel,
+    "imagenes": _clave_dict,
+}
+
+
+def claves_seccion(estructura, seccion) -> set:
+    """Set de claves de UNA sección, tal como las compara comparar_estructuras()."""
+    if not isinstance(estructura, dict):
+        return set()
+    funcion = _FUNCIONES_CLAVE[seccion]
+    return {k for k in map(funcion, _lista(estructura.get(seccion))) if k}
+
+
+def claves_secciones(estructura) -> dict:
+    """
+    {sección: set de claves} de todas las secciones comparables.
+    Tablas por huella: da lo mismo si vienen con filas o con huellas.
+    """
+    return {seccion: claves_seccion(estructura, seccion) for seccion in _FUNCIONES_CLAVE}
+
+
+def proyeccion_validacion(estructura) -> dict:
+    """Lo único que compara validar_contra_plantilla(), en forma canónica."""
+    if not isinstance(estructura, dict):
+        estructura = {}
+
+    excels = {}
+    for e in _lista(estructura.get("excels")):
+        if not isinstance(e, dict):
+            continue
+        tablas = {
+            t.get("tabla"): [len(fila_encabezado(t)), t.get("n_filas")]
+            for t in _lista(e.get("tablas")) if isinstance(t, dict)
+        }
+        excels[e.get("excel")] = sorted(tablas.items(), key=lambda x: str(x[0]))
+
+    return {
+        "tablas_word": sorted({
+            (t.get("n_filas", 0), t.get("n_columnas", 0))
+            for t in _lista(estructura.get("tablas_word")) if isinstance(t, dict)
+        }, key=str),
+        "excels": sorted(excels.items(), key=lambda x: str(x[0])),
+        "imagenes": sorted({
+            str(i.get("nombre")) for i in _lista(estructura.get("imagenes"))
+            if isinstance(i, dict)
+        }),
+    }
+
+
+def _digests_validacion(estructura) -> dict:
+    validacion = {
+        seccion: digest_json(valor)
+        for seccion, valor in proyeccion_validacion(estructura).items()
+    }
+    validacion["total"] = digest_json(validacion)
+    return validacion
+
+
+def digests_estructura(estructura) -> dict:
+    """Firma + digests por sección de una estructura completa."""
+    firma = extract_structural_signature(estructura)
+    secciones = {
+        seccion: digest_json(sorted(claves))
+        for seccion, claves in claves_secciones(estructura).items()
+    }
+
+    return {
+        "firma": digest_json(firma),
+        "secciones": secciones,
+        "validacion": _digests_validacion(estructura),
+    }
+
+
+def digest_validacion(estructura) -> str:
+    """
+    Digest "total" de validación. Solo toca tablas_word, excels e
+    imagenes, así que sirve con una estructura de perfil "validation".
+    """
+    if isinstance(estructura, dict) and isinstance(estructura.get("digests"), dict):
+        return estructura["digests"]["validacion"]["total"]
+    return _digests_validacion(estructura)["total"]
+
+
+def firma_de(estructura) -> dict:
+    """Firma estructural precalculada (estructura["firma"]) o al vuelo."""
+    if isinstance(estructura, dict) and isinstance(estructura.get("firma"), dict):
+        return estructura["firma"]
+    return extract_structural_signature(estructura)
+
+
+def digest_firma(estructura) -> str:
+    """Digest de la firma estructural (precalculado si viene en "digests")."""
+    if isinstance(estructura, dict) and isinstance(estructura.get("digests"), dict):
+        return estructura["digests"]["firma"]
+    return digest_json(firma_de(estructura))
+
+
 # ======================================================================
 # JSON-SAFE
 # ======================================================================
@@ -104,6 +289,164 @@ def json_safe(obj):
     return str(obj)
 
 
+# ======================================================================
+# ENTRADA: ruta, bytes, memoryview, UploadedFile o file-like
+# ======================================================================
+# Tope en memoria antes de que un stream no rebobinable pase a disco
+MAX_BYTES_EN_MEMORIA = 32 * 1024 * 1024
+
+
+def _es_ruta(fuente):
+    return isinstance(fuente, (str, os.PathLike))
+
+
+def _es_bytes(fuente):
+    return isinstance(fuente, (bytes, bytearray, memoryview))
+
+
+def _rebobinable(archivo):
+    try:
+        return bool(archivo.seekable())
+    except Exception:
+        return hasattr(archivo, "seek") and hasattr(archivo, "tell")
+
+
+def nombre_fuente(fuente, nombre=None):
+    """
+    Nombre de archivo para metadata.plantilla: el explícito, la ruta, o el
+    .name de un UploadedFile / archivo abierto.
+    """
+    if nombre:
+        return os.path.basename(str(nombre))
+    if _es_ruta(fuente):
+        return os.path.basename(fuente)
+    nombre_attr = getattr(fuente, "name", None)
+    if isinstance(nombre_attr, str) and nombre_attr:
+        return os.path.basename(nombre_attr)
+    return None
+
+
+def fuente_rebobinable(fuente):
+    """
+    Devuelve una fuente que se puede leer más de una vez: rutas, bytes y
+    archivos con seek() se usan tal cual; un stream sin seek() se copia a
+    un SpooledTemporaryFile (memoria hasta MAX_BYTES_EN_MEMORIA).
+    """
+    if _es_ruta(fuente) or _es_bytes(fuente) or _rebobinable(fuente):
+        return fuente
+
+    spool = tempfile.SpooledTemporaryFile(max_size=MAX_BYTES_EN_MEMORIA)
+    if hasattr(fuente, "chunks"):
+        for chunk in fuente.chunks():
+            spool.write(chunk)
+    else:
+        shutil.copyfileobj(fuente, spool)
+    spool.seek(0)
+    return spool
+
+
+def leer_bytes_fuente(fuente) -> bytes:
+    """Contenido completo de la fuente; deja los archivos rebobinados."""
+    if _es_ruta(fuente):
+        with open(fuente, "rb") as f:
+            return f.read()
+    if _es_bytes(fuente):
+        return bytes(fuente)
+
+    fuente.seek(0)
+    datos = fuente.read()
+    fuente.seek(0)
+    return datos
+
+
+@contextmanager
+def abrir_docx(fuente):
+    """
+    Abre el .docx como ZipFile sin escribirlo a disco. Acepta ruta,
+    bytes / bytearray / memoryview, UploadedFile de Django o cualquier
+    file-like. Los archivos quedan rebobinados al salir (para subirlos
+    después a GCS, por ejemplo).
+    """
+    origen = fuente_rebobinable(fuente)
+    propio = origen is not fuente
+
+    if _es_bytes(origen):
+        origen = BytesIO(origen)
+    elif not _es_ruta(origen):
+        origen.seek(0)
+
+    try:
+        with zipfile.ZipFile(origen) as z:
+            yield z
+    finally:
+        if propio:
+            origen.close()
+        elif not _es_ruta(fuente) and not _es_bytes(fuente):
+            try:
+                fuente.seek(0)
+            except Exception:
+                pass
+
+
+# ======================================================================
+# PARSER XML (iterparse)
+# ======================================================================
+def backend_xml() -> str:
+    """
+    settings.ESTRUCTURA_BACKEND_XML, o la variable de entorno del mismo
+    nombre si el módulo corre sin Django (scripts, procesos del pool).
+    """
+    backend = None
+    try:
+        from django.conf import settings
+        backend = getattr(settings, "ESTRUCTURA_BACKEND_XML", None)
+    except Exception:
+        pass
+    backend = backend or os.environ.get("ESTRUCTURA_BACKEND_XML") or BACKEND_XML_DEFECTO
+    if backend not in BACKENDS_XML:
+        raise ValueError(f"ESTRUCTURA_BACKEND_XML desconocido: {backend!r}")
+    return backend
+
+
+def _iterparse(fuente, events=("end",)):
+    """
+    iterparse del backend configurado. Con lxml: sin entidades ni red,
+    sin comentarios / PIs (igual que xml.etree) y sin el límite de
+    profundidad de libxml2 (SDT muy anidados).
+    """
+    if backend_xml() == "lxml":
+        return lxml_etree.iterparse(
+            fuente,
+            events=events,
+            huge_tree=True,
+            resolve_entities=False,
+            no_network=True,
+            remove_comments=True,
+            remove_pis=True,
+        )
+    return ET.iterparse(fuente, events=events)
+
+
+def _iterar_elementos(fuente, tag):
+    """
+    Entrega cada elemento `tag` ya completo y después lo libera (clear +
+    se quita de su padre), así la memoria queda acotada por el elemento
+    más grande y no por el part completo.
+    """
+    abiertos = []
+    for evento, elem in _iterparse(fuente, ("start", "end")):
+        if evento == "start":
+            abiertos.append(elem)
+            continue
+
+        abiertos.pop()
+        if elem.tag == tag:
+            yield elem
+            elem.clear()
+            if abiertos:
+                abiertos[-1].remove(elem)
+
+
 # ======================================================================
 # WORD HELPERS
 # ======================================================================
@@ -132,415 +475,1057 @@ def extract_list_entries(xml_text):
 # ======================================================================
 # CONTROLES DE CONTENIDO
 # ======================================================================
-def _extract_sdt_list_from_root(root, valores_globales):
-    controles = []
-
-    for sdt in root.findall(".//w:sdt", NS_ALL):
+def _info_props_sdt(props):
+    """
+    Lee un <w:sdtPr> y devuelve los datos del control (sin texto actual).
+    Los dropdown sin entradas propias quedan con "valores" vacío; se
+    completan con los valores globales en _completar_control().
+    """
+    alias_node = props.find("w:alias", NS_ALL)
+    tag_node = props.find("w:tag", NS_ALL)
+    id_node = props.find("w:id", NS_ALL)
+
+    alias = alias_node.get(f"{{{NS_ALL['w']}}}val") if alias_node is not None else None
+    tag = tag_node.get(f"{{{NS_ALL['w']}}}val") if tag_node is not None else None
+    cid = id_node.get(f"{{{NS_ALL['w']}}}val") if id_node is not None else None
+
+    tipo = None
+    valores_cc = []
+    checked = None
+
+    checkbox_moderno = props.find("w14:checkbox", NS_ALL)
+    checkbox_antiguo = props.find("w:checkbox", NS_ALL)
+    date_node = props.find("w:date", NS_ALL)
+    drop = props.find("w:dropDownList", NS_ALL)
+    combo = props.find("w:comboBox", NS_ALL)
+    picture = props.find("w:picture", NS_ALL)
+    richtext = props.find("w:richText", NS_ALL)
+    repeating_section = props.find("w:repeatingSection", NS_ALL)
+    repeating_item = props.find("w:repeatingSectionItem", NS_ALL)
+
+    # Dropdown
+    if drop is not None or combo is not None:
+        tipo = "dropDownList" if drop is not None else "comboBox"
+        for entry in props.findall(".//w:listEntry", NS_ALL):
+            val = entry.get(f"{{{NS_ALL['w']}}}value")
+            if val:
+                valores_cc.append(val)
+        for entry in props.findall(".//w:listItem", NS_ALL):
+            val = entry.get(f"{{{NS_ALL['w']}}}value")
+            if val:
+                valores_cc.append(val)
+
+    # Checkbox
+    elif checkbox_moderno is not None:
+        tipo = "checkbox"
+        checked_node = checkbox_moderno.find("w14:checked", NS_ALL)
+        if checked_node is not None:
+            checked = checked_node.get(f"{{{NS_ALL['w14']}}}val") == "1"
+        valores_cc = [True, False]
+
+    elif checkbox_antiguo is not None:
+        tipo = "checkbox"
+        val = checkbox_antiguo.get(f"{{{NS_ALL['w']}}}checked")
+        if val is not None:
+            checked = val == "1"
+        valores_cc = [True, False]
+
+    elif date_node is not None:
+        tipo = "date"
+
+    elif picture is not None:
+        tipo = "picture"
+
+    elif repeating_section is not None:
+        tipo = "repeatingSection"
+
+    elif repeating_item is not None:
+        tipo = "repeatingSectionItem"
+
+    elif richtext is not None:
+        tipo = "richText"
+
+    else:
+        tipo = "text"
+
+    # Inferencia
+    if alias and isinstance(alias, str) and "fecha" in alias.lower():
+        inferred_type = "date"
+    elif tipo == "dropDownList":
+        inferred_type = "dropdown"
+    elif tipo == "checkbox":
+        inferred_type = "bool"
+    else:
+        inferred_type = "text"
+
+    return {
+        "alias": alias,
+        "tag": tag,
+        "id": cid,
+        "tipo": tipo,
+        "valores": valores_cc,
+        "checked": checked,
+        "inferred_type": inferred_type,
+    }
 
-        props = sdt.find("w:sdtPr", NS_ALL)
-        if props is None:
-            continue
 
-        alias_node = props.find("w:alias", NS_ALL)
-        tag_node = props.find("w:tag", NS_ALL)
-        id_node = props.find("w:id", NS_ALL)
-
-        alias = alias_node.get(f"{{{NS_ALL['w']}}}val") if alias_node is not None else None
-        tag = tag_node.get(f"{{{NS_ALL['w']}}}val") if tag_node is not None else None
-        cid = id_node.get(f"{{{NS_ALL['w']}}}val") if id_node is not None else None
-
-        tipo = None
-        valores_cc = []
-        checked = None
-
-        checkbox_moderno = props.find("w14:checkbox", NS_ALL)
-        checkbox_antiguo = props.find("w:checkbox", NS_ALL)
-        date_node = props.find("w:date", NS_ALL)
-        drop = props.find("w:dropDownList", NS_ALL)
-        combo = props.find("w:comboBox", NS_ALL)
-        picture = props.find("w:picture", NS_ALL)
-        richtext = props.find("w:richText", NS_ALL)
-        repeating_section = props.find("w:repeatingSection", NS_ALL)
-        repeating_item = props.find("w:repeatingSectionItem", NS_ALL)
-
-        # Dropdown
-        if drop is not None or combo is not None:
-            tipo = "dropDownList" if drop is not None else "comboBox"
-            for entry in props.findall(".//w:listEntry", NS_ALL):
-                val = entry.get(f"{{{NS_ALL['w']}}}value")
-                if val:
-                    valores_cc.append(val)
-            for entry in props.findall(".//w:listItem", NS_ALL):
-                val = entry.get(f"{{{NS_ALL['w']}}}value")
-                if val:
-                    valores_cc.append(val)
-
-            if not valores_cc:
-                valores_cc = valores_globales
-
-            valores_cc = list(set(valores_cc))
-
-        # Checkbox
-        elif checkbox_moderno is not None:
-            tipo = "checkbox"
-            checked_node = checkbox_moderno.find("w14:checked", NS_ALL)
-            if checked_node is not None:
-                checked = checked_node.get(f"{{{NS_ALL['w14']}}}val") == "1"
-            valores_cc = [True, False]
-
-        elif checkbox_antiguo is not None:
-            tipo = "checkbox"
-            val = checkbox_antiguo.get(f"{{{NS_ALL['w']}}}checked")
-            if val is not None:
-                checked = val == "1"
-            valores_cc = [True, False]
-
-        elif date_node is not None:
-            tipo = "date"
-
-        elif picture is not None:
-            tipo = "picture"
-
-        elif repeating_section is not None:
-            tipo = "repeatingSection"
-
-        elif repeating_item is not None:
-            tipo = "repeatingSectionItem"
-
-        elif richtext is not None:
-            tipo = "richText"
+def _completar_control(info, texto_actual, valores_globales):
+    tipo = info["tipo"]
+    valores_cc = info["valores"]
+
+    if tipo in ("dropDownList", "comboBox"):
+        if not valores_cc:
+            valores_cc = valores_globales
+        valores_cc = list(set(valores_cc))
+
+    return {
+        "alias": info["alias"],
+        "tag": info["tag"],
+        "id": info["id"],
+        "tipo": tipo,
+        "valores": valores_cc or None,
+        "checked": info["checked"] if tipo == "checkbox" else None,
+        "inferred_type": info["inferred_type"],
+        "texto_actual": texto_actual,
+    }
 
-        else:
-            tipo = "text"
-
-        # Inferencia
-        if alias and isinstance(alias, str) and "fecha" in alias.lower():
-            inferred_type = "date"
-        elif tipo == "dropDownList":
-            inferred_type = "dropdown"
-        elif tipo == "checkbox":
-            inferred_type = "bool"
-        else:
-            inferred_type = "text"
 
-        # Valor actual
-        texto_actual = []
-        for t in sdt.findall(".//w:sdtContent//w:t", NS_ALL):
-            if t.text:
-                texto_actual.append(t.text)
-        texto_actual = "".join(texto_actual).strip() if texto_actual else None
+def _controles_finales(crudos, valores_globales, origen=None):
+    """
+    Convierte los pares (info, texto) del recorrido en la lista final de
+    controles, en orden de documento.
+    """
+    controles = []
+    for crudo in crudos:
+        if crudo is None:
+            continue
+        info, texto_actual = crudo
+        control = _completar_control(info, texto_actual, valores_globales)
+        if origen:
+            control["origen"] = origen
+        controles.append(control)
+    return controles
 
-        controles.append(
-            {
-                "alias": alias,
-                "tag": tag,
-                "id": cid,
-                "tipo": tipo,
-                "valores": valores_cc or None,
-                "checked": checked if tipo == "checkbox" else None,
-                "inferred_type": inferred_type,
-                "texto_actual": texto_actual,
-            }
-        )
 
-    return controles
+# ======================================================================
+# RECORRIDO EN UNA SOLA PASADA (iterparse) DE UN PART WORD
+# ======================================================================
+_W = f"{{{NS_ALL['w']}}}"
+
+_TAG_SDT = _W + "sdt"
+_TAG_SDTPR = _W + "sdtPr"
+_TAG_SDTCONTENT = _W + "sdtContent"
+_TAG_TBL = _W + "tbl"
+_TAG_TR = _W + "tr"
+_TAG_TC = _W + "tc"
+_TAG_P = _W + "p"
+_TAG_PPR = _W + "pPr"
+_TAG_PSTYLE = _W + "pStyle"
+_TAG_T = _W + "t"
+_TAG_FLDSIMPLE = _W + "fldSimple"
+_TAG_INSTRTEXT = _W + "instrText"
+
+_ATTR_VAL = _W + "val"
+_ATTR_INSTR = _W + "instr"
+
+# Mismas entradas que extract_list_entries(), leídas desde los atributos
+_ENTRADAS_LISTA = {
+    _W + "listEntry": _W + "value",
+    f"{{{NS_ALL['w14']}}}listEntry": f"{{{NS_ALL['w14']}}}val",
+    f"{{{NS_ALL['w15']}}}listEntry": f"{{{NS_ALL['w15']}}}val",
+    _W + "listItem": _W + "value",
+}
 
 
-def extract_content_controls_document(docx_path):
-    with zipfile.ZipFile(docx_path) as z:
-
-        xml_files = {
-            "document": read_xml_from_docx(z, "word/document.xml"),
-            "styles": read_xml_from_docx(z, "word/styles.xml"),
-            "settings": read_xml_from_docx(z, "word/settings.xml"),
-            "glossary": read_xml_from_docx(z, "word/glossary/document.xml"),
-            "numbering": read_xml_from_docx(z, "word/numbering.xml"),
+def _recorrer_part_word(fuente, controles=True, tablas=True, campos=True,
+                        parrafos=True, max_chars_por_parrafo=500, huellas=False,
+                        al_cerrar_tabla=None):
+    """
+    Recorre UNA sola vez un part XML de Word (document, header o footer)
+    con iterparse (xml.etree o lxml, ver backend_xml) y alimenta todos los
+    colectores desde el mismo flujo de eventos. Cada elemento se libera al
+    cerrarse; solo los <w:sdtPr> se conservan completos hasta leer sus
+    propiedades.
+
+    Conserva exactamente la semántica de las búsquedas ".//" anteriores
+    (orden de documento, tablas anidadas, texto de controles anidados).
+
+    huellas=True: cada fila de tabla se reduce a su huella al cerrarse y
+    solo queda la muestra (ver huellas_tablas); memoria acotada aunque la
+    tabla tenga miles de filas.
+
+    al_cerrar_tabla: función(tabla) llamada con cada tabla ya completa; si
+    devuelve True se deja de recorrer el part (validación rápida) y el
+    resultado queda parcial.
+
+    Devuelve:
+        {
+          "controles":      [(info_props, texto_actual) | None, ...],
+          "tablas_word":    [...],
+          "campos_word":    [...],
+          "parrafos":       [...],
+          "entradas_lista": set(...)   # listEntry/listItem del part
         }
+    """
+    res_controles = []
+    res_tablas = []
+    res_fld = []
+    res_instr = []
+    res_parrafos = []
+    entradas_lista = set()
+    n_parrafos = 0
+
+    # Frames abiertos que acumulan el texto de cada <w:t>
+    sdt_abiertos = []
+    contenidos_abiertos = []
+    celdas_abiertas = []
+    parrafos_abiertos = []
+    fld_abiertos = []
+
+    pila = []  # (elem, tipo_frame, frame)
+    en_sdtpr = 0
+
+    for evento, elem in _iterparse(fuente, ("start", "end")):
+        tag = elem.tag
+
+        if evento == "start":
+            attr_lista = _ENTRADAS_LISTA.get(tag)
+            if attr_lista is not None:
+                valor = elem.get(attr_lista)
+                if valor is not None:
+                    entradas_lista.add(valor)
+
+            if pila:
+                _, padre_tipo, padre_frame = pila[-1]
+            else:
+                padre_tipo = padre_frame = None
+
+            tipo = frame = None
+
+            if tag == _TAG_SDT and controles:
+                tipo = "sdt"
+                frame = {"slot": len(res_controles), "info": None,
+                         "sdtpr": False, "bloques": []}
+                res_controles.append(None)
+                sdt_abiertos.append(frame)
+
+            elif tag == _TAG_SDTPR and controles:
+                tipo = "sdtPr"
+                en_sdtpr += 1
+                # Solo el primer <w:sdtPr> hijo directo define el control
+                if padre_tipo == "sdt" and not padre_frame["sdtpr"]:
+                    padre_frame["sdtpr"] = True
+                    frame = padre_frame
+
+            elif tag == _TAG_SDTCONTENT and controles:
+                # ".//w:sdtContent//w:t" repite el texto por cada
+                # sdtContent anidado: un bloque por sdt abierto.
+                tipo = "sdtContent"
+                bloques = []
+                for sdt_frame in sdt_abiertos:
+                    bloque = []
+                    sdt_frame["bloques"].append(bloque)
+                    bloques.append(bloque)
+                contenidos_abiertos.append(bloques)
+
+            elif tag == _TAG_TBL and tablas:
+                tipo = "tbl"
+                frame = {
+                    "index": len(res_tablas) + 1,
+                    "filas": [],
+                    "n_filas": 0,
+                    "n_columnas": 0,
+                    "origen": "document",
+                }
+                if huellas:
+                    frame["acumulador"] = AcumuladorHuellas()
+                res_tablas.append(frame)
+
+            elif tag == _TAG_TR and padre_tipo == "tbl":
+                tipo = "tr"
+                frame = []
+                padre_frame["filas"].append(frame)
+
+            elif tag == _TAG_TC and padre_tipo == "tr":
+                tipo = "tc"
+                frame = {"fila": padre_frame, "pos": len(padre_frame), "textos": []}
+                padre_frame.append("")
+                celdas_abiertas.append(frame)
+
+            elif tag == _TAG_P and parrafos:
+                tipo = "p"
+                n_parrafos += 1
+                frame = {"index": n_parrafos, "estilo": None, "ppr": False,
+                         "pstyle": False, "textos": [], "slot": len(res_parrafos)}
+                res_parrafos.append(None)
+                parrafos_abiertos.append(frame)
+
+            elif tag == _TAG_PPR and padre_tipo == "p":
+                tipo = "pPr"
+                if not padre_frame["ppr"]:
+                    padre_frame["ppr"] = True
+                    frame = padre_frame
+
+            elif tag == _TAG_PSTYLE and padre_tipo == "pPr" and padre_frame is not None:
+                if not padre_frame["pstyle"]:
+                    padre_frame["pstyle"] = True
+                    padre_frame["estilo"] = elem.get(_ATTR_VAL)
+
+            elif tag == _TAG_FLDSIMPLE and campos:
+                tipo = "fld"
+                campo = {"tipo": "fldSimple", "instr": elem.get(_ATTR_INSTR), "texto": None}
+                frame = {"campo": campo, "textos": []}
+                res_fld.append(campo)
+                fld_abiertos.append(frame)
+
+            pila.append((elem, tipo, frame))
+            continue
 
-        valores_globales = []
-        for xml in xml_files.values():
-            valores_globales.extend(extract_list_entries(xml))
-        valores_globales = list(set(valores_globales))
+        # ---------------- evento "end" ----------------
+        _, tipo, frame = pila.pop()
+
+        if tag == _TAG_T:
+            texto = elem.text
+            if texto:
+                for f in parrafos_abiertos:
+                    f["textos"].append(texto)
+                for f in celdas_abiertas:
+                    f["textos"].append(texto)
+                for f in fld_abiertos:
+                    f["textos"].append(texto)
+                for bloques in contenidos_abiertos:
+                    for bloque in bloques:
+                        bloque.append(texto)
+
+        elif tipo == "sdt":
+            sdt_abiertos.pop()
+            if frame["info"] is not None:
+                textos = [t for bloque in frame["bloques"] for t in bloque]
+                texto_actual = "".join(textos).strip() if textos else None
+                res_controles[frame["slot"]] = (frame["info"], texto_actual)
+
+        elif tipo == "sdtPr":
+            en_sdtpr -= 1
+            if frame is not None:
+                frame["info"] = _info_props_sdt(elem)
+
+        elif tipo == "sdtContent":
+            contenidos_abiertos.pop()
+
+        elif tipo == "tbl":
+            if huellas:
+                calculado = frame.pop("acumulador").resultado()
+                del frame["filas"]
+                frame.update(calculado)
+            else:
+                filas = frame["filas"]
+                frame["n_filas"] = len(filas)
+                frame["n_columnas"] = len(filas[0]) if filas else 0
+            if al_cerrar_tabla is not None and al_cerrar_tabla(frame):
+                break
+
+        elif tipo == "tr" and huellas:
+            # La fila es la última de su tabla (las anidadas van en otro frame)
+            tabla = pila[-1][2]
+            tabla["filas"].pop()
+            tabla["acumulador"].agregar(frame)
+
+        elif tipo == "tc":
+            celdas_abiertas.pop()
+            frame["fila"][frame["pos"]] = "".join(frame["textos"]).strip()
+
+        elif tipo == "p":
+            parrafos_abiertos.pop()
+            txt = "".join(frame["textos"]).strip()
 
-        root_doc = ET.fromstring(xml_files["document"])
-        return _extract_sdt_list_from_root(root_doc, valores_globales)
+            if len(txt) > max_chars_por_parrafo:
+                txt = txt[:max_chars_por_parrafo] + "..."
 
+            if txt:
+                res_parrafos[frame["slot"]] = {
+                    "index": frame["index"],
+                    "estilo": frame["estilo"],
+                    "texto": txt,
+                }
 
-def extract_content_controls_headers_footers(docx_path):
+        elif tipo == "fld":
+            fld_abiertos.pop()
+            textos = frame["textos"]
+            frame["campo"]["texto"] = "".join(textos).strip() if textos else None
 
-    controles_header = []
-    controles_footer = []
+        elif tag == _TAG_INSTRTEXT and campos:
+            txt = (elem.text or "").strip()
+            if txt:
+                res_instr.append({"tipo": "instrText", "instr": txt})
+
+        # Liberar memoria: el subárbol ya fue consumido
+        if not en_sdtpr:
+            elem.clear()
+            if pila:
+                pila[-1][0].remove(elem)
+
+    return {
+        "controles": res_controles,
+        "tablas_word": res_tablas,
+        "campos_word": res_fld + res_instr,
+        "parrafos": [p for p in res_parrafos if p is not None],
+        "entradas_lista": entradas_lista,
+    }
 
-    with zipfile.ZipFile(docx_path) as z:
 
-        xml_global_candidates = [
-            read_xml_from_docx(z, "word/styles.xml"),
-            read_xml_from_docx(z, "word/settings.xml"),
-            read_xml_from_docx(z, "word/numbering.xml"),
-            read_xml_from_docx(z, "word/glossary/document.xml"),
-        ]
+def _valores_globales_comunes(z):
+    """
+    Entradas de lista definidas fuera del cuerpo (styles, settings,
+    numbering, glossary). Se usan para dropdowns sin entradas propias.
+    """
+    valores = set()
+    for path in (
+        "word/styles.xml",
+        "word/settings.xml",
+        "word/numbering.xml",
+        "word/glossary/document.xml",
+    ):
+        valores.update(extract_list_entries(read_xml_from_docx(z, path)))
+    return valores
 
-        valores_globales = []
-        for xml in xml_global_candidates:
-            valores_globales.extend(extract_list_entries(xml))
-        valores_globales = list(set(valores_globales))
-
-        for name in z.namelist():
-
-            # HEADERS
-            if name.startswith("word/header") and name.endswith(".xml"):
-                xml = read_xml_from_docx(z, name)
-                if xml:
-                    try:
-                        root = ET.fromstring(xml)
-                        sdt_list = _extract_sdt_list_from_root(root, valores_globales)
-                        for c in sdt_list:
-                            c["origen"] = os.path.basename(name)
-                        controles_header.extend(sdt_list)
-                    except Exception:
-                        pass
-
-            # FOOTERS
-            if name.startswith("word/footer") and name.endswith(".xml"):
-                xml = read_xml_from_docx(z, name)
-                if xml:
-                    try:
-                        root = ET.fromstring(xml)
-                        sdt_list = _extract_sdt_list_from_root(root, valores_globales)
-                        for c in sdt_list:
-                            c["origen"] = os.path.basename(name)
-                        controles_footer.extend(sdt_list)
-                    except Exception:
-                        pass
 
-    return controles_header, controles_footer
+def _recorrer_documento(z, **colectores):
+    if "word/document.xml" not in z.namelist():
+        return None
+    with z.open("word/document.xml") as fh:
+        return _recorrer_part_word(fh, **colectores)
 
 
-# ======================================================================
-# TABLAS NATIVAS WORD — NORMALIZADAS
-# ======================================================================
-def extract_word_tables(docx_path):
-    tablas = []
-
-    with zipfile.ZipFile(docx_path) as z:
+def _controles_headers_footers_zip(z, valores_globales, previos=None):
+    """
+    previos: {part: [controles]} de parts sin cambios (extracción
+    incremental); esos no se vuelven a parsear.
+    """
 
-        xml_doc = read_xml_from_docx(z, "word/document.xml")
-        if not xml_doc:
-            return tablas
+    controles_header = []
+    controles_footer = []
 
-        root = ET.fromstring(xml_doc)
+    for name in z.namelist():
 
-        # Enumeración de tablas Word nativas
-        for i, tbl in enumerate(root.findall(".//w:tbl", NS_ALL), start=1):
+        es_header = name.startswith("word/header") and name.endswith(".xml")
+        es_footer = name.startswith("word/footer") and name.endswith(".xml")
+        if not (es_header or es_footer):
+            continue
 
-            filas = []
+        if previos and name in previos:
+            (controles_header if es_header else controles_footer).extend(previos[name])
+            continue
 
-            # Cada fila <w:tr>
-            for r in tbl.findall("w:tr", NS_ALL):
+        try:
+            with z.open(name) as fh:
+                recorrido = _recorrer_part_word(
+                    fh, tablas=False, campos=False, parrafos=False
+                )
+        except Exception:
+            continue
 
-                celdas = []
+        sdt_list = _controles_finales(
+            recorrido["controles"], valores_globales, origen=os.path.basename(name)
+        )
+        if es_header:
+            controles_header.extend(sdt_list)
+        else:
+            controles_footer.extend(sdt_list)
 
-                # Cada celda <w:tc>
-                for c in r.findall("w:tc", NS_ALL):
+    return controles_header, controles_footer
 
-                    textos = []
 
-                    for t in c.findall(".//w:t", NS_ALL):
-                        if t.text:
-                            textos.append(t.text)
+def extract_content_controls_document(docx_path):
+    with abrir_docx(docx_path) as z:
+        valores_globales = _valores_globales_comunes(z)
+        recorrido = _recorrer_documento(z, tablas=False, campos=False, parrafos=False)
+        if recorrido is None:
+            return []
+        valores_globales |= recorrido["entradas_lista"]
+        return _controles_finales(recorrido["controles"], list(valores_globales))
 
-                    celdas.append("".join(textos).strip())
 
-                filas.append(celdas)
+def extract_content_controls_headers_footers(docx_path):
+    with abrir_docx(docx_path) as z:
+        valores_globales = list(_valores_globales_comunes(z))
+        return _controles_headers_footers_zip(z, valores_globales)
 
-            # NORMALIZACIÓN
-            n_filas = len(filas)
-            n_columnas = len(filas[0]) if filas else 0
 
-            tablas.append(
-                {
-                    "index": i,
-                    "filas": filas,
-                    "n_filas": n_filas,
-                    "n_columnas": n_columnas,
-                    "origen": "document",
-                }
-            )
+# ======================================================================
+# TABLAS NATIVAS WORD — NORMALIZADAS
+# ======================================================================
+def recorrer_tablas_word(z, al_cerrar_tabla, huellas=True):
+    """
+    Tablas de word/document.xml (docx ya abierto) pasadas una a una a
+    al_cerrar_tabla mientras se parsea; corta si devuelve True.
+    """
+    recorrido = _recorrer_documento(
+        z, controles=False, campos=False, parrafos=False,
+        huellas=huellas, al_cerrar_tabla=al_cerrar_tabla,
+    )
+    if recorrido is None:
+        raise ValueError("El archivo no contiene word/document.xml (¿es un .docx válido?).")
+    return recorrido["tablas_word"]
 
-    return tablas
 
+def extract_word_tables(docx_path, huellas=False):
+    with abrir_docx(docx_path) as z:
+        recorrido = _recorrer_documento(
+            z, controles=False, campos=False, parrafos=False, huellas=huellas
+        )
+    return recorrido["tablas_word"] if recorrido else []
 
 
 # ======================================================================
 # EXCEL EMBEBIDOS (estructura profunda)
+# - Lector directo: xl/workbook.xml, xl/tables/*.xml, sharedStrings y
+#   solo las filas de la hoja que cubren las tablas (sin load_workbook)
+# - Mismos valores que openpyxl (data_only=False): fórmulas "=...",
+#   fechas según estilo, celdas combinadas en None
+# - Casos raros (DataTableFormula, rangos de columna completa, nombres
+#   duplicados, paquetes no estándar) => openpyxl como antes
 # ======================================================================
-def extract_embedded_excel(docx_path):
-    results = []
+_XL_MAIN = NS_XL["s"]
+_XL_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_XL_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+_XL_CT = "http://schemas.openxmlformats.org/package/2006/content-types"
+
+_XL_TIPOS_WORKBOOK = (
+    "application/vnd.ms-excel.template.macroEnabled.main+xml",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.template.main+xml",
+    "application/vnd.ms-excel.sheet.macroEnabled.main+xml",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml",
+)
+_XL_TIPO_SHARED_STRINGS = (
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"
+)
+
+_XL_TAG_ROW = f"{{{_XL_MAIN}}}row"
+_XL_TAG_C = f"{{{_XL_MAIN}}}c"
+_XL_TAG_V = f"{{{_XL_MAIN}}}v"
+_XL_TAG_F = f"{{{_XL_MAIN}}}f"
+_XL_TAG_IS = f"{{{_XL_MAIN}}}is"
+_XL_TAG_SI = f"{{{_XL_MAIN}}}si"
+
+_RE_XL_TABLE_PARTS = re.compile(
+    rb"<(?:[\w.-]+:)?tableParts\b[^>]*?(?:/>|>.*?</(?:[\w.-]+:)?tableParts>)", re.S
+)
+_RE_XL_ID = re.compile(rb"\b(?:[\w.-]+:)?id=\"([^\"]*)\"")
+_RE_XL_MERGE = re.compile(rb"<(?:[\w.-]+:)?mergeCell\b[^>]*?\bref=\"([^\"]*)\"")
+
+
+class _ExcelNoSoportado(Exception):
+    """El lector directo no cubre este libro: usar openpyxl."""
+
+
+def _xl_local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _xl_parte(iz, ruta):
+    try:
+        return iz.read(ruta)
+    except KeyError:
+        raise _ExcelNoSoportado(f"falta {ruta}")
+
+
+def _xl_rels(iz, parte):
+    """{rId: (Type, destino normalizado)} de la parte (como openpyxl)."""
+    carpeta = posixpath.dirname(parte)
+    ruta_rels = posixpath.join(carpeta, "_rels", posixpath.basename(parte) + ".rels")
+    if ruta_rels not in iz.NameToInfo:
+        return {}
 
-    with zipfile.ZipFile(docx_path) as z:
+    rels = {}
+    for rel in ET.fromstring(iz.read(ruta_rels)).iter(f"{{{_XL_PKG_REL}}}Relationship"):
+        destino = rel.get("Target") or ""
+        if rel.get("TargetMode") != "External":
+            if destino.startswith("/"):
+                destino = destino[1:]
+            else:
+                destino = posixpath.normpath(posixpath.join(carpeta, destino))
+        rels[rel.get("Id")] = (rel.get("Type") or "", destino)
+    return rels
+
+
+def _xl_texto(nodo):
+    """Text.from_tree(nodo).content: <t> directo + <r><t> (sin fonética)."""
+    plano = None
+    bloques = []
+    for hijo in nodo:
+        nombre = _xl_local(hijo.tag)
+        if nombre == "t":
+            plano = hijo.text
+        elif nombre == "r":
+            texto = None
+            for sub in hijo:
+                if _xl_local(sub.tag) == "t":
+                    texto = sub.text
+            if texto is not None:
+                bloques.append(texto)
+    if plano is not None:
+        bloques.insert(0, plano)
+    return "".join(bloques)
+
+
+def _xl_shared_strings(iz, ruta):
+    if ruta is None:
+        return []
+    return [
+        _xl_texto(nodo).replace("x005F_", "")
+        for nodo in _iterar_elementos(BytesIO(_xl_parte(iz, ruta)), _XL_TAG_SI)
+    ]
 
-        excel_files = [
-            f for f in z.namelist()
-            if f.startswith("word/embeddings/") and f.endswith(".xlsx")
-        ]
 
-        for ef in excel_files:
+def _xl_formatos_fecha(iz):
+    """
+    Índices de cellXfs con formato de fecha / duración, igual que
+    Stylesheet._normalise_numbers (sin construir los estilos).
+    """
+    if "xl/styles.xml" not in iz.NameToInfo:
+        return set(), set()
+
+    raiz = ET.fromstring(iz.read("xl/styles.xml"))
+    propios = {
+        int(n.get("numFmtId")): n.get("formatCode")
+        for n in raiz.iterfind(f"{{{_XL_MAIN}}}numFmts/{{{_XL_MAIN}}}numFmt")
+    }
+    xfs = raiz.findall(f"{{{_XL_MAIN}}}cellXfs/{{{_XL_MAIN}}}xf")
+    if not xfs:
+        # Sin cellXfs openpyxl deja los estilos por defecto (sin fechas)
+        return set(), set()
+
+    fechas, duraciones = set(), set()
+    for idx, xf in enumerate(xfs):
+        num_fmt = int(xf.get("numFmtId", 0))
+        fmt = propios[num_fmt] if num_fmt in propios else builtin_format_code(num_fmt)
+        if is_date_format(fmt):
+            fechas.add(idx)
+        if is_timedelta_format(fmt):
+            duraciones.add(idx)
+    return fechas, duraciones
+
+
+def _xl_numero(valor):
+    if "." in valor or "E" in valor or "e" in valor:
+        return float(valor)
+    return int(valor)
+
+
+def _xl_valor_celda(c, ctx, formulas_compartidas):
+    """Valor de la celda tal como lo deja WorkSheetParser.parse_cell."""
+    tipo = c.get("t", "n")
+    estilo = c.get("s", 0)
+    if estilo:
+        estilo = int(estilo)
+
+    valor = None if tipo == "inlineStr" else (c.findtext(_XL_TAG_V) or None)
+
+    formula = c.find(_XL_TAG_F)
+    if formula is not None:
+        tipo_formula = formula.get("t")
+        valor = "=" + (formula.text or "")
+        if tipo_formula == "array":
+            return ArrayFormula(ref=formula.get("ref"), text=valor)
+        if tipo_formula == "shared":
+            idx = formula.get("si")
+            if idx in formulas_compartidas:
+                return formulas_compartidas[idx].translate_formula(c.get("r"))
+            if valor != "=":
+                formulas_compartidas[idx] = Translator(valor, c.get("r"))
+        elif tipo_formula == "dataTable":
+            raise _ExcelNoSoportado("dataTable")
+        return valor
+
+    if valor is not None:
+        if tipo == "n":
+            valor = _xl_numero(valor)
+            if estilo in ctx["fechas"]:
+                try:
+                    valor = from_excel(
+                        valor, ctx["epoch"], timedelta=estilo in ctx["duraciones"]
+                    )
+                except (OverflowError, ValueError):
+                    valor = "#VALUE!"
+        elif tipo == "s":
+            valor = ctx["shared_strings"][int(valor)]
+        elif tipo == "b":
+            valor = bool(int(valor))
+        elif tipo == "d":
+            valor = from_ISO8601(valor)
+        return valor
+
+    if tipo == "inlineStr":
+        nodo = c.find(_XL_TAG_IS)
+        if nodo is not None:
+            return _xl_texto(nodo)
+    return None
 
-            content = z.read(ef)
 
+def _xl_filas_hoja(datos_hoja, rangos, ctx):
+    """
+    Recorre sheetData hasta la última fila que piden los rangos y entrega
+    (fila, {col: valor}) por cada <row>, en orden y solo con las columnas
+    que caen dentro de algún rango. Filas desordenadas => openpyxl.
+    """
+    ultima_fila = max(r[3] for r in rangos)
+    formulas_compartidas = {}
+    fila_actual = 0
+
+    for elem in _iterar_elementos(BytesIO(datos_hoja), _XL_TAG_ROW):
+        anterior = fila_actual
+        r = elem.get("r")
+        if r is not None:
             try:
-                wb = load_workbook(BytesIO(content), data_only=False)
-            except Exception:
+                fila_actual = int(r)
+            except ValueError:
+                fila_actual = int(float(r))
+        else:
+            fila_actual += 1
+
+        if fila_actual > ultima_fila:
+            break
+        if fila_actual <= anterior:
+            raise _ExcelNoSoportado("filas desordenadas")
+
+        valores = {}
+        col_actual = 0
+        for c in elem:
+            if c.tag != _XL_TAG_C:
                 continue
+            coord = c.get("r")
+            if coord:
+                fila, col_actual = coordinate_to_tuple(coord)
+                if fila != fila_actual:
+                    raise _ExcelNoSoportado(coord)
+            else:
+                col_actual += 1
 
-            excel_data = {
-                "excel": ef,
-                "tablas": [],
-                "nombres_definidos": []
+            # Se evalúan todas (las fórmulas compartidas dependen del orden)
+            valor = _xl_valor_celda(c, ctx, formulas_compartidas)
+            for min_col, min_row, max_col, max_row in rangos:
+                if min_row <= fila_actual <= max_row and min_col <= col_actual <= max_col:
+                    valores[col_actual] = valor
+                    break
+
+        yield fila_actual, valores
+
+
+class _XlColector:
+    """
+    Arma las filas de UNA tabla a partir del flujo de _xl_filas_hoja:
+    completa filas ausentes, anula celdas combinadas y guarda las filas
+    completas o solo sus huellas (huellas=True).
+    """
+
+    def __init__(self, limites, combinadas, huellas=False):
+        self.min_col, self.min_row, self.max_col, self.max_row = limites
+        self.siguiente = self.min_row
+        self.combinadas = [
+            m for m in combinadas
+            if m[1] <= self.max_row and m[3] >= self.min_row
+            and m[0] <= self.max_col and m[2] >= self.min_col
+        ]
+        self.filas = []
+        self.acumulador = AcumuladorHuellas() if huellas else None
+
+    def _combinada(self, fila, col):
+        # Solo la superior izquierda conserva su valor
+        for min_col, min_row, max_col, max_row in self.combinadas:
+            if (min_row <= fila <= max_row and min_col <= col <= max_col
+                    and (fila, col) != (min_row, min_col)):
+                return True
+        return False
+
+    def _emitir(self, fila, valores):
+        celdas = [
+            None if self.combinadas and self._combinada(fila, col) else valores.get(col)
+            for col in range(self.min_col, self.max_col + 1)
+        ]
+        if self.acumulador is None:
+            self.filas.append(celdas)
+        else:
+            self.acumulador.agregar(json_sanitize_deep(celdas))
+
+    def recibir(self, fila, valores):
+        if fila < self.min_row or fila > self.max_row:
+            return
+        while self.siguiente < fila:
+            self._emitir(self.siguiente, {})
+            self.siguiente += 1
+        self._emitir(fila, valores)
+        self.siguiente = fila + 1
+
+    def cerrar(self) -> dict:
+        while self.siguiente <= self.max_row:
+            self._emitir(self.siguiente, {})
+            self.siguiente += 1
+
+        if self.acumulador is None:
+            return {
+                "filas": self.filas,
+                "n_filas": len(self.filas),
+                "n_columnas": len(self.filas[0]) if self.filas else 0
             }
 
-            # Tablas en el Excel embebido
-            for ws in wb.worksheets:
+        calculado = self.acumulador.resultado()
+        return {
+            "n_filas": calculado["n_filas"],
+            "n_columnas": calculado["n_columnas"],
+            "huellas": calculado["huellas"],
+            "muestra": calculado["muestra"],
+        }
 
-                for tbl in ws._tables.values():
 
-                    ref = tbl.ref
-                    excel_range = ws[ref]
+def _xl_tablas_directo(contenido, huellas=False):
+    """
+    Tablas de un .xlsx embebido leyendo el XML directamente.
+    huellas=True: filas reducidas a huellas + muestra (ver huellas_tablas).
+    Lanza _ExcelNoSoportado (u otra excepción) si hay que usar openpyxl.
+    """
+    with zipfile.ZipFile(BytesIO(contenido)) as iz:
+        ct = ET.fromstring(_xl_parte(iz, "[Content_Types].xml"))
+        overrides = {
+            o.get("ContentType"): o.get("PartName")
+            for o in reversed(ct.findall(f"{{{_XL_CT}}}Override"))
+        }
 
-                    filas = []
-                    for row in excel_range:
-                        filas.append([c.value for c in row])
+        ruta_wb = next(
+            (overrides[t] for t in _XL_TIPOS_WORKBOOK if t in overrides), None
+        )
+        if ruta_wb is None:
+            raise _ExcelNoSoportado("workbook")
+        ruta_wb = ruta_wb[1:]
+
+        ruta_ss = overrides.get(_XL_TIPO_SHARED_STRINGS)
+        shared_strings = _xl_shared_strings(iz, ruta_ss[1:] if ruta_ss else None)
+
+        wb = ET.fromstring(_xl_parte(iz, ruta_wb))
+        if wb.tag != f"{{{_XL_MAIN}}}workbook":
+            raise _ExcelNoSoportado("namespace")
+
+        pr = wb.find(f"{{{_XL_MAIN}}}workbookPr")
+        fecha_1904 = pr is not None and pr.get("date1904") in ("1", "true")
+
+        fechas, duraciones = _xl_formatos_fecha(iz)
+        ctx = {
+            "shared_strings": shared_strings,
+            "fechas": fechas,
+            "duraciones": duraciones,
+            "epoch": CALENDAR_MAC_1904 if fecha_1904 else CALENDAR_WINDOWS_1900,
+        }
 
-                    excel_data["tablas"].append(
-                        {
-                            "worksheet": ws.title,
-                            "tabla": tbl.name,
-                            "rango": ref,
-                            "filas": filas,
-                            "n_filas": len(filas),
-                            "n_columnas": len(filas[0]) if filas else 0
-                        }
-                    )
+        nombres_usados = {
+            (n.get("name") or "").lower()
+            for n in wb.iterfind(f"{{{_XL_MAIN}}}definedNames/{{{_XL_MAIN}}}definedName")
+            if n.get("localSheetId") is None
+        }
 
-            results.append(excel_data)
+        rels_wb = _xl_rels(iz, ruta_wb)
+        tablas = []
 
-    return results
+        for hoja in wb.iterfind(f"{{{_XL_MAIN}}}sheets/{{{_XL_MAIN}}}sheet"):
+            tipo_rel, ruta_hoja = rels_wb[hoja.get(f"{{{_XL_REL}}}id")]
+            if ruta_hoja not in iz.NameToInfo or "chartsheet" in tipo_rel:
+                continue
+            if not tipo_rel.endswith("/worksheet"):
+                raise _ExcelNoSoportado(tipo_rel)
 
+            datos_hoja = iz.read(ruta_hoja)
+            bloque = _RE_XL_TABLE_PARTS.search(datos_hoja)
+            if bloque is None:
+                continue
 
-# ======================================================================
-# IMÁGENES WORD
-# ======================================================================
-def extract_images_info(docx_path):
+            rels_hoja = _xl_rels(iz, ruta_hoja)
+            tablas_hoja = []
+            for rid in _RE_XL_ID.findall(bloque.group(0)):
+                tabla = ET.fromstring(iz.read(rels_hoja[rid.decode()][1]))
+                nombre = unescape(tabla.get("name"))
+                ref = tabla.get("ref")
 
-    imagenes = []
+                if nombre.lower() in nombres_usados:
+                    raise _ExcelNoSoportado("nombre duplicado")
+                nombres_usados.add(nombre.lower())
 
-    with zipfile.ZipFile(docx_path) as z:
+                limites = range_boundaries(ref)
+                if ":" not in ref or None in limites:
+                    raise _ExcelNoSoportado(ref)
+                tablas_hoja.append((nombre, ref, limites))
 
-        content_types_xml = read_xml_from_docx(z, "[Content_Types].xml")
-        type_map = {}
+            if not tablas_hoja:
+                continue
 
-        if content_types_xml:
-            root_ct = ET.fromstring(content_types_xml)
-            for override in root_ct.findall(
-                ".//{http://schemas.openxmlformats.org/package/2006/content-types}Override"
+            combinadas = [
+                range_boundaries(m.group(1).decode())
+                for m in _RE_XL_MERGE.finditer(datos_hoja)
+            ]
+            colectores = [
+                _XlColector(limites, combinadas, huellas)
+                for _, _, limites in tablas_hoja
+            ]
+            for fila, valores in _xl_filas_hoja(
+                datos_hoja, [t[2] for t in tablas_hoja], ctx
             ):
-                name = override.get("PartName")
-                ctype = override.get("ContentType")
-                if "/media/" in str(name):
-                    type_map[name] = ctype
-
-        for name in z.namelist():
-            if name.startswith("word/media/"):
-                part_name = "/" + name
-                imagenes.append(
+                for colector in colectores:
+                    colector.recibir(fila, valores)
+
+            for (nombre, ref, _), colector in zip(tablas_hoja, colectores):
+                tablas.append(
                     {
-                        "nombre": os.path.basename(name),
-                        "ruta": name,
-                        "content_type": type_map.get(part_name),
+                        "worksheet": hoja.get("name"),
+                        "tabla": nombre,
+                        "rango": ref,
+                        **colector.cerrar(),
                     }
                 )
 
-    return imagenes
+    return tablas
 
 
-# ======================================================================
-# CAMPOS Word
-# ======================================================================
-def extract_word_fields(docx_path):
+def _xl_tablas_openpyxl(contenido):
+    """Camino original con load_workbook; None si openpyxl no lo abre."""
+    try:
+        wb = load_workbook(BytesIO(contenido), data_only=False)
+    except Exception:
+        return None
 
-    campos = []
+    tablas = []
 
-    with zipfile.ZipFile(docx_path) as z:
-        xml_doc = read_xml_from_docx(z, "word/document.xml")
-        if not xml_doc:
-            return campos
+    # Tablas en el Excel embebido
+    for ws in wb.worksheets:
 
-        root = ET.fromstring(xml_doc)
+        for tbl in ws._tables.values():
 
-        for fld in root.findall(".//w:fldSimple", NS_ALL):
-            instr = fld.get(f"{{{NS_ALL['w']}}}instr")
-            textos = [t.text for t in fld.findall(".//w:t", NS_ALL) if t.text]
-            campos.append(
+            ref = tbl.ref
+            excel_range = ws[ref]
+
+            filas = []
+            for row in excel_range:
+                filas.append([c.value for c in row])
+
+            tablas.append(
                 {
-                    "tipo": "fldSimple",
-                    "instr": instr,
-                    "texto": "".join(textos).strip() if textos else None,
+                    "worksheet": ws.title,
+                    "tabla": tbl.name,
+                    "rango": ref,
+                    "filas": filas,
+                    "n_filas": len(filas),
+                    "n_columnas": len(filas[0]) if filas else 0
                 }
             )
 
-        for instr in root.findall(".//w:instrText", NS_ALL):
-            txt = (instr.text or "").strip()
-            if txt:
-                campos.append(
-                    {
-                        "tipo": "instrText",
-                        "instr": txt,
-                    }
-                )
+    return tablas
+
+
+def tablas_excel_embebido(z, parte, huellas=False):
+    """Tablas de UN Excel embebido del docx abierto; None si no se puede leer."""
+    content = z.read(parte)
+
+    try:
+        return _xl_tablas_directo(content, huellas)
+    except Exception:
+        tablas = _xl_tablas_openpyxl(content)
+        if tablas is not None and huellas:
+            tablas = [con_huellas(json_sanitize_deep(t)) for t in tablas]
+        return tablas
+
+
+def _extract_embedded_excel_zip(z, huellas=False, previos=None):
+    """previos: {part: resultado} de Excel sin cambios (extracción incremental)."""
+    results = []
+
+    excel_files = [
+        f for f in z.namelist()
+        if f.startswith("word/embeddings/") and f.endswith(".xlsx")
+    ]
+
+    for ef in excel_files:
+
+        if previos and ef in previos:
+            results.append(previos[ef])
+            continue
 
-    return campos
+        tablas = tablas_excel_embebido(z, ef, huellas)
+        if tablas is None:
+            continue
+
+        results.append(
+            {
+                "excel": ef,
+                "tablas": tablas,
+                "nombres_definidos": []
+            }
+        )
+
+    return results
+
+
+def extract_embedded_excel(docx_path, huellas=False):
+    with abrir_docx(docx_path) as z:
+        return _extract_embedded_excel_zip(z, huellas)
 
 
 # ======================================================================
-# PÁRRAFOS
+# IMÁGENES WORD
 # ======================================================================
-def extract_paragraphs(docx_path, max_chars_por_parrafo=500):
+def _extract_images_info_zip(z):
 
-    parrafos = []
-
-    with zipfile.ZipFile(docx_path) as z:
-        xml_doc = read_xml_from_docx(z, "word/document.xml")
-        if not xml_doc:
-            return parrafos
+    imagenes = []
 
-        root = ET.fromstring(xml_doc)
+    content_types_xml = read_xml_from_docx(z, "[Content_Types].xml")
+    type_map = {}
+
+    if content_types_xml:
+        root_ct = ET.fromstring(content_types_xml)
+        for override in root_ct.findall(
+            ".//{http://schemas.openxmlformats.org/package/2006/content-types}Override"
+        ):
+            name = override.get("PartName")
+            ctype = override.get("ContentType")
+            if "/media/" in str(name):
+                type_map[name] = ctype
+
+    for name in z.namelist():
+        if name.startswith("word/media/"):
+            part_name = "/" + name
+            imagenes.append(
+                {
+                    "nombre": os.path.basename(name),
+                    "ruta": name,
+                    "content_type": type_map.get(part_name),
+                }
+            )
 
-        for i, p in enumerate(root.findall(".//w:p", NS_ALL), start=1):
+    return imagenes
 
-            ppr = p.find("w:pPr", NS_ALL)
-            pstyle = None
 
-            if ppr is not None:
-                st = ppr.find("w:pStyle", NS_ALL)
-                if st is not None:
-                    pstyle = st.get(f"{{{NS_ALL['w']}}}val")
+def extract_images_info(docx_path):
+    with abrir_docx(docx_path) as z:
+        return _extract_images_info_zip(z)
 
-            textos = [t.text for t in p.findall(".//w:t", NS_ALL) if t.text]
-            txt = "".join(textos).strip()
 
-            if len(txt) > max_chars_por_parrafo:
-                txt = txt[:max_chars_por_parrafo] + "..."
+# ======================================================================
+# CAMPOS Word
+# ======================================================================
+def extract_word_fields(docx_path):
+    with abrir_docx(docx_path) as z:
+        recorrido = _recorrer_documento(z, controles=False, tablas=False, parrafos=False)
+    return recorrido["campos_word"] if recorrido else []
 
-            if txt:
-                parrafos.append(
-                    {
-                        "index": i,
-                        "estilo": pstyle,
-                        "texto": txt,
-                    }
-                )
 
-    return parrafos
+# ======================================================================
+# PÁRRAFOS
+# ======================================================================
+def extract_paragraphs(docx_path, max_chars_por_parrafo=500):
+    with abrir_docx(docx_path) as z:
+        recorrido = _recorrer_documento(
+            z,
+            controles=False,
+            tablas=False,
+            campos=False,
+            max_chars_por_parrafo=max_chars_por_parrafo,
+        )
+    return recorrido["parrafos"] if recorrido else []
 
 # ======================================================================
 # SANITIZADOR JSON UNIVERSAL — ELIMINA ArrayFormula y cualquier objeto
@@ -577,59 +1562,460 @@ def json_sanitize_deep(obj):
 
     # CUALQUIER OTRO TIPO → convertir a str
     return str(obj)
+# ======================================================================
+# PERFILES DE EXTRACCIÓN
+# ======================================================================
+SECCIONES = (
+    "controles",      # controles doc + header + footer
+    "tablas_word",
+    "excels",
+    "imagenes",
+    "campos_word",    # metadata
+    "parrafos",       # metadata
+)
+
+PERFILES = {
+    "full": frozenset(SECCIONES),
+    # Lo único que mira validar_contra_plantilla()
+    "validation": frozenset({"tablas_word", "excels", "imagenes"}),
+    # Lo que usa extract_structural_signature()
+    "signature": frozenset({"controles", "tablas_word", "excels"}),
+}
+
+# Clave de la estructura → sección que la produce
+_SECCION_DE_CLAVE = {
+    "controles": "controles",
+    "tablas_word": "tablas_word",
+    "excels": "excels",
+    "imagenes": "imagenes",
+}
+_SECCION_DE_METADATA = {
+    "controles_header": "controles",
+    "controles_footer": "controles",
+    "campos_word": "campos_word",
+    "parrafos": "parrafos",
+}
+
+
+def resolver_perfil(perfil="full") -> frozenset:
+    """
+    Acepta el nombre de un perfil ("full", "validation", "signature") o un
+    iterable de secciones. Devuelve el conjunto de secciones a extraer.
+    """
+    if perfil is None:
+        return PERFILES["full"]
+    if isinstance(perfil, str):
+        if perfil in PERFILES:
+            return PERFILES[perfil]
+        if perfil in SECCIONES:
+            return frozenset({perfil})
+        raise ValueError(f"Perfil de extracción desconocido: {perfil!r}")
+
+    secciones = frozenset(perfil)
+    desconocidas = secciones - set(SECCIONES)
+    if desconocidas:
+        raise ValueError(f"Secciones desconocidas: {sorted(desconocidas)}")
+    return secciones
+
+
+def _estructura_final(partes, plantilla):
+    top, metadata = _secciones_a_claves(partes)
+
+    # RETORNO FINAL — FORMATO ESTÁNDAR
+    return {
+        "controles": top.get("controles"),
+        "tablas_word": top.get("tablas_word"),
+        "excels": top.get("excels"),
+        "imagenes": top.get("imagenes"),
+        "metadata": {
+            "plantilla": plantilla,
+            "controles_header": metadata.get("controles_header"),
+            "controles_footer": metadata.get("controles_footer"),
+            "campos_word": metadata.get("campos_word"),
+            "parrafos": metadata.get("parrafos"),
+        },
+    }
+
 
 # ======================================================================
 # 🚀 FUNCIÓN PRINCIPAL — ¡VERSIÓN DEFINITIVA 2025!
 # ======================================================================
-def generar_estructura(docx_path):
+def _extraer_estructura_zip(z, secciones=PERFILES["full"], huellas=False, previos=None):
+    """
+    Motor de una sola pasada: el .docx ya está abierto y cada part se lee
+    una única vez. word/document.xml alimenta a la vez controles, tablas,
+    campos y párrafos. Solo se calculan las secciones pedidas.
+    huellas=True: tablas Word y Excel con huellas en vez de filas.
+    previos: resultados reutilizables por part (ver _partes_reutilizables).
+    """
+    partes = {}
+    previos = previos or {}
+    documento_previo = previos.get("documento")
+
+    quiere_controles = "controles" in secciones
+    colectores = {
+        "controles": quiere_controles,
+        "tablas": "tablas_word" in secciones,
+        "campos": "campos_word" in secciones,
+        "parrafos": "parrafos" in secciones,
+    }
+
+    # 1. Cuerpo del documento (controles + tablas + campos + párrafos)
+    if documento_previo is not None:
+        # word/document.xml sin cambios: se reutiliza lo ya extraído
+        for colector, clave in (
+            ("tablas", "tablas_word"),
+            ("campos", "campos_word"),
+            ("parrafos", "parrafos"),
+        ):
+            if colectores[colector]:
+                partes[clave] = documento_previo[clave]
+
+    elif any(colectores.values()):
+        recorrido = _recorrer_documento(z, huellas=huellas, **colectores)
+        if recorrido is None:
+            raise ValueError("El archivo no contiene word/document.xml (¿es un .docx válido?).")
+
+        if colectores["tablas"]:
+            partes["tablas_word"] = recorrido["tablas_word"]
+        if colectores["campos"]:
+            partes["campos_word"] = recorrido["campos_word"]
+        if colectores["parrafos"]:
+            partes["parrafos"] = recorrido["parrafos"]
+
+    # 2. Controles doc + headers / footers
+    if quiere_controles:
+        valores_comunes = _valores_globales_comunes(z)
+        if documento_previo is not None:
+            partes["controles_doc"] = documento_previo["controles_doc"]
+        else:
+            valores_doc = list(valores_comunes | recorrido["entradas_lista"])
+            partes["controles_doc"] = _controles_finales(recorrido["controles"], valores_doc)
+
+        partes["controles_header"], partes["controles_footer"] = (
+            _controles_headers_footers_zip(
+                z, list(valores_comunes), previos.get("headers_footers")
+            )
+        )
+
+    # 3. Excel embebidos / imágenes
+    if "excels" in secciones:
+        partes["excels"] = _extract_embedded_excel_zip(z, huellas, previos.get("excels"))
+    if "imagenes" in secciones:
+        partes["imagenes"] = _extract_images_info_zip(z)
+
+    return partes
+
+
+def _secciones_a_claves(partes):
+    """
+    Reparte el resultado del motor en claves de primer nivel y de metadata
+    (ya sanitizadas para JSON).
+    """
+    top = {}
+    metadata = {}
+
+    if "controles_doc" in partes:
+        top["controles"] = json_sanitize_deep([
+            *partes["controles_doc"],
+            *partes["controles_header"],
+            *partes["controles_footer"],
+        ])
+        metadata["controles_header"] = json_sanitize_deep(partes["controles_header"])
+        metadata["controles_footer"] = json_sanitize_deep(partes["controles_footer"])
+
+    for clave in ("tablas_word", "excels", "imagenes"):
+        if clave in partes:
+            top[clave] = json_sanitize_deep(partes[clave])
+
+    for clave in ("campos_word", "parrafos"):
+        if clave in partes:
+            metadata[clave] = json_sanitize_deep(partes[clave])
+
+    return top, metadata
+
+
+class _MetadataPerezosa(dict):
+    def __init__(self, datos, estructura):
+        super().__init__(datos)
+        self._estructura = estructura
+
+    def __missing__(self, clave):
+        seccion = _SECCION_DE_METADATA.get(clave)
+        if seccion is None or not self._estructura._cargar(seccion):
+            raise KeyError(clave)
+        return dict.__getitem__(self, clave)
+
+    def get(self, clave, default=None):
+        try:
+            return self[clave]
+        except KeyError:
+            return default
+
+
+class EstructuraDocumento(dict):
+    """
+    Resultado de generar_estructura() con un perfil parcial.
+
+    Se comporta como el dict de siempre; las secciones que no se pidieron
+    se extraen desde los bytes del .docx la primera vez que se acceden
+    (estructura["parrafos"], estructura.get("excels"), ...).
+    materializar() fuerza todas las pendientes, p.ej. antes de guardar en BD.
+    """
+
+    def __init__(self, datos, fuente=None, pendientes=(), huellas=False):
+        datos = dict(datos)
+        metadata = datos.pop("metadata", {})
+        super().__init__(datos)
+        dict.__setitem__(self, "metadata", _MetadataPerezosa(metadata, self))
+        self._fuente = fuente
+        self._pendientes = set(pendientes)
+        self._huellas = huellas
+
+    @property
+    def pendientes(self) -> frozenset:
+        return frozenset(self._pendientes)
+
+    def _cargar(self, *secciones) -> bool:
+        secciones = self._pendientes.intersection(secciones)
+        if not secciones or self._fuente is None:
+            return False
+
+        with abrir_docx(self._fuente) as z:
+            partes = _extraer_estructura_zip(z, frozenset(secciones), self._huellas)
+
+        top, metadata = _secciones_a_claves(partes)
+        for clave, valor in top.items():
+            dict.__setitem__(self, clave, valor)
+        meta = dict.__getitem__(self, "metadata")
+        for clave, valor in metadata.items():
+            dict.__setitem__(meta, clave, valor)
+
+        self._pendientes -= secciones
+        if not self._pendientes:
+            self._fuente = None
+        return True
+
+    def materializar(self):
+        """Extrae todas las secciones pendientes y devuelve self."""
+        self._cargar(*self._pendientes)
+        return self
+
+    def __missing__(self, clave):
+        seccion = _SECCION_DE_CLAVE.get(clave)
+        if seccion is None or not self._cargar(seccion):
+            raise KeyError(clave)
+        return dict.__getitem__(self, clave)
+
+    def get(self, clave, default=None):
+        try:
+            return self[clave]
+        except KeyError:
+            return default
+
+    def __reduce__(self):
+        # Se serializa siempre completa (procesos, cache)
+        self.materializar()
+        return (dict, (dict(self),))
+
+
+def generar_estructura(docx_path, perfil="full", nombre=None, huellas=False):
     """
     ESTA ES LA FUNCIÓN QUE SE GUARDA EN BD.
     Y LA QUE SE USA PARA VALIDAR DOCUMENTOS SUBIDOS.
+
+    Abre el .docx una sola vez (ver _extraer_estructura_zip).
+
+    docx_path puede ser una ruta, bytes / memoryview, un UploadedFile de
+    Django o un file-like: se lee desde memoria, sin archivo temporal.
+    nombre: nombre para metadata.plantilla cuando la fuente no lo trae.
+
+    perfil:
+        "full"        → todas las secciones (lo que se guarda en BD)
+        "validation"  → tablas_word, excels, imagenes
+        "signature"   → controles, tablas_word, excels
+        o un iterable de secciones (ver SECCIONES).
+    huellas: True => tablas Word / Excel sin "filas": huellas por fila y
+    por tabla + muestra acotada (ver huellas_tablas). Tamaño y memoria
+    no dependen del largo de las tablas; sirve para validar y comparar.
+    Con un perfil parcial devuelve un EstructuraDocumento: las secciones no
+    pedidas se calculan de forma perezosa al primer acceso.
     """
+    secciones = resolver_perfil(perfil)
+    parcial = secciones != PERFILES["full"]
+
+    if parcial:
+        # Los bytes se conservan para las secciones perezosas
+        fuente = leer_bytes_fuente(fuente_rebobinable(docx_path))
+        with abrir_docx(fuente) as z:
+            partes = _extraer_estructura_zip(z, secciones, huellas)
+    else:
+        with abrir_docx(docx_path) as z:
+            partes = _extraer_estructura_zip(z, secciones, huellas)
+
+    estructura_final = _estructura_final(partes, nombre_fuente(docx_path, nombre))
+
+    if not parcial:
+        return estructura_final
+
+    # Quitar las claves no calculadas: se resuelven al primer acceso
+    for clave, seccion in _SECCION_DE_CLAVE.items():
+        if seccion not in secciones:
+            del estructura_final[clave]
+    for clave, seccion in _SECCION_DE_METADATA.items():
+        if seccion not in secciones:
+            del estructura_final["metadata"][clave]
+
+    return EstructuraDocumento(
+        estructura_final,
+        fuente=fuente,
+        pendientes=set(SECCIONES) - secciones,
+        huellas=huellas,
+    )
 
-    # 1. Controles
-    controles_doc = extract_content_controls_document(docx_path)
-    controles_header, controles_footer = extract_content_controls_headers_footers(docx_path)
 
-    # Unificación
-    controles_unificados = [
-        *controles_doc,
-        *controles_header,
-        *controles_footer,
-    ]
+# ======================================================================
+# EXTRACCIÓN INCREMENTAL POR PART (re-subida de plantillas)
+# - Manifiesto: CRC-32 y tamaño de cada part, leídos del directorio
+#   central del zip (sin descomprimir nada)
+# - Con el manifiesto y la estructura completa de la versión anterior,
+#   solo se vuelven a parsear los parts que cambiaron:
+#     word/document.xml          → controles doc, tablas, campos, párrafos
+#     word/header*/footer*.xml   → controles de ese header / footer
+#     word/embeddings/*.xlsx     → ese Excel
+#   Los controles dependen además de styles / settings / numbering /
+#   glossary (entradas de lista globales): si alguno cambia se rehacen.
+#   Las imágenes siempre se recalculan (solo nombres + content types).
+# ======================================================================
+_PARTES_VALORES_GLOBALES = (
+    "word/styles.xml",
+    "word/settings.xml",
+    "word/numbering.xml",
+    "word/glossary/document.xml",
+)
+
+
+def manifiesto_partes(z) -> dict:
+    """{"version_extractor", "partes": {part: [crc32, tamaño]}} de un zip abierto."""
+    return {
+        "version_extractor": VERSION_EXTRACTOR,
+        "partes": {i.filename: [i.CRC, i.file_size] for i in z.infolist()},
+    }
+
+
+def _partes_reutilizables(manifiesto, manifiesto_previo, estructura_previa):
+    """
+    Resultados de la versión anterior que siguen valiendo para el zip
+    nuevo, listos para _extraer_estructura_zip(previos=...).
+    {} si no hay con qué comparar (sin manifiesto, otra versión del
+    extractor o estructura previa incompleta / resumida).
+    """
+    if not isinstance(manifiesto_previo, dict) or not isinstance(estructura_previa, dict):
+        return {}
+    if manifiesto_previo.get("version_extractor") != manifiesto["version_extractor"]:
+        return {}
 
-    # 2. Tablas Word — normalizadas (NUNCA faltan n_filas/n_columnas)
-    tablas_word = extract_word_tables(docx_path)
+    meta = estructura_previa.get("metadata")
+    if not isinstance(meta, dict) or meta.get("resumen"):
+        return {}
 
-    # 3. Excel embebidos
-    excels = extract_embedded_excel(docx_path)
+    actuales = manifiesto["partes"]
+    anteriores = manifiesto_previo.get("partes") or {}
 
-    # 4. Imágenes
-    imagenes = extract_images_info(docx_path)
+    def sin_cambios(part):
+        return part in actuales and actuales[part] == anteriores.get(part)
 
-    # 5. Campos Word
-    campos = extract_word_fields(docx_path)
+    previos = {}
 
-    # 6. Párrafos
-    parrafos = extract_paragraphs(docx_path)
+    excels = estructura_previa.get("excels")
+    if isinstance(excels, list):
+        previos["excels"] = {
+            e["excel"]: e for e in excels
+            if isinstance(e, dict) and sin_cambios(e.get("excel"))
+        }
 
-    # 7. Metadata
-    metadata = {
-        "plantilla": os.path.basename(docx_path),
-        "controles_header": controles_header,
-        "controles_footer": controles_footer,
-        "campos_word": campos,
-        "parrafos": parrafos,
+    globales_iguales = all(
+        actuales.get(p) == anteriores.get(p) for p in _PARTES_VALORES_GLOBALES
+    )
+    controles = estructura_previa.get("controles")
+    header = meta.get("controles_header")
+    footer = meta.get("controles_footer")
+    if not (globales_iguales and all(isinstance(x, list) for x in (controles, header, footer))):
+        return previos
+
+    previos["headers_footers"] = {
+        part: [c for c in header + footer if c.get("origen") == os.path.basename(part)]
+        for part in actuales
+        if part.startswith(("word/header", "word/footer"))
+        and part.endswith(".xml")
+        and sin_cambios(part)
     }
 
-    # 8. RETORNO FINAL — FORMATO ESTÁNDAR
-    estructura_final =  {
-        "controles": controles_unificados,
-        "tablas_word": tablas_word,
-        "excels": excels,
-        "imagenes": imagenes,
-        "metadata": metadata,
+    documento = {
+        "tablas_word": estructura_previa.get("tablas_word"),
+        "campos_word": meta.get("campos_word"),
+        "parrafos": meta.get("parrafos"),
+        # controles = doc + header + footer (en ese orden)
+        "controles_doc": controles[:len(controles) - len(header) - len(footer)],
     }
+    if sin_cambios("word/document.xml") and all(
+        isinstance(v, list) for v in documento.values()
+    ):
+        previos["documento"] = documento
+
+    return previos
+
 
-    return json_sanitize_deep(estructura_final)   
+def _hay_reutilizables(manifiesto, manifiesto_previo):
+    """
+    True si algún part que _partes_reutilizables aprovecha (document.xml,
+    headers / footers, excels embebidos) no cambió: recién ahí vale la
+    pena cargar la estructura previa completa.
+    """
+    if not isinstance(manifiesto_previo, dict):
+        return False
+    if manifiesto_previo.get("version_extractor") != manifiesto["version_extractor"]:
+        return False
+
+    anteriores = manifiesto_previo.get("partes") or {}
+    return any(
+        (part == "word/document.xml"
+         or part.startswith(("word/header", "word/footer", "word/embeddings/")))
+        and valor == anteriores.get(part)
+        for part, valor in manifiesto["partes"].items()
+    )
+
+
+def _nombres_reutilizados(previos):
+    nombres = set(previos.get("excels") or ()) | set(previos.get("headers_footers") or ())
+    if "documento" in previos:
+        nombres.add("word/document.xml")
+    return sorted(nombres)
+
+
+def generar_estructura_incremental(docx_path, estructura_previa=None,
+                                   manifiesto_previo=None, nombre=None):
+    """
+    Igual que generar_estructura(docx_path) (perfil completo), reutilizando
+    de estructura_previa / manifiesto_previo (versión anterior de la misma
+    plantilla) todo part que no haya cambiado.
+
+    estructura_previa puede ser una función sin argumentos que la carga:
+    solo se llama si algún part reutilizable no cambió.
+
+    Devuelve (estructura, manifiesto). El manifiesto se guarda junto a la
+    estructura para la próxima versión; "reutilizadas" lista los parts
+    que no se volvieron a parsear.
+    """
+    with abrir_docx(docx_path) as z:
+        manifiesto = manifiesto_partes(z)
+        if callable(estructura_previa):
+            estructura_previa = (
+                estructura_previa()
+                if _hay_reutilizables(manifiesto, manifiesto_previo) else None
+            )
+        previos = _partes_reutilizables(manifiesto, manifiesto_previo, estructura_previa)
+        partes = _extraer_estructura_zip(z, previos=previos)
 
+    manifiesto["reutilizadas"] = _nombres_reutilizados(previos)
+    return _estructura_final(partes, nombre_fuente(docx_path, nombre)), manifiesto
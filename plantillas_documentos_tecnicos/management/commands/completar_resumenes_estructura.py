@@ -0,0 +1,50 @@
+# ======================================================================
+# completar_resumenes_estructura — datos derivados de
+# plantilla_estructura_version con el código vigente
+# - Filas legado (formato 0) → formato compacto (estructura_json queda)
+# - resumen_json sin firma / digests / árbol → se recalcula
+# - --verificar: compara el payload compacto con estructura_json de las
+#   filas que todavía tienen los dos (paso previo a soltar la columna)
+# ======================================================================
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from plantillas_documentos_tecnicos.formato_estructura import (
+    compactar_filas_legado,
+    completar_resumenes,
+    verificar_compactas,
+)
+
+
+class Command(BaseCommand):
+    help = "Compacta filas legado y completa resumen_json de plantilla_estructura_version."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verificar",
+            action="store_true",
+            help="Solo comparar estructura_compacta con estructura_json (no escribe).",
+        )
+
+    def handle(self, *args, **opciones):
+        with connection.cursor() as cursor:
+            if opciones["verificar"]:
+                resultado = verificar_compactas(cursor)
+                self.stdout.write(f"Filas verificadas: {resultado['verificadas']}")
+                if resultado["distintas"]:
+                    self.stderr.write(
+                        f"Distintas ({len(resultado['distintas'])}): "
+                        + ", ".join(str(i) for i in resultado["distintas"])
+                    )
+                    raise SystemExit(1)
+                return
+
+            with transaction.atomic():
+                compactadas = compactar_filas_legado(cursor)
+                # "arbol" es la última clave agregada: su ausencia cubre
+                # también a los resúmenes sin firma / digests
+                resumidas = completar_resumenes(cursor, clave="arbol")
+
+        self.stdout.write(f"Filas compactadas: {compactadas}")
+        self.stdout.write(f"Resúmenes recalculados: {resumidas}")
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstructuraDocumentoCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64)),
+                ('version_extractor', models.CharField(max_length=20)),
+                ('estructura_json', models.JSONField()),
+                ('tamano_bytes', models.BigIntegerField(default=0)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('ultimo_uso', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('hits', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'estructura_documento_cache',
+                'constraints': [models.UniqueConstraint(fields=('sha256', 'version_extractor'), name='uniq_estructura_cache_sha_version')],
+            },
+        ),
+    ]
@@ -0,0 +1,238 @@
+# Columnas de formato compacto en plantilla_estructura_version.
+#
+# La tabla no es un modelo Django (se maneja con SQL directo), por eso
+# se altera con SQL y solo si existe (PostgreSQL).
+#
+# El codec compacto v1 está copiado aquí (congelado): la migración no
+# depende de formato_estructura, que puede cambiar. estructura_json de
+# las filas legado se conserva; resumen_json queda NULL (las lecturas
+# resumen al vuelo) hasta correr `manage.py completar_resumenes_estructura`.
+
+import json
+import zlib
+
+from django.db import migrations
+
+
+COLUMNAS = """
+    ALTER TABLE plantilla_estructura_version
+        ADD COLUMN IF NOT EXISTS formato SMALLINT NOT NULL DEFAULT 0,
+        ADD COLUMN IF NOT EXISTS estructura_compacta BYTEA,
+        ADD COLUMN IF NOT EXISTS resumen_json JSONB,
+        ADD COLUMN IF NOT EXISTS tamano_json INTEGER;
+    ALTER TABLE plantilla_estructura_version
+        ALTER COLUMN estructura_json DROP NOT NULL;
+"""
+
+QUITAR_COLUMNAS = """
+    ALTER TABLE plantilla_estructura_version
+        DROP COLUMN IF EXISTS formato,
+        DROP COLUMN IF EXISTS estructura_compacta,
+        DROP COLUMN IF EXISTS resumen_json,
+        DROP COLUMN IF EXISTS tamano_json;
+"""
+
+FORMATO_LEGADO = 0
+FORMATO_COMPACTO = 1
+NIVEL_ZLIB = 6
+LOTE = 50
+
+
+# ======================================================================
+# CODEC COMPACTO v1 (copia congelada)
+# ======================================================================
+class _Codificador:
+    def __init__(self):
+        self.strings = []
+        self._indices = {}
+
+    def _interned(self, texto):
+        idx = self._indices.get(texto)
+        if idx is None:
+            idx = self._indices[texto] = len(self.strings)
+            self.strings.append(texto)
+        return idx
+
+    def columna(self, valores):
+        if valores and all(isinstance(v, str) for v in valores):
+            return {"@s": [self._interned(v) for v in valores]}
+        return [self.valor(v) for v in valores]
+
+    def valor(self, v):
+        if isinstance(v, dict):
+            salida = {k: self.valor(x) for k, x in v.items()}
+            if any(k.startswith("@") for k in v):
+                return {"@o": salida}
+            return salida
+
+        if isinstance(v, list) and v:
+            if all(isinstance(x, dict) for x in v):
+                return self._lista_dicts(v)
+            if all(isinstance(x, list) for x in v):
+                return self._matriz(v)
+            return [self.valor(x) for x in v]
+
+        return v
+
+    def _lista_dicts(self, filas):
+        formas, indice_forma = [], {}
+        por_fila = []
+        columnas = {}
+
+        for fila in filas:
+            claves = tuple(fila)
+            idx = indice_forma.get(claves)
+            if idx is None:
+                idx = indice_forma[claves] = len(formas)
+                formas.append(list(claves))
+            por_fila.append(idx)
+            for k, x in fila.items():
+                columnas.setdefault(k, []).append(x)
+
+        return {
+            "@t": formas,
+            "@f": por_fila,
+            "@c": {k: self.columna(vals) for k, vals in columnas.items()},
+        }
+
+    def _matriz(self, filas):
+        ancho = max(len(f) for f in filas)
+        columnas = [
+            self.columna([f[j] for f in filas if j < len(f)])
+            for j in range(ancho)
+        ]
+        return {"@m": [len(f) for f in filas], "@c": columnas}
+
+
+def _decodificar(v, strings):
+    if isinstance(v, list):
+        return [_decodificar(x, strings) for x in v]
+    if not isinstance(v, dict):
+        return v
+
+    if len(v) == 1 and "@o" in v:
+        return {k: _decodificar(x, strings) for k, x in v["@o"].items()}
+    if len(v) == 1 and "@s" in v:
+        return [strings[i] for i in v["@s"]]
+
+    if "@t" in v:
+        formas = v["@t"]
+        columnas = {k: iter(_decodificar(c, strings)) for k, c in v["@c"].items()}
+        return [
+            {k: next(columnas[k]) for k in formas[idx]}
+            for idx in v["@f"]
+        ]
+
+    if "@m" in v:
+        columnas = [iter(_decodificar(c, strings)) for c in v["@c"]]
+        return [
+            [next(columnas[j]) for j in range(largo)]
+            for largo in v["@m"]
+        ]
+
+    return {k: _decodificar(x, strings) for k, x in v.items()}
+
+
+def _empaquetar(estructura) -> bytes:
+    cod = _Codificador()
+    cuerpo = cod.valor(estructura)
+    compacto = {"v": FORMATO_COMPACTO, "s": cod.strings, "e": cuerpo}
+    texto = json.dumps(compacto, ensure_ascii=False, separators=(",", ":"))
+    return zlib.compress(texto.encode("utf-8"), NIVEL_ZLIB)
+
+
+def _desempaquetar(datos) -> dict:
+    compacto = json.loads(zlib.decompress(bytes(datos)).decode("utf-8"))
+    if compacto.get("v") != FORMATO_COMPACTO:
+        raise ValueError(
+            f"Formato de estructura {compacto.get('v')!r}: esta migración "
+            f"solo revierte el formato compacto v{FORMATO_COMPACTO}."
+        )
+    return _decodificar(compacto["e"], compacto["s"])
+
+
+# ======================================================================
+# MIGRACIÓN
+# ======================================================================
+def _tabla_existe(schema_editor):
+    conn = schema_editor.connection
+    if conn.vendor != "postgresql":
+        return False
+    with conn.cursor() as cursor:
+        return "plantilla_estructura_version" in conn.introspection.table_names(cursor)
+
+
+def _compactar_legado(cursor):
+    """Filas formato 0 → compacto v1, sin tocar estructura_json."""
+    ultimo_id = 0
+    while True:
+        cursor.execute("""
+            SELECT id, estructura_json
+            FROM plantilla_estructura_version
+            WHERE formato = %s AND estructura_json IS NOT NULL AND id > %s
+            ORDER BY id
+            LIMIT %s
+        """, [FORMATO_LEGADO, ultimo_id, LOTE])
+        filas = cursor.fetchall()
+        if not filas:
+            return
+
+        for fila_id, estructura in filas:
+            if isinstance(estructura, str):
+                estructura = json.loads(estructura)
+            texto = json.dumps(estructura, ensure_ascii=False, separators=(",", ":"))
+            cursor.execute("""
+                UPDATE plantilla_estructura_version
+                SET formato = %s,
+                    estructura_compacta = %s,
+                    tamano_json = %s
+                WHERE id = %s
+            """, [
+                FORMATO_COMPACTO,
+                _empaquetar(estructura),
+                len(texto.encode("utf-8")),
+                fila_id,
+            ])
+        ultimo_id = filas[-1][0]
+
+
+def agregar_columnas(apps, schema_editor):
+    if not _tabla_existe(schema_editor):
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(COLUMNAS)
+        _compactar_legado(cursor)
+
+
+def quitar_columnas(apps, schema_editor):
+    if not _tabla_existe(schema_editor):
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        # Filas creadas ya en formato compacto (estructura_json NULL):
+        # volver a dejar el JSON completo antes de borrar las columnas
+        cursor.execute("""
+            SELECT id, estructura_compacta
+            FROM plantilla_estructura_version
+            WHERE formato = %s AND estructura_json IS NULL
+        """, [FORMATO_COMPACTO])
+        for fila_id, compacta in cursor.fetchall():
+            texto = json.dumps(_desempaquetar(compacta), ensure_ascii=False)
+            cursor.execute("""
+                UPDATE plantilla_estructura_version
+                SET estructura_json = %s::jsonb
+                WHERE id = %s
+            """, [texto, fila_id])
+        cursor.execute(QUITAR_COLUMNAS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plantillas_documentos_tecnicos", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(agregar_columnas, quitar_columnas),
+    ]
@@ -0,0 +1,50 @@
+# Manifiesto de parts (CRC-32 / tamaño por part del .docx) en
+# plantilla_estructura_version, para la extracción incremental al volver
+# a subir una plantilla. Misma modalidad que 0002: SQL directo y solo si
+# la tabla existe (PostgreSQL).
+
+from django.db import migrations
+
+
+COLUMNAS = """
+    ALTER TABLE plantilla_estructura_version
+        ADD COLUMN IF NOT EXISTS manifiesto_partes JSONB;
+"""
+
+QUITAR_COLUMNAS = """
+    ALTER TABLE plantilla_estructura_version
+        DROP COLUMN IF EXISTS manifiesto_partes;
+"""
+
+
+def _tabla_existe(schema_editor):
+    conn = schema_editor.connection
+    if conn.vendor != "postgresql":
+        return False
+    with conn.cursor() as cursor:
+        return "plantilla_estructura_version" in conn.introspection.table_names(cursor)
+
+
+def agregar_columnas(apps, schema_editor):
+    if not _tabla_existe(schema_editor):
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(COLUMNAS)
+
+
+def quitar_columnas(apps, schema_editor):
+    if not _tabla_existe(schema_editor):
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(QUITAR_COLUMNAS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plantillas_documentos_tecnicos", "0002_estructura_version_compacta"),
+    ]
+
+    operations = [
+        migrations.RunPython(agregar_columnas, quitar_columnas),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plantillas_documentos_tecnicos", "0003_estructura_version_manifiesto"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiffVersionPlantilla',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version_id', models.BigIntegerField()),
+                ('version_anterior_id', models.BigIntegerField(db_index=True)),
+                ('version_diff', models.CharField(max_length=20)),
+                ('diff_json', models.JSONField()),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'plantilla_diff_version',
+                'constraints': [models.UniqueConstraint(fields=('version_id', 'version_anterior_id'), name='uniq_diff_version_par')],
+            },
+        ),
+    ]
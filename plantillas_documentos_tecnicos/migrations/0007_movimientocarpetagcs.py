@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plantillas_documentos_tecnicos", "0006_diffversionplantilla"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoCarpetaGCS',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefijo_origen', models.CharField(max_length=1024)),
+                ('prefijo_destino', models.CharField(max_length=1024)),
+                ('estado', models.CharField(db_index=True, default='en_curso', max_length=20)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('movidos', models.PositiveIntegerField(default=0)),
+                ('ultimo_error', models.TextField(blank=True, default='')),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'plantilla_movimiento_carpeta',
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plantillas_documentos_tecnicos", "0007_movimientocarpetagcs"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoSubidoGCS',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blob_name', models.CharField(max_length=1024, unique=True)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('crc32c', models.CharField(max_length=12)),
+                ('tamano_bytes', models.BigIntegerField(default=0)),
+                ('content_type', models.CharField(blank=True, default='', max_length=255)),
+                ('generacion', models.BigIntegerField(blank=True, null=True)),
+                ('subido_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'archivo_subido_gcs',
+            },
+        ),
+    ]
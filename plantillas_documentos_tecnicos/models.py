@@ -1,3 +1,89 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class EstructuraDocumentoCache(models.Model):
+    """
+    Cache persistente de generar_estructura(), indexado por el SHA-256
+    de los bytes del .docx y la versión del extractor.
+    """
+    sha256 = models.CharField(max_length=64)
+    version_extractor = models.CharField(max_length=20)
+    estructura_json = models.JSONField()
+    tamano_bytes = models.BigIntegerField(default=0)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    ultimo_uso = models.DateTimeField(default=timezone.now, db_index=True)
+    hits = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = "estructura_documento_cache"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["sha256", "version_extractor"],
+                name="uniq_estructura_cache_sha_version",
+            ),
+        ]
+
+
+class DiffVersionPlantilla(models.Model):
+    """
+    Diff (comparar_estructuras) entre dos versiones de plantilla. Las
+    versiones son inmutables: se calcula una vez por par y versión del
+    motor de diff (ver diffs_versiones.py).
+    Los ids son de plantilla_tipo_doc_versiones (tabla sin modelo).
+    """
+    version_id = models.BigIntegerField()
+    version_anterior_id = models.BigIntegerField(db_index=True)
+    version_diff = models.CharField(max_length=20)
+    diff_json = models.JSONField()
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "plantilla_diff_version"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["version_id", "version_anterior_id"],
+                name="uniq_diff_version_par",
+            ),
+        ]
+
+
+class MovimientoCarpetaGCS(models.Model):
+    """
+    Checkpoint de un movimiento de carpeta en GCS (renombrar categoría /
+    tipo). Si se interrumpe queda "en_curso" o "error" y el siguiente
+    mover_carpeta_gcs(origen, destino) lo retoma (ver operaciones_gcs.py).
+    """
+    EN_CURSO = "en_curso"
+    COMPLETADO = "completado"
+    ERROR = "error"
+
+    prefijo_origen = models.CharField(max_length=1024)
+    prefijo_destino = models.CharField(max_length=1024)
+    estado = models.CharField(max_length=20, default=EN_CURSO, db_index=True)
+    total = models.PositiveIntegerField(default=0)
+    movidos = models.PositiveIntegerField(default=0)
+    ultimo_error = models.TextField(blank=True, default="")
+    creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "plantilla_movimiento_carpeta"
+
+
+class ArchivoSubidoGCS(models.Model):
+    """
+    Checksums de un archivo subido con subidas_gcs.SubidaGCS (una fila
+    por blob; una nueva subida al mismo nombre la reemplaza). El sha256
+    sirve para encontrar duplicados.
+    """
+    blob_name = models.CharField(max_length=1024, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    crc32c = models.CharField(max_length=12)
+    tamano_bytes = models.BigIntegerField(default=0)
+    content_type = models.CharField(max_length=255, blank=True, default="")
+    generacion = models.BigIntegerField(null=True, blank=True)
+    subido_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "archivo_subido_gcs"
@@ -0,0 +1,250 @@
+# ======================================================================
+# operaciones_gcs.py — Operaciones masivas sobre carpetas del bucket
+# - borrar_blobs: deletes por la batch API de GCS (lotes de
+#   GCS_LOTE_BATCH, varios lotes en paralelo); se revisa la respuesta de
+#   cada delete y un 404 no es error
+# - eliminar_objetos: nombres sueltos + carpetas completas, sin exists()
+#   previos, con conteos y tiempos
+# - mover_prefijo: rewrite del lado del servidor (los bytes no pasan por
+#   el proceso) en un pool de GCS_HILOS_OPERACIONES hilos + borrado por
+#   lotes de los originales
+# - copiar_blob: copia puntual del lado del servidor (p.ej. la plantilla
+#   a la carpeta de un RQ nuevo)
+# - Checkpoint en plantilla_movimiento_carpeta (MovimientoCarpetaGCS):
+#   el trabajo pendiente es lo que sigue bajo el prefijo origen, así que
+#   un movimiento interrumpido se retoma volviendo a llamarlo con los
+#   mismos prefijos (un blob reescrito y no borrado se reescribe igual)
+# ======================================================================
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from plantillas_documentos_tecnicos.cliente_gcs import cliente_para_lotes, obtener_bucket
+from plantillas_documentos_tecnicos.existencia_gcs import invalidar_existencia, marcar_existencia
+
+
+class MovimientoEnConflicto(Exception):
+    """Hay un movimiento sin terminar del mismo origen hacia otro destino."""
+
+
+def _config(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def _lotes(items, n):
+    for i in range(0, len(items), n):
+        yield items[i:i + n]
+
+
+# ======================================================================
+# BORRADO POR LOTES
+# ======================================================================
+def _borrar_lote(blobs):
+    from google.api_core.exceptions import from_http_response
+
+    cliente = cliente_para_lotes()
+    with cliente.batch(raise_exception=False) as lote:
+        for blob in blobs:
+            blob.delete(client=cliente)
+
+    # Una respuesta por delete, en orden (finish() las devuelve y el lote
+    # las guarda; el with descarta el valor). 404: ya no estaba, no es error
+    fallidas = [
+        (blob, respuesta) for blob, respuesta in zip(blobs, lote._responses)
+        if not 200 <= respuesta.status_code < 300 and respuesta.status_code != 404
+    ]
+    if fallidas:
+        blob, respuesta = fallidas[0]
+        error = from_http_response(respuesta)
+        error.message = (
+            f"{len(fallidas)} de {len(blobs)} deletes fallaron "
+            f"(primero {blob.name}): {error.message}"
+        )
+        raise error
+
+
+def borrar_blobs(blobs, hilos=None) -> int:
+    """
+    Borra los blobs (objetos Blob) en lotes de la batch API, varios lotes
+    en paralelo. Devuelve cuántos se pidieron borrar.
+    """
+    blobs = list(blobs)
+    if not blobs:
+        return 0
+
+    lotes = list(_lotes(blobs, _config("GCS_LOTE_BATCH", 100)))
+    hilos = min(len(lotes), hilos or _config("GCS_HILOS_OPERACIONES", 16))
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        list(pool.map(_borrar_lote, lotes))
+    return len(blobs)
+
+
+def _sin_anidados(prefijos):
+    """Quita los prefijos contenidos en otro de la lista."""
+    prefijos = sorted(set(p for p in prefijos if p))
+    salida = []
+    for p in prefijos:
+        if not salida or not p.startswith(salida[-1]):
+            salida.append(p)
+    return salida
+
+
+def eliminar_objetos(nombres=(), prefijos=()) -> dict:
+    """
+    Borra los blobs con esos nombres y todo lo que haya bajo los prefijos.
+    Cada prefijo se lista una vez (solo nombres); los nombres sueltos que
+    caen bajo un prefijo listado se toman del listado, el resto se borra
+    sin preguntar si existe.
+
+    Devuelve {"objetos", "lotes", "listado_ms", "borrado_ms"}.
+    """
+    bucket = obtener_bucket()
+    prefijos = _sin_anidados(prefijos)
+
+    inicio = time.perf_counter()
+    objetivo = set()
+    for prefijo in prefijos:
+        objetivo.update(
+            b.name for b in bucket.list_blobs(prefix=prefijo, fields="items(name),nextPageToken")
+        )
+    sueltos = {
+        n for n in nombres
+        if n and not any(n.startswith(p) for p in prefijos)
+    }
+    objetivo |= sueltos
+    listado = time.perf_counter()
+
+    borrar_blobs([bucket.blob(n) for n in sorted(objetivo)])
+    fin = time.perf_counter()
+
+    for prefijo in prefijos:
+        invalidar_existencia(prefijo)
+    for nombre in sueltos:
+        invalidar_existencia(nombre)
+
+    lote = _config("GCS_LOTE_BATCH", 100)
+    return {
+        "objetos": len(objetivo),
+        "lotes": -(-len(objetivo) // lote),
+        "listado_ms": round((listado - inicio) * 1000, 1),
+        "borrado_ms": round((fin - listado) * 1000, 1),
+    }
+
+
+# ======================================================================
+# MOVER CARPETA
+# ======================================================================
+def _reescribir(bucket, blob, nombre_destino, content_type=None):
+    destino = bucket.blob(nombre_destino)
+    if content_type:
+        destino.content_type = content_type
+    token, _, _ = destino.rewrite(blob)
+    # Objetos grandes (o entre clases de almacenamiento) van en varias llamadas
+    while token is not None:
+        token, _, _ = destino.rewrite(blob, token=token)
+    return destino
+
+
+def copiar_blob(nombre_origen, nombre_destino, content_type=None, bucket=None):
+    """
+    Copia nombre_origen → nombre_destino con rewrite (los bytes no pasan
+    por el proceso). Devuelve el Blob destino.
+    """
+    bucket = bucket or obtener_bucket()
+    destino = _reescribir(bucket, bucket.blob(nombre_origen), nombre_destino, content_type)
+    marcar_existencia(nombre_destino)
+    return destino
+
+
+def _movimiento(origen, destino):
+    from plantillas_documentos_tecnicos.models import MovimientoCarpetaGCS
+
+    abiertos = MovimientoCarpetaGCS.objects.filter(
+        prefijo_origen=origen,
+    ).exclude(estado=MovimientoCarpetaGCS.COMPLETADO).order_by("-id")
+
+    previo = abiertos.first()
+    if previo is not None:
+        if previo.prefijo_destino != destino:
+            raise MovimientoEnConflicto(
+                f"{origen} tiene un movimiento sin terminar hacia "
+                f"{previo.prefijo_destino}; terminarlo antes de moverlo a {destino}."
+            )
+        previo.estado = MovimientoCarpetaGCS.EN_CURSO
+        previo.ultimo_error = ""
+        previo.save(update_fields=["estado", "ultimo_error", "actualizado_en"])
+        return previo
+
+    return MovimientoCarpetaGCS.objects.create(prefijo_origen=origen, prefijo_destino=destino)
+
+
+def mover_prefijo(origen: str, destino: str, hilos=None) -> dict:
+    """
+    Mueve todos los blobs bajo origen a destino (mismo nombre relativo).
+    Retoma un movimiento previo interrumpido de origen → destino.
+    Devuelve {"movidos", "total", "ms"}; si algo falla el checkpoint
+    queda en "error" con el mensaje y la excepción se propaga.
+
+    ValueError (antes de tocar nada) si origen y destino son el mismo
+    prefijo o destino queda dentro de origen: los blobs copiados caerían
+    de nuevo bajo origen y se borrarían.
+    """
+    from plantillas_documentos_tecnicos.models import MovimientoCarpetaGCS
+
+    if not origen:
+        raise ValueError("mover_prefijo: el prefijo origen no puede ser vacío.")
+    if destino == origen:
+        raise ValueError(f"mover_prefijo: origen y destino son el mismo prefijo ({origen}).")
+    if destino.startswith(origen):
+        raise ValueError(f"mover_prefijo: el destino {destino} está dentro del origen {origen}.")
+
+    inicio = time.perf_counter()
+    mov = _movimiento(origen, destino)
+    bucket = obtener_bucket()
+
+    pendientes = list(bucket.list_blobs(prefix=origen))
+    mov.total = mov.movidos + len(pendientes)
+    mov.save(update_fields=["total", "actualizado_en"])
+
+    hilos = hilos or _config("GCS_HILOS_OPERACIONES", 16)
+    try:
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            for lote in _lotes(pendientes, _config("GCS_LOTE_BATCH", 100)):
+                list(pool.map(
+                    lambda b: _reescribir(bucket, b, destino + b.name[len(origen):]),
+                    lote,
+                ))
+                _borrar_lote(lote)
+
+                mov.movidos += len(lote)
+                mov.save(update_fields=["movidos", "actualizado_en"])
+    except Exception as e:
+        mov.estado = MovimientoCarpetaGCS.ERROR
+        mov.ultimo_error = str(e)
+        mov.save(update_fields=["estado", "ultimo_error", "actualizado_en"])
+        raise
+    finally:
+        invalidar_existencia(origen)
+        invalidar_existencia(destino)
+
+    mov.estado = MovimientoCarpetaGCS.COMPLETADO
+    mov.save(update_fields=["estado", "actualizado_en"])
+
+    return {
+        "movidos": mov.movidos,
+        "total": mov.total,
+        "ms": round((time.perf_counter() - inicio) * 1000, 1),
+    }
+
+
+def movimientos_pendientes():
+    """Movimientos interrumpidos (en curso o con error), el más nuevo primero."""
+    from plantillas_documentos_tecnicos.models import MovimientoCarpetaGCS
+
+    return list(
+        MovimientoCarpetaGCS.objects.exclude(
+            estado=MovimientoCarpetaGCS.COMPLETADO
+        ).order_by("-id")
+    )
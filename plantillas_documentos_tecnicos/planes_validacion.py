@@ -0,0 +1,391 @@
+# ======================================================================
+# planes_validacion.py — Planes de validación compilados por versión
+# - PlanValidacion: lo que validar_contra_plantilla necesita de la
+#   estructura base, ya armado (forma de tablas Word, mapa excel →
+#   tablas con su tamaño, nombres de imágenes y digest de validación)
+# - Se compila una vez por plantilla_documento_tecnico_version_id desde
+#   el resumen de la versión y queda en un LRU del proceso
+# - requerimiento → versión también queda en memoria (se evita el
+#   LIKE '%RQ-{id}/%' sobre documentos_generados), pero solo por
+#   VALIDACION_RQ_TTL_S: un documento generado nuevo puede cambiar la
+#   versión del RQ y eso no se avisa a los demás procesos
+# - Una versión no cambia después de subida: el plan solo se invalida
+#   al eliminar la versión (eliminar_version), y esta no se puede
+#   eliminar mientras algún requerimiento la use
+# - PlanValidacion.estado(): solo OK / ERROR y la primera diferencia,
+#   leyendo directo del .docx y cortando apenas hay una diferencia
+# ======================================================================
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection
+
+from plantillas_documentos_tecnicos.formato_estructura import cargar_resumen_version
+from plantillas_documentos_tecnicos.huellas_tablas import fila_encabezado
+from plantillas_documentos_tecnicos.leer_estructura_plantilla_word import (
+    abrir_docx,
+    digest_validacion,
+    recorrer_tablas_word,
+    tablas_excel_embebido,
+)
+
+
+class _Diferencia(Exception):
+    """Primera diferencia encontrada por PlanValidacion.estado()."""
+
+    def __init__(self, seccion, tipo, item, mensaje):
+        super().__init__(mensaje)
+        self.datos = {"seccion": seccion, "tipo": tipo, "item": item, "mensaje": mensaje}
+
+
+def _lista(valor):
+    return valor if isinstance(valor, list) else []
+
+
+def _primero(conjunto):
+    """Elemento estable de un conjunto (el menor), o None si está vacío."""
+    return min(conjunto, key=str, default=None)
+
+
+# ======================================================================
+# PLAN
+# ======================================================================
+class PlanValidacion:
+    """
+    Estructura base de una versión reducida a lo que se compara.
+    validar() entrega exactamente el mismo dict que validar_contra_plantilla.
+    """
+
+    __slots__ = ("version_id", "digest", "tablas_word", "excels", "imagenes")
+
+    def __init__(self, estructura_base, version_id=None):
+        base = estructura_base if isinstance(estructura_base, dict) else {}
+        self.version_id = version_id
+        self.digest = digest_validacion(base)
+
+        self.tablas_word = frozenset(
+            (t.get("n_filas", 0), t.get("n_columnas", 0))
+            for t in _lista(base.get("tablas_word"))
+        )
+
+        # excel → {tabla: (n columnas del encabezado, n_filas)}
+        self.excels = {}
+        for e in _lista(base.get("excels")):
+            self.excels[e.get("excel")] = {
+                t.get("tabla"): (len(fila_encabezado(t)), t.get("n_filas"))
+                for t in _lista(e.get("tablas"))
+            }
+
+        self.imagenes = frozenset(i.get("nombre") for i in _lista(base.get("imagenes")))
+
+    def validar(self, estructura_subida) -> dict:
+        dif = {
+            "tablas_word": {"faltantes": [], "sobrantes": []},
+            "excels": {"faltantes": [], "sobrantes": []},
+            "imagenes": {"faltantes": [], "sobrantes": []},
+            "detalles": [],
+            "status": "OK"
+        }
+
+        # Mismo digest de validación => nada que comparar
+        if digest_validacion(estructura_subida) == self.digest:
+            return dif
+
+        # 🔵 TABLAS WORD
+        sub_tab = {
+            (t.get("n_filas", 0), t.get("n_columnas", 0))
+            for t in estructura_subida.get("tablas_word", [])
+        }
+        dif["tablas_word"]["faltantes"] = list(self.tablas_word - sub_tab)
+        dif["tablas_word"]["sobrantes"] = list(sub_tab - self.tablas_word)
+
+        # 🔵 EXCELS embebidos
+        sub_exc = {e.get("excel"): e for e in estructura_subida.get("excels", [])}
+
+        dif["excels"]["faltantes"] = list(set(self.excels) - set(sub_exc))
+        dif["excels"]["sobrantes"] = list(set(sub_exc) - set(self.excels))
+
+        for excel_name, b_tab in self.excels.items():
+            if excel_name not in sub_exc:
+                continue
+
+            s_tab = {t.get("tabla"): t for t in sub_exc[excel_name].get("tablas", [])}
+
+            for falt in (set(b_tab) - set(s_tab)):
+                dif["excels"]["faltantes"].append(f"{excel_name}:{falt}")
+            for sob in (set(s_tab) - set(b_tab)):
+                dif["excels"]["sobrantes"].append(f"{excel_name}:{sob}")
+
+            for tname, (n_cols, n_filas) in b_tab.items():
+                st = s_tab.get(tname)
+                if st is None:
+                    continue
+
+                if n_cols != len(fila_encabezado(st)):
+                    dif["detalles"].append(
+                        f"Excel {excel_name} > Tabla {tname}: distinta cantidad de columnas."
+                    )
+                if n_filas != st.get("n_filas"):
+                    dif["detalles"].append(
+                        f"Excel {excel_name} > Tabla {tname}: distinta cantidad de filas."
+                    )
+
+        # 🔵 IMÁGENES
+        sub_imgs = {i.get("nombre") for i in estructura_subida.get("imagenes", [])}
+        dif["imagenes"]["faltantes"] = list(self.imagenes - sub_imgs)
+        dif["imagenes"]["sobrantes"] = list(sub_imgs - self.imagenes)
+
+        # 🔵 STATUS GLOBAL
+        if any([
+            dif["tablas_word"]["faltantes"],
+            dif["tablas_word"]["sobrantes"],
+            dif["excels"]["faltantes"],
+            dif["excels"]["sobrantes"],
+            dif["imagenes"]["faltantes"],
+            dif["imagenes"]["sobrantes"],
+            dif["detalles"],
+        ]):
+            dif["status"] = "ERROR"
+
+        return dif
+
+    # ------------------------------------------------------------------
+    # Validación rápida (solo estado)
+    # ------------------------------------------------------------------
+    def estado(self, fuente) -> dict:
+        """
+        Mismo status que validar(generar_estructura(fuente, "validation")),
+        pero se detiene en la primera diferencia:
+
+          {"status": "OK" | "ERROR",
+           "primer_error": None | {"seccion", "tipo", "item", "mensaje"}}
+
+        Orden: lo que sale del directorio del zip sin descomprimir nada
+        (imágenes, Excel que no están), luego los parts de menor a mayor
+        (cada Excel embebido y word/document.xml, este último cortando
+        en la primera tabla que no está en la plantilla).
+        """
+        try:
+            with abrir_docx(fuente) as z:
+                self._estado_zip(z)
+        except _Diferencia as d:
+            return {"status": "ERROR", "primer_error": d.datos}
+        return {"status": "OK", "primer_error": None}
+
+    def _estado_zip(self, z):
+        tamanos = {info.filename: info.file_size for info in z.infolist()}
+        if "word/document.xml" not in tamanos:
+            raise ValueError("El archivo no contiene word/document.xml (¿es un .docx válido?).")
+
+        # 🔵 IMÁGENES (solo nombres)
+        imagenes = {
+            os.path.basename(n) for n in tamanos if n.startswith("word/media/")
+        }
+        nombre = _primero(self.imagenes - imagenes)
+        if nombre is not None:
+            raise _Diferencia("imagenes", "faltante", nombre, f"Falta la imagen {nombre}.")
+        nombre = _primero(imagenes - self.imagenes)
+        if nombre is not None:
+            raise _Diferencia("imagenes", "sobrante", nombre, f"Imagen adicional {nombre}.")
+
+        # 🔵 EXCELS que ni siquiera vienen en el zip
+        embebidos = [
+            n for n in tamanos
+            if n.startswith("word/embeddings/") and n.endswith(".xlsx")
+        ]
+        excel = _primero(set(self.excels) - set(embebidos))
+        if excel is not None:
+            raise _Diferencia("excels", "faltante", excel, f"Falta el Excel embebido {excel}.")
+
+        # 🔵 PARTS a parsear, de menor a mayor
+        partes = sorted(embebidos + ["word/document.xml"], key=lambda n: tamanos.get(n, 0))
+        for parte in partes:
+            if parte == "word/document.xml":
+                self._estado_tablas_word(z)
+            else:
+                self._estado_excel(z, parte)
+
+    def _estado_tablas_word(self, z):
+        vistas = set()
+
+        def al_cerrar(tabla):
+            forma = (tabla.get("n_filas", 0), tabla.get("n_columnas", 0))
+            if forma not in self.tablas_word:
+                raise _Diferencia(
+                    "tablas_word", "sobrante", list(forma),
+                    f"Tabla Word adicional de {forma[0]}x{forma[1]}.",
+                )
+            vistas.add(forma)
+
+        recorrer_tablas_word(z, al_cerrar)
+
+        forma = _primero(self.tablas_word - vistas)
+        if forma is not None:
+            raise _Diferencia(
+                "tablas_word", "faltante", list(forma),
+                f"Falta una tabla Word de {forma[0]}x{forma[1]}.",
+            )
+
+    def _estado_excel(self, z, parte):
+        tablas = tablas_excel_embebido(z, parte, huellas=True)
+        b_tab = self.excels.get(parte)
+
+        # Un Excel que no se puede leer no cuenta (como en la extracción)
+        if tablas is None:
+            if b_tab is not None:
+                raise _Diferencia("excels", "faltante", parte, f"Falta el Excel embebido {parte}.")
+            return
+        if b_tab is None:
+            raise _Diferencia("excels", "sobrante", parte, f"Excel embebido adicional {parte}.")
+
+        s_tab = {t.get("tabla"): t for t in tablas}
+        falt = _primero(set(b_tab) - set(s_tab))
+        if falt is not None:
+            raise _Diferencia(
+                "excels", "faltante", f"{parte}:{falt}", f"Excel {parte}: falta la tabla {falt}."
+            )
+        sob = _primero(set(s_tab) - set(b_tab))
+        if sob is not None:
+            raise _Diferencia(
+                "excels", "sobrante", f"{parte}:{sob}", f"Excel {parte}: tabla adicional {sob}."
+            )
+
+        for tname, (n_cols, n_filas) in b_tab.items():
+            st = s_tab[tname]
+            if n_cols != len(fila_encabezado(st)):
+                raise _Diferencia(
+                    "excels", "detalle", f"{parte}:{tname}",
+                    f"Excel {parte} > Tabla {tname}: distinta cantidad de columnas.",
+                )
+            if n_filas != st.get("n_filas"):
+                raise _Diferencia(
+                    "excels", "detalle", f"{parte}:{tname}",
+                    f"Excel {parte} > Tabla {tname}: distinta cantidad de filas.",
+                )
+
+
+# ======================================================================
+# CACHE EN MEMORIA
+# ======================================================================
+_lock = threading.Lock()
+_planes = OrderedDict()        # version_id → PlanValidacion
+_versiones_rq = OrderedDict()  # requerimiento_id → (version_id, vence)
+_stats = {"hits": 0, "misses": 0}
+
+
+# Entradas requerimiento → versión (son dos enteros; solo se acota)
+MAX_REQUERIMIENTOS = 10000
+
+
+def _max_planes():
+    return getattr(settings, "VALIDACION_PLANES_MAX_ITEMS", 128)
+
+
+def _ttl_requerimiento():
+    return getattr(settings, "VALIDACION_RQ_TTL_S", 60)
+
+
+def _plan_en_cache(version_id):
+    with _lock:
+        plan = _planes.get(version_id)
+        if plan is not None:
+            _planes.move_to_end(version_id)
+            _stats["hits"] += 1
+        else:
+            _stats["misses"] += 1
+        return plan
+
+
+def _guardar_plan(plan):
+    with _lock:
+        _planes[plan.version_id] = plan
+        _planes.move_to_end(plan.version_id)
+        while len(_planes) > max(_max_planes(), 0):
+            _planes.popitem(last=False)
+
+
+def plan_validacion(version_id) -> PlanValidacion:
+    """Plan compilado de la versión (desde su resumen en BD la primera vez)."""
+    plan = _plan_en_cache(version_id)
+    if plan is not None:
+        return plan
+
+    with connection.cursor() as cursor:
+        resumen = cargar_resumen_version(cursor, version_id)
+    if resumen is None:
+        raise ValueError(f"No existe estructura registrada para version_id={version_id}")
+
+    plan = PlanValidacion(resumen, version_id)
+    _guardar_plan(plan)
+    return plan
+
+
+def version_plantilla_requerimiento(requerimiento_id):
+    """
+    version_id de la plantilla REAL usada al inicializar el RQ (misma
+    consulta que obtener_estructura_plantilla_usada), memorizada por
+    VALIDACION_RQ_TTL_S segundos (0 = no se memoriza).
+    """
+    ahora = time.monotonic()
+    with _lock:
+        entrada = _versiones_rq.get(requerimiento_id)
+    if entrada is not None and entrada[1] > ahora:
+        return entrada[0]
+
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT plantilla_documento_tecnico_version_id
+            FROM documentos_generados
+            WHERE ruta_gcs LIKE %s
+            ORDER BY fecha_generacion DESC, id DESC
+            LIMIT 1
+        """, [f"%RQ-{requerimiento_id}/%"])
+        row = cursor.fetchone()
+
+    if not row or not row[0]:
+        raise ValueError("No se encontró una plantilla usada para este requerimiento.")
+
+    ttl = _ttl_requerimiento()
+    with _lock:
+        if ttl > 0:
+            _versiones_rq[requerimiento_id] = (row[0], ahora + ttl)
+            _versiones_rq.move_to_end(requerimiento_id)
+            while len(_versiones_rq) > MAX_REQUERIMIENTOS:
+                _versiones_rq.popitem(last=False)
+        else:
+            _versiones_rq.pop(requerimiento_id, None)
+    return row[0]
+
+
+def plan_validacion_requerimiento(requerimiento_id) -> PlanValidacion:
+    """Plan de la plantilla usada por el RQ, sin ir a BD si ya está en memoria."""
+    return plan_validacion(version_plantilla_requerimiento(requerimiento_id))
+
+
+def invalidar_plan(version_id):
+    """Saca la versión (y los RQ que apuntan a ella) de la cache."""
+    with _lock:
+        _planes.pop(version_id, None)
+        for rq in [rq for rq, (v, _) in _versiones_rq.items() if v == version_id]:
+            del _versiones_rq[rq]
+
+
+def olvidar_requerimiento(requerimiento_id):
+    """Saca el RQ del mapa requerimiento → versión (al eliminar el RQ)."""
+    with _lock:
+        _versiones_rq.pop(requerimiento_id, None)
+
+
+def estadisticas_planes() -> dict:
+    with _lock:
+        datos = dict(_stats)
+        datos.update({
+            "planes": len(_planes),
+            "max_planes": _max_planes(),
+            "requerimientos": len(_versiones_rq),
+        })
+    return datos
@@ -0,0 +1,308 @@
+# plantillas_documentos_tecnicos/scripts/benchmark_extractor.py
+#
+# Benchmark del extractor de estructura sobre los documentos reales de
+# "Prueba - Trabajo Futuro" (no necesita Django ni BD).
+#
+# Por documento y fase (generar_estructura y cada extract_*):
+#   - tiempo de pared (mediana y mínimo de N repeticiones, tras 1 de calentamiento)
+#   - memoria pico (tracemalloc, en una corrida aparte)
+#   - parts del .docx leídos (ZipFile.open) y part distintos
+#   - tamaño de la salida (JSON) y digest de su contenido
+#
+# Uso:
+#   python plantillas_documentos_tecnicos/scripts/benchmark_extractor.py
+#   python .../benchmark_extractor.py --repeticiones 10 --fases generar_estructura
+#   python .../benchmark_extractor.py --guardar-baseline      (actualiza la línea base)
+#   python .../benchmark_extractor.py --sin-comparar --json resultado.json
+#   python .../benchmark_extractor.py --comparar-tiempo   (máquina dedicada)
+#
+# Sale con código 1 si hay regresiones respecto de la línea base: salida
+# distinta, más parts leídos o memoria sobre la tolerancia. El tiempo de
+# pared varía demasiado entre corridas (y máquinas) para cortar por
+# defecto: se informa, y solo cuenta con --comparar-tiempo.
+
+import argparse
+import datetime
+import hashlib
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+
+RUTA_PROYECTO = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(RUTA_PROYECTO))
+
+from plantillas_documentos_tecnicos import leer_estructura_plantilla_word as extractor  # noqa: E402
+
+CORPUS_DEFECTO = RUTA_PROYECTO / "Prueba - Trabajo Futuro"
+BASELINE_DEFECTO = Path(__file__).resolve().parent / "benchmark_extractor_baseline.json"
+
+# Nombre de la fase → función(ruta) que la ejecuta
+FASES = {
+    "generar_estructura": extractor.generar_estructura,
+    "generar_estructura_huellas": lambda ruta: extractor.generar_estructura(ruta, huellas=True),
+    "generar_estructura_validation": lambda ruta: extractor.generar_estructura(
+        ruta, perfil="validation"
+    ),
+    "extract_content_controls_document": extractor.extract_content_controls_document,
+    "extract_content_controls_headers_footers": extractor.extract_content_controls_headers_footers,
+    "extract_word_tables": extractor.extract_word_tables,
+    "extract_embedded_excel": extractor.extract_embedded_excel,
+    "extract_images_info": extractor.extract_images_info,
+    "extract_word_fields": extractor.extract_word_fields,
+    "extract_paragraphs": extractor.extract_paragraphs,
+}
+
+# Con --comparar-tiempo, diferencias menores a esto no cuentan como
+# regresión (ruido del reloj), además de la tolerancia relativa
+TIEMPO_MINIMO_MS = 25.0
+MEMORIA_MINIMA_KB = 256
+
+
+# ---------------------------------------------------------------------
+# MEDICIÓN
+# ---------------------------------------------------------------------
+@contextmanager
+def contar_parts():
+    """Cuenta las aperturas de parts (ZipFile.open) mientras dura el bloque."""
+    abiertos = []
+    original = zipfile.ZipFile.open
+
+    def open_contado(self, name, *args, **kwargs):
+        abiertos.append(name.filename if isinstance(name, zipfile.ZipInfo) else name)
+        return original(self, name, *args, **kwargs)
+
+    zipfile.ZipFile.open = open_contado
+    try:
+        yield abiertos
+    finally:
+        zipfile.ZipFile.open = original
+
+
+def _canonica(valor, clave=None):
+    # "valores" de los dropdowns sale de un set: su orden no es estable
+    if clave == "valores" and isinstance(valor, list):
+        return sorted((_canonica(v) for v in valor), key=lambda v: json.dumps(v, default=str))
+    if isinstance(valor, dict):
+        return {k: _canonica(v, k) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_canonica(v) for v in valor]
+    return valor
+
+
+def serializar_salida(resultado):
+    """JSON estable de la salida (sin metadata.plantilla, que es el nombre)."""
+    resultado = _canonica(resultado)
+    if isinstance(resultado, dict) and isinstance(resultado.get("metadata"), dict):
+        resultado["metadata"].pop("plantilla", None)
+    return json.dumps(resultado, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def medir(funcion, ruta, repeticiones):
+    # Calentamiento (imports perezosos, cachés del SO)
+    funcion(ruta)
+
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(ruta)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+
+    with contar_parts() as abiertos:
+        tracemalloc.start()
+        try:
+            resultado = funcion(ruta)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    salida = serializar_salida(resultado).encode("utf-8")
+    return {
+        "tiempo_ms": round(statistics.median(tiempos), 2),
+        "tiempo_min_ms": round(min(tiempos), 2),
+        "memoria_pico_kb": round(pico / 1024, 1),
+        "parts_leidos": len(abiertos),
+        "parts_distintos": len(set(abiertos)),
+        "bytes_salida": len(salida),
+        "digest_salida": hashlib.sha256(salida).hexdigest()[:16],
+    }
+
+
+def documentos_corpus(corpus, patron):
+    return sorted(
+        p for p in Path(corpus).glob(patron)
+        if p.is_file() and zipfile.is_zipfile(p)
+    )
+
+
+def ejecutar_benchmark(corpus, patron, fases, repeticiones):
+    resultados = {}
+    for ruta in documentos_corpus(corpus, patron):
+        nombre = ruta.relative_to(corpus).as_posix()
+        resultados[nombre] = {}
+        for fase in fases:
+            try:
+                resultados[nombre][fase] = medir(FASES[fase], ruta, repeticiones)
+            except Exception as e:
+                resultados[nombre][fase] = {"error": f"{type(e).__name__}: {e}"}
+        print(f"✔ {nombre}")
+    return resultados
+
+
+# ---------------------------------------------------------------------
+# LÍNEA BASE
+# ---------------------------------------------------------------------
+def comparar_con_baseline(resultados, baseline, tolerancia, comparar_tiempo=False,
+                          tiempo_minimo_ms=TIEMPO_MINIMO_MS):
+    """
+    (regresiones, avisos): listas de texto de resultados frente a baseline.
+    Los tiempos más lentos van a avisos salvo con comparar_tiempo.
+    Solo se comparan documentos / fases presentes en ambos.
+    """
+    regresiones = []
+    avisos = []
+    base = baseline.get("resultados", {})
+
+    for doc, fases in resultados.items():
+        for fase, actual in fases.items():
+            previo = base.get(doc, {}).get(fase)
+            if previo is None:
+                continue
+            etiqueta = f"{doc} :: {fase}"
+
+            if "error" in actual or "error" in previo:
+                if actual.get("error") != previo.get("error"):
+                    regresiones.append(f"{etiqueta}: error {previo.get('error')} -> {actual.get('error')}")
+                continue
+
+            if actual["digest_salida"] != previo["digest_salida"]:
+                regresiones.append(
+                    f"{etiqueta}: salida distinta "
+                    f"({previo['bytes_salida']} -> {actual['bytes_salida']} bytes)"
+                )
+
+            # El mínimo es mucho menos ruidoso que la mediana entre corridas
+            t_previo, t_actual = previo["tiempo_min_ms"], actual["tiempo_min_ms"]
+            if t_actual > t_previo * (1 + tolerancia) and t_actual - t_previo > tiempo_minimo_ms:
+                (regresiones if comparar_tiempo else avisos).append(
+                    f"{etiqueta}: tiempo {t_previo} -> {t_actual} ms"
+                )
+
+            limite_m = previo["memoria_pico_kb"] * (1 + tolerancia)
+            if (actual["memoria_pico_kb"] > limite_m
+                    and actual["memoria_pico_kb"] - previo["memoria_pico_kb"] > MEMORIA_MINIMA_KB):
+                regresiones.append(
+                    f"{etiqueta}: memoria {previo['memoria_pico_kb']} -> {actual['memoria_pico_kb']} KB"
+                )
+
+            if actual["parts_leidos"] > previo["parts_leidos"]:
+                regresiones.append(
+                    f"{etiqueta}: parts leídos {previo['parts_leidos']} -> {actual['parts_leidos']}"
+                )
+
+    return regresiones, avisos
+
+
+def totales(resultados):
+    """Suma por fase (para el resumen en consola)."""
+    por_fase = {}
+    for fases in resultados.values():
+        for fase, r in fases.items():
+            if "error" in r:
+                continue
+            t = por_fase.setdefault(fase, {"tiempo_ms": 0.0, "memoria_pico_kb": 0.0,
+                                           "parts_leidos": 0, "bytes_salida": 0})
+            t["tiempo_ms"] += r["tiempo_ms"]
+            t["memoria_pico_kb"] = max(t["memoria_pico_kb"], r["memoria_pico_kb"])
+            t["parts_leidos"] += r["parts_leidos"]
+            t["bytes_salida"] += r["bytes_salida"]
+    return por_fase
+
+
+def imprimir_resumen(resultados):
+    print(f"\n{'fase':<42}{'tiempo ms':>12}{'pico KB':>12}{'parts':>8}{'bytes':>12}")
+    for fase, t in totales(resultados).items():
+        print(
+            f"{fase:<42}{t['tiempo_ms']:>12.1f}{t['memoria_pico_kb']:>12.1f}"
+            f"{t['parts_leidos']:>8}{t['bytes_salida']:>12}"
+        )
+
+
+# ---------------------------------------------------------------------
+# EJECUCIÓN DIRECTA
+# ---------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del extractor de estructura .docx")
+    parser.add_argument("--corpus", default=str(CORPUS_DEFECTO))
+    parser.add_argument("--patron", default="**/*.docx", help="glob dentro del corpus")
+    parser.add_argument("--fases", nargs="+", choices=sorted(FASES), default=list(FASES))
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--baseline", default=str(BASELINE_DEFECTO))
+    parser.add_argument("--tolerancia", type=float, default=0.3,
+                        help="fracción sobre la línea base antes de marcar regresión")
+    parser.add_argument("--comparar-tiempo", action="store_true",
+                        help="un tiempo sobre la tolerancia también es regresión")
+    parser.add_argument("--tiempo-minimo-ms", type=float, default=TIEMPO_MINIMO_MS,
+                        help="diferencia absoluta mínima para contar un tiempo más lento")
+    parser.add_argument("--guardar-baseline", action="store_true")
+    parser.add_argument("--sin-comparar", action="store_true")
+    parser.add_argument("--json", help="escribe los resultados en este archivo")
+    args = parser.parse_args(argv)
+
+    corpus = Path(args.corpus)
+    print(f"\n=== BENCHMARK EXTRACTOR {extractor.VERSION_EXTRACTOR} — {corpus} ===\n")
+
+    resultados = ejecutar_benchmark(corpus, args.patron, args.fases, max(1, args.repeticiones))
+    imprimir_resumen(resultados)
+
+    informe = {
+        "version_extractor": extractor.VERSION_EXTRACTOR,
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "repeticiones": args.repeticiones,
+        "resultados": resultados,
+    }
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(informe, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\n✔ Resultados en {args.json}")
+
+    baseline_path = Path(args.baseline)
+    if args.guardar_baseline:
+        baseline_path.write_text(json.dumps(informe, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\n✔ Línea base guardada en {baseline_path}")
+        return 0
+
+    if args.sin_comparar:
+        return 0
+    if not baseline_path.exists():
+        print(f"\n(i) Sin línea base en {baseline_path} (usar --guardar-baseline)")
+        return 0
+
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    regresiones, avisos = comparar_con_baseline(
+        resultados, baseline, args.tolerancia, args.comparar_tiempo, args.tiempo_minimo_ms
+    )
+    if avisos:
+        print(f"\n(i) {len(avisos)} tiempos más lentos que la línea base (no cortan):")
+        for a in avisos:
+            print(f"   - {a}")
+    if regresiones:
+        print(f"\n✘ {len(regresiones)} regresiones frente a {baseline_path.name} "
+              f"({baseline.get('fecha')}, {baseline.get('plataforma')}):")
+        for r in regresiones:
+            print(f"   - {r}")
+        return 1
+
+    print(f"\n✔ Sin regresiones frente a {baseline_path.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,7 +4,6 @@ import os
 import django
 import sys
 from unidecode import unidecode
-from google.cloud import storage
 from django.db import connection
 
 # ---------------------------------------------------------------------
@@ -15,6 +14,8 @@ sys.path.append(RUTA_PROYECTO)
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gestion_docs.settings')
 django.setup()
 
+from plantillas_documentos_tecnicos.cliente_gcs import obtener_bucket  # noqa: E402
+
 # ---------------------------------------------------------------------
 # UTILIDADES
 # ---------------------------------------------------------------------
@@ -38,8 +39,7 @@ def crear_arbol_bucket():
     print("\n=== CREANDO ÁRBOL DE PLANTILLAS EN GCS ===")
 
     # Cliente GCS
-    client = storage.Client()
-    bucket = client.bucket("sgdmtso_jova")   # <-- tu bucket real
+    bucket = obtener_bucket("sgdmtso_jova")   # <-- tu bucket real
 
     # Raíz principal
     base_root = "Plantillas/"
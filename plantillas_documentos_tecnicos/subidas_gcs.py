@@ -0,0 +1,178 @@
+# ======================================================================
+# subidas_gcs.py — Subidas a GCS con checksum y registro de duplicados
+# - SubidaGCS.consumir(archivo): UNA pasada por el archivo del request
+#   que calcula el SHA-256 y deja un buffer rebobinable para lo que sigue
+#   (el propio UploadedFile si se puede rebobinar; si no, un
+#   SpooledTemporaryFile)
+# - El extractor (zip: necesita acceso aleatorio) y la subida leen ese
+#   buffer local; el archivo no se vuelve a pedir al cliente
+# - confirmar(nombre) sube con blob.upload_from_file (resumable en chunks
+#   de GCS_SUBIDA_CHUNK_BYTES si es grande, CRC32C verificado por la
+#   librería). Nada llega a GCS antes de confirmar(): si la validación
+#   falla no queda ningún objeto
+# - sobrescribir=False sube con if_generation_match=0 (falla si el
+#   objeto ya existe y permite reintentar sin riesgo)
+# - El sha256 y el CRC32C que reporta GCS quedan en archivo_subido_gcs
+#   (ArchivoSubidoGCS) para detectar duplicados
+# ======================================================================
+
+import hashlib
+import tempfile
+
+from django.conf import settings
+
+from plantillas_documentos_tecnicos.cliente_gcs import obtener_bucket
+from plantillas_documentos_tecnicos.existencia_gcs import blobs_existentes, marcar_existencia
+from plantillas_documentos_tecnicos.leer_estructura_plantilla_word import MAX_BYTES_EN_MEMORIA
+
+# GCS exige que los chunks de una subida resumable sean múltiplos de 256 KiB
+MULTIPLO_CHUNK = 256 * 1024
+
+
+class ErrorSubida(Exception):
+    """El CRC32C de lo subido no coincide con el que calculó GCS."""
+
+
+def _config(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def _tamano_chunk():
+    chunk = int(_config("GCS_SUBIDA_CHUNK_BYTES", 8 * 1024 * 1024))
+    return max(MULTIPLO_CHUNK, chunk - chunk % MULTIPLO_CHUNK)
+
+
+def _rebobinable(archivo):
+    try:
+        return bool(archivo.seekable())
+    except Exception:
+        return False
+
+
+class SubidaGCS:
+    """
+    with SubidaGCS(nombre, content_type) as subida:
+        subida.consumir(archivo)
+        ... validar subida.fuente (ya rebobinada) ...
+        subida.confirmar()
+
+    Sin confirmar() no se sube nada; al salir del with se libera el buffer.
+    """
+
+    def __init__(self, nombre=None, content_type=None, sobrescribir=True):
+        self.nombre = nombre
+        self.content_type = content_type or "application/octet-stream"
+        self.sobrescribir = sobrescribir
+        self.sha256 = None
+        self.crc32c = None          # base64, el que reporta GCS al confirmar
+        self.tamano = 0
+        self.fuente = None
+        self.confirmada = False
+
+        self._spool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+        return False
+
+    def consumir(self, archivo):
+        """Lee archivo una vez: sha256, tamaño y buffer rebobinado."""
+        sha = hashlib.sha256()
+        chunk = _tamano_chunk()
+
+        if _rebobinable(archivo):
+            archivo.seek(0)
+            self.fuente = archivo
+        else:
+            self._spool = self.fuente = tempfile.SpooledTemporaryFile(
+                max_size=MAX_BYTES_EN_MEMORIA
+            )
+
+        if hasattr(archivo, "chunks"):
+            bloques = archivo.chunks(chunk)
+        else:
+            bloques = iter(lambda: archivo.read(chunk), b"")
+
+        for bloque in bloques:
+            sha.update(bloque)
+            self.tamano += len(bloque)
+            if self._spool is not None:
+                self._spool.write(bloque)
+
+        self.sha256 = sha.hexdigest()
+        self.fuente.seek(0)
+        return self
+
+    def confirmar(self, nombre=None):
+        """
+        Sube el buffer a GCS y registra los checksums. nombre solo si no
+        se dio al construir. Devuelve el Blob subido.
+        """
+        from google.cloud.storage.exceptions import DataCorruption
+
+        if self.sha256 is None:
+            raise ValueError("confirmar() antes de consumir().")
+        if nombre:
+            if self.nombre and nombre != self.nombre:
+                raise ValueError(f"La subida ya apunta a {self.nombre}.")
+            self.nombre = nombre
+        if not self.nombre:
+            raise ValueError("La subida no tiene destino.")
+
+        blob = obtener_bucket().blob(self.nombre, chunk_size=_tamano_chunk())
+        try:
+            blob.upload_from_file(
+                self.fuente,
+                rewind=True,
+                size=self.tamano,
+                content_type=self.content_type,
+                if_generation_match=None if self.sobrescribir else 0,
+                timeout=_config("GCS_SUBIDA_TIMEOUT_S", 120),
+                checksum="crc32c",
+            )
+        except DataCorruption as e:
+            # La librería ya borró el objeto corrupto
+            raise ErrorSubida(f"CRC32C distinto al subir {self.nombre}.") from e
+        finally:
+            self.fuente.seek(0)
+
+        self.crc32c = blob.crc32c
+        self.confirmada = True
+        marcar_existencia(self.nombre)
+        _registrar(self, blob.generation)
+        return blob
+
+
+# ======================================================================
+# CHECKSUMS GUARDADOS
+# ======================================================================
+def _registrar(subida, generacion):
+    from plantillas_documentos_tecnicos.models import ArchivoSubidoGCS
+
+    try:
+        ArchivoSubidoGCS.objects.update_or_create(
+            blob_name=subida.nombre,
+            defaults={
+                "sha256": subida.sha256,
+                "crc32c": subida.crc32c or "",
+                "tamano_bytes": subida.tamano,
+                "content_type": subida.content_type,
+                "generacion": int(generacion) if generacion else None,
+            },
+        )
+    except Exception:
+        # El registro nunca debe deshacer una subida ya hecha
+        pass
+
+
+def duplicados(sha256) -> list:
+    """Blobs registrados con ese sha256 que todavía existen en el bucket."""
+    from plantillas_documentos_tecnicos.models import ArchivoSubidoGCS
+
+    nombres = ArchivoSubidoGCS.objects.filter(sha256=sha256).values_list("blob_name", flat=True)
+    return sorted(blobs_existentes(nombres))
@@ -0,0 +1,26 @@
+import os
+
+CORPUS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "Prueba - Trabajo Futuro",
+)
+ACTA = ("ACTA DE REUNIÓN", "ACTA_DE_REUNIÓN.docx")
+SDI = ("SDI", "SDI.docx")
+
+
+def tabla_prueba(n_filas, origen="document", index=1, n_columnas=3):
+    """Tabla Word con encabezado "Col j" y celdas "f{i}c{j}"."""
+    filas = [[f"Col {j}" for j in range(n_columnas)]]
+    filas += [[f"f{i}c{j}" for j in range(n_columnas)] for i in range(1, n_filas)]
+    return {
+        "index": index,
+        "origen": origen,
+        "filas": filas,
+        "n_filas": len(filas),
+        "n_columnas": n_columnas,
+    }
+
+
+def documento(*partes):
+    """Ruta a un archivo del corpus de prueba ("Prueba - Trabajo Futuro")."""
+    return os.path.join(CORPUS, *partes)
@@ -0,0 +1,133 @@
+"""
+Bucket de GCS en memoria para los tests: lo justo de la API de
+google-cloud-storage que usan operaciones_gcs y subidas_gcs.
+"""
+
+import base64
+import json
+import threading
+
+import google_crc32c
+import requests
+from google.api_core.exceptions import PreconditionFailed
+from google.cloud.storage.exceptions import DataCorruption
+
+
+def _respuesta(status, url):
+    respuesta = requests.Response()
+    respuesta.status_code = status
+    respuesta._content = json.dumps({"error": {"code": status, "message": "falla"}}).encode()
+    respuesta.request = requests.Request("DELETE", url).prepare()
+    return respuesta
+
+
+class BlobFalso:
+
+    def __init__(self, bucket, name, chunk_size=None):
+        self.bucket = bucket
+        self.name = name
+        self.chunk_size = chunk_size
+        self.content_type = None
+        self.crc32c = None
+        self.generation = None
+
+    def rewrite(self, source, token=None):
+        """En dos llamadas para objetos de más de REWRITE_POR_LLAMADA bytes."""
+        if source.name in self.bucket.fallar_rewrite:
+            raise RuntimeError(f"rewrite falló: {source.name}")
+        datos = self.bucket.objetos[source.name]
+        self.bucket.llamadas_rewrite.append((source.name, token))
+        if token is None and len(datos) > self.bucket.REWRITE_POR_LLAMADA:
+            return "siguiente", self.bucket.REWRITE_POR_LLAMADA, len(datos)
+        self.bucket.guardar(self.name, datos)
+        return None, len(datos), len(datos)
+
+    def delete(self, client=None):
+        client.lote_actual.append(self)
+
+    def upload_from_file(self, archivo, rewind=False, size=None, content_type=None,
+                         if_generation_match=None, timeout=None, checksum=None):
+        if rewind:
+            archivo.seek(0)
+        datos = archivo.read(size)
+        self.bucket.subidas.append({
+            "nombre": self.name, "chunk_size": self.chunk_size, "tamano": size,
+            "content_type": content_type, "checksum": checksum,
+        })
+        if if_generation_match == 0 and self.name in self.bucket.objetos:
+            raise PreconditionFailed(f"{self.name} ya existe")
+        if self.name in self.bucket.corromper:
+            raise DataCorruption(None, "crc32c distinto")
+
+        self.bucket.guardar(self.name, datos)
+        self.content_type = content_type
+        self.crc32c = base64.b64encode(google_crc32c.Checksum(datos).digest()).decode()
+        self.generation = len(self.bucket.subidas)
+
+
+class LoteFalso:
+    """cliente.batch(raise_exception=False): una respuesta por delete."""
+
+    def __init__(self, cliente):
+        self.cliente = cliente
+        self._responses = []
+
+    def __enter__(self):
+        self.cliente.lote_actual = []
+        return self
+
+    def __exit__(self, *exc):
+        bucket = self.cliente.bucket
+        pedidos, self.cliente.lote_actual = self.cliente.lote_actual, None
+        bucket.lotes.append([b.name for b in pedidos])
+        for blob in pedidos:
+            if blob.name in bucket.fallar_delete:
+                status = 503
+            elif bucket.borrar(blob.name):
+                status = 204
+            else:
+                status = 404
+            self._responses.append(_respuesta(status, f"https://gcs/o/{blob.name}"))
+        return False
+
+
+class ClienteFalso:
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.lote_actual = None
+
+    def batch(self, raise_exception=True):
+        return LoteFalso(self)
+
+
+class BucketFalso:
+    REWRITE_POR_LLAMADA = 10
+
+    def __init__(self, objetos=None):
+        self.objetos = dict(objetos or {})
+        self.fallar_rewrite = set()
+        self.fallar_delete = set()
+        self.corromper = set()
+        self.llamadas_rewrite = []
+        self.listados = []
+        self.lotes = []
+        self.subidas = []
+        self._lock = threading.Lock()
+
+    def guardar(self, nombre, datos):
+        with self._lock:
+            self.objetos[nombre] = datos
+
+    def borrar(self, nombre):
+        with self._lock:
+            return self.objetos.pop(nombre, None) is not None
+
+    def blob(self, nombre, chunk_size=None):
+        return BlobFalso(self, nombre, chunk_size)
+
+    def list_blobs(self, prefix="", fields=None):
+        self.listados.append(prefix)
+        with self._lock:
+            nombres = sorted(n for n in self.objetos if n.startswith(prefix))
+        return [BlobFalso(self, n) for n in nombres]
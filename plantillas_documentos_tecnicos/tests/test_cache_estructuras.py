@@ -0,0 +1,117 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from plantillas_documentos_tecnicos import cache_estructuras
+from plantillas_documentos_tecnicos.cache_estructuras import (
+    estadisticas_cache,
+    generar_estructura_cacheada,
+    purgar_cache_persistente,
+    reiniciar_cache,
+    sha256_archivo,
+)
+from plantillas_documentos_tecnicos.leer_estructura_plantilla_word import VERSION_EXTRACTOR
+from plantillas_documentos_tecnicos.models import EstructuraDocumentoCache
+from plantillas_documentos_tecnicos.tests.datos import ACTA, SDI, documento
+
+
+def _contadores():
+    datos = estadisticas_cache()
+    return datos["hits_memoria"], datos["hits_bd"], datos["misses"]
+
+
+@override_settings(ESTRUCTURA_CACHE_MAX_ITEMS=4, ESTRUCTURA_CACHE_PURGA_CADA_S=0,
+                   EXTRACCION_PROCESOS=0)
+class CacheEstructurasTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with open(documento(*ACTA), "rb") as f:
+            cls.acta = f.read()
+
+    def setUp(self):
+        reiniciar_cache()
+        self.addCleanup(reiniciar_cache)
+
+    def test_miss_luego_memoria_luego_bd(self):
+        primera = generar_estructura_cacheada(self.acta)
+        self.assertEqual(_contadores(), (0, 0, 1))
+        self.assertEqual(EstructuraDocumentoCache.objects.count(), 1)
+
+        self.assertEqual(generar_estructura_cacheada(self.acta), primera)
+        self.assertEqual(_contadores(), (1, 0, 1))
+
+        # Otro proceso (LRU vacío): sale de la tabla, sin volver a extraer
+        cache_estructuras._lru.clear()
+        with mock.patch.object(cache_estructuras, "generar_estructura") as extraer:
+            self.assertEqual(generar_estructura_cacheada(self.acta), primera)
+        extraer.assert_not_called()
+        self.assertEqual(_contadores(), (1, 1, 1))
+
+    def test_cada_hit_es_una_copia(self):
+        generar_estructura_cacheada(self.acta)
+        copia = generar_estructura_cacheada(self.acta)
+        copia["controles"].clear()
+        self.assertTrue(generar_estructura_cacheada(self.acta)["controles"])
+
+    def test_nombre_no_es_parte_de_la_clave(self):
+        generar_estructura_cacheada(self.acta, nombre="a.docx")
+        estructura = generar_estructura_cacheada(self.acta, nombre="b.docx")
+        self.assertEqual(estructura["metadata"]["plantilla"], "b.docx")
+        self.assertEqual(_contadores(), (1, 0, 1))
+
+    def test_completa_sirve_para_un_perfil_parcial(self):
+        generar_estructura_cacheada(self.acta)
+        generar_estructura_cacheada(self.acta, perfil="validation")
+        self.assertEqual(_contadores(), (1, 0, 1))
+
+    def test_lru_acotado(self):
+        with override_settings(ESTRUCTURA_CACHE_MAX_ITEMS=1):
+            generar_estructura_cacheada(self.acta)
+            generar_estructura_cacheada(documento(*SDI))
+            self.assertEqual(estadisticas_cache()["items_memoria"], 1)
+
+    def test_hit_en_bd_toca_ultimo_uso_a_lo_mas_una_vez(self):
+        generar_estructura_cacheada(self.acta)
+        fila = EstructuraDocumentoCache.objects.get()
+        hace_un_rato = timezone.now() - timedelta(minutes=5)
+        EstructuraDocumentoCache.objects.filter(id=fila.id).update(ultimo_uso=hace_un_rato)
+
+        cache_estructuras._lru.clear()
+        with override_settings(ESTRUCTURA_CACHE_TOQUE_S=3600):
+            generar_estructura_cacheada(self.acta)
+        fila.refresh_from_db()
+        self.assertEqual(fila.ultimo_uso, hace_un_rato)
+
+        cache_estructuras._lru.clear()
+        with override_settings(ESTRUCTURA_CACHE_TOQUE_S=60):
+            generar_estructura_cacheada(self.acta)
+        fila.refresh_from_db()
+        self.assertGreater(fila.ultimo_uso, hace_un_rato)
+
+    def test_purga_vencidas_y_versiones_viejas(self):
+        generar_estructura_cacheada(self.acta)
+        vigente = EstructuraDocumentoCache.objects.get()
+        sha = sha256_archivo(documento(*SDI))
+        EstructuraDocumentoCache.objects.create(
+            sha256=sha, version_extractor="0", estructura_json={}, tamano_bytes=0,
+        )
+        EstructuraDocumentoCache.objects.create(
+            sha256=sha, version_extractor=f"{VERSION_EXTRACTOR}/validation",
+            estructura_json={}, tamano_bytes=0,
+            ultimo_uso=timezone.now() - timedelta(days=31),
+        )
+
+        with override_settings(ESTRUCTURA_CACHE_DIAS_BD=30):
+            purgar_cache_persistente()
+
+        restantes = set(EstructuraDocumentoCache.objects.values_list("id", flat=True))
+        self.assertEqual(restantes, {vigente.id})
+
+    def test_error_de_bd_no_impide_extraer(self):
+        with mock.patch.object(cache_estructuras, "_leer_bd", side_effect=RuntimeError):
+            estructura = generar_estructura_cacheada(self.acta)
+        self.assertTrue(estructura["controles"])
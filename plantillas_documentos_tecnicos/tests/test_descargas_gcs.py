@@ -0,0 +1,41 @@
+from django.test import SimpleTestCase
+
+from plantillas_documentos_tecnicos.descargas_gcs import _coincide_etag, _rango
+
+
+# ======================================================================
+# DESCARGAS: RANGOS / ETAG
+# ======================================================================
+class RangoDescargaTests(SimpleTestCase):
+
+    def test_sin_rango_usable(self):
+        for cabecera in (None, "", "bytes=-", "bytes=0-1,5-9", "items=0-1", "bytes=a-b"):
+            self.assertIsNone(_rango(cabecera, 100), cabecera)
+
+    def test_rangos_validos(self):
+        self.assertEqual(_rango("bytes=0-9", 100), (0, 9))
+        self.assertEqual(_rango("bytes=90-", 100), (90, 99))
+        self.assertEqual(_rango("bytes=90-500", 100), (90, 99))
+        self.assertEqual(_rango("bytes=-10", 100), (90, 99))
+        self.assertEqual(_rango("bytes=-500", 100), (0, 99))
+
+    def test_rangos_insatisfacibles(self):
+        self.assertIs(_rango("bytes=100-", 100), False)
+        self.assertIs(_rango("bytes=9-5", 100), False)
+        self.assertIs(_rango("bytes=-0", 100), False)
+
+    def test_archivo_vacio(self):
+        self.assertIs(_rango("bytes=-5", 0), False)
+        self.assertIs(_rango("bytes=0-", 0), False)
+        self.assertIs(_rango("bytes=-0", 0), False)
+        self.assertIsNone(_rango(None, 0))
+
+    def test_etag(self):
+        etag = '"abc"'
+        self.assertTrue(_coincide_etag('"abc"', etag))
+        self.assertTrue(_coincide_etag('W/"abc"', etag))
+        self.assertTrue(_coincide_etag('"x", "abc"', etag))
+        self.assertTrue(_coincide_etag("*", etag))
+        self.assertFalse(_coincide_etag('"abd"', etag))
+        self.assertFalse(_coincide_etag(None, etag))
+        self.assertFalse(_coincide_etag("", etag))
@@ -0,0 +1,78 @@
+import json
+
+from django.test import SimpleTestCase
+
+from plantillas_documentos_tecnicos.diff_estructuras import diff_excels, diff_tablas_word
+from plantillas_documentos_tecnicos.huellas_tablas import aplicar_huellas
+from plantillas_documentos_tecnicos.tests.datos import tabla_prueba
+
+
+# ======================================================================
+# DIFF POR ÁRBOL DE HASHES
+# ======================================================================
+class DiffEstructurasTests(SimpleTestCase):
+
+    def test_sin_cambios(self):
+        estructura = {"tablas_word": [tabla_prueba(30)]}
+        diff = diff_tablas_word(estructura, json.loads(json.dumps(estructura)))
+        self.assertEqual(diff, {"nuevas": [], "eliminadas": [], "modificadas": []})
+
+    def test_fila_modificada_y_agregada_con_texto(self):
+        anterior = {"tablas_word": [tabla_prueba(30)]}
+        actual = {"tablas_word": [tabla_prueba(31)]}
+        actual["tablas_word"][0]["filas"][10][2] = "nuevo"
+
+        (tabla,) = diff_tablas_word(actual, anterior)["modificadas"]
+        self.assertEqual(tabla["tabla"], "document#1")
+        self.assertEqual(tabla["filas_modificadas"], [{
+            "fila": 10,
+            "columnas": [2],
+            "celdas": [{"columna": 2, "antes": "f10c2", "despues": "nuevo"}],
+        }])
+        self.assertEqual(tabla["filas_agregadas"], [{"fila": 30, "texto": "f30c0 | f30c1 | f30c2"}])
+        self.assertEqual(tabla["filas_eliminadas"], [])
+        self.assertEqual(tabla["totales"]["filas_modificadas"], 1)
+
+    def test_tablas_sin_par_se_describen_por_encabezado(self):
+        anterior = {"tablas_word": [tabla_prueba(3, index=1, n_columnas=2)]}
+        actual = {"tablas_word": [tabla_prueba(3, index=5, n_columnas=4)]}
+        diff = diff_tablas_word(actual, anterior)
+        self.assertEqual(diff["nuevas"], ["document#5: Col 0 | Col 1 | Col 2 | Col 3"])
+        self.assertEqual(diff["eliminadas"], ["document#1: Col 0 | Col 1"])
+
+    def test_solo_huellas_entrega_rangos(self):
+        anterior = {"tablas_word": [tabla_prueba(100)]}
+        actual = {"tablas_word": [tabla_prueba(100)]}
+        actual["tablas_word"][0]["filas"][60][0] = "x"
+        diff = diff_tablas_word(aplicar_huellas(actual), aplicar_huellas(anterior))
+        (tabla,) = diff["modificadas"]
+        self.assertNotIn("filas_modificadas", tabla)
+        ((desde, hasta),) = tabla["rangos_distintos"]
+        self.assertLessEqual(desde, 60)
+        self.assertGreater(hasta, 60)
+
+    def test_excel_empareja_tablas_por_hoja(self):
+        def excel(n_filas, rango):
+            tabla = tabla_prueba(n_filas)
+            tabla.update({"worksheet": "Datos", "tabla": None, "rango": rango})
+            del tabla["index"], tabla["origen"]
+            return {"excel": "word/embeddings/a.xlsx", "tablas": [tabla]}
+
+        anterior = {"excels": [excel(10, "A1:C10")]}
+        actual = {"excels": [excel(11, "A1:C11")]}
+        diff = diff_excels(actual, anterior)
+        self.assertEqual(diff["nuevos"], [])
+        self.assertEqual(diff["eliminados"], [])
+        (modificado,) = diff["modificados"]
+        self.assertEqual(modificado["excel"], "word/embeddings/a.xlsx")
+        self.assertEqual(modificado["nuevas"], [])
+        self.assertEqual(modificado["eliminadas"], [])
+        self.assertEqual(modificado["modificadas"][0]["totales"]["filas_agregadas"], 1)
+
+    def test_excels_distintos_no_se_emparejan(self):
+        anterior = {"excels": [{"excel": "word/embeddings/a.xlsx", "tablas": []}]}
+        actual = {"excels": [{"excel": "word/embeddings/b.xlsx", "tablas": []}]}
+        diff = diff_excels(actual, anterior)
+        self.assertEqual(diff["nuevos"], ["word/embeddings/b.xlsx"])
+        self.assertEqual(diff["eliminados"], ["word/embeddings/a.xlsx"])
+        self.assertEqual(diff["modificados"], [])
@@ -0,0 +1,44 @@
+from unittest import mock
+
+from django.db import IntegrityError
+from django.test import TestCase
+
+from plantillas_documentos_tecnicos import diffs_versiones
+from plantillas_documentos_tecnicos.diff_estructuras import VERSION_DIFF
+from plantillas_documentos_tecnicos.models import DiffVersionPlantilla
+
+
+class DiffsVersionesTests(TestCase):
+
+    def test_se_calcula_una_vez_y_queda_guardado(self):
+        with mock.patch.object(diffs_versiones, "calcular_diff_versiones",
+                               return_value={"tablas_word": {}}) as calcular:
+            self.assertEqual(diffs_versiones.obtener_diff_versiones(2, 1), {"tablas_word": {}})
+            self.assertEqual(diffs_versiones.obtener_diff_versiones(2, 1), {"tablas_word": {}})
+        self.assertEqual(calcular.call_count, 1)
+
+    def test_otra_version_diff_se_recalcula(self):
+        DiffVersionPlantilla.objects.create(
+            version_id=2, version_anterior_id=1, version_diff="0", diff_json={"viejo": True}
+        )
+        with mock.patch.object(diffs_versiones, "calcular_diff_versiones",
+                               return_value={"nuevo": True}):
+            self.assertEqual(diffs_versiones.obtener_diff_versiones(2, 1), {"nuevo": True})
+        guardado = DiffVersionPlantilla.objects.get(version_id=2, version_anterior_id=1)
+        self.assertEqual((guardado.version_diff, guardado.diff_json), (VERSION_DIFF, {"nuevo": True}))
+
+    def test_error_de_bd_al_guardar_se_registra(self):
+        with mock.patch.object(diffs_versiones, "calcular_diff_versiones",
+                               return_value={"nuevo": True}), \
+                mock.patch.object(diffs_versiones, "guardar_diff_versiones",
+                                  side_effect=IntegrityError("duplicado")), \
+                self.assertLogs(diffs_versiones.logger, "ERROR") as registro:
+            self.assertEqual(diffs_versiones.obtener_diff_versiones(2, 1), {"nuevo": True})
+        self.assertIn("1 → 2", registro.output[0])
+
+    def test_otros_errores_no_se_esconden(self):
+        with mock.patch.object(diffs_versiones, "calcular_diff_versiones", return_value={}), \
+                mock.patch.object(diffs_versiones, "guardar_diff_versiones",
+                                  side_effect=TypeError("no serializable")):
+            with self.assertRaises(TypeError):
+                diffs_versiones.obtener_diff_versiones(2, 1)
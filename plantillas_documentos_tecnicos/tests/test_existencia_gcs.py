@@ -0,0 +1,85 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from plantillas_documentos_tecnicos import existencia_gcs
+
+
+# ======================================================================
+# EXISTENCIA EN GCS
+# ======================================================================
+class PrefijoComunTests(SimpleTestCase):
+
+    def test_prefijo_comun(self):
+        self.assertEqual(existencia_gcs._prefijo_comun(["a/b/c.docx", "a/b/d.docx"]), "a/b/")
+        self.assertEqual(existencia_gcs._prefijo_comun(["a/bc/1", "a/bd/2"]), "a/")
+        self.assertEqual(existencia_gcs._prefijo_comun(["a/b/c.docx"]), "a/b/")
+
+    def test_prefijo_comun_vacio(self):
+        self.assertEqual(existencia_gcs._prefijo_comun(["a/x", "b/y"]), "")
+        self.assertEqual(existencia_gcs._prefijo_comun(["a.docx", "b.docx"]), "")
+
+    def test_prefijo_vacio_no_lista_el_bucket(self):
+        rutas = [f"A/B/{i}.docx" for i in range(10)] + [f"C/D/{i}.docx" for i in range(10)]
+        rutas += ["suelto.docx"]
+
+        def listar(prefijo):
+            return {f"{prefijo}{i}.docx" for i in range(5)}
+
+        with mock.patch.object(existencia_gcs, "_listar", side_effect=listar) as listar_mock, \
+                mock.patch.object(existencia_gcs, "_heads", return_value=set()) as heads_mock:
+            existencia_gcs.invalidar_existencia()
+            existentes = existencia_gcs.blobs_existentes(rutas)
+
+        prefijos = sorted(c.args[0] for c in listar_mock.call_args_list)
+        self.assertEqual(prefijos, ["A/B/", "C/D/"])
+        heads_mock.assert_called_once_with({"suelto.docx"})
+        self.assertEqual(len(existentes), 10)
+        existencia_gcs.invalidar_existencia()
+
+
+@override_settings(GCS_EXISTENCIA_TTL_S=60)
+class PurgaExistenciaTests(SimpleTestCase):
+
+    def setUp(self):
+        existencia_gcs.invalidar_existencia()
+        self.reloj = mock.Mock()
+        parches = [
+            mock.patch.object(existencia_gcs, "time", self.reloj),
+            mock.patch.object(existencia_gcs, "_proxima_purga", 0.0),
+        ]
+        for parche in parches:
+            parche.start()
+            self.addCleanup(parche.stop)
+        self.addCleanup(existencia_gcs.invalidar_existencia)
+
+    def test_lo_vencido_se_barre_al_escribir(self):
+        self.reloj.monotonic.return_value = 1000.0
+        existencia_gcs.marcar_existencia("a/b/1.docx")
+        with mock.patch.object(existencia_gcs, "obtener_bucket") as bucket:
+            bucket.return_value.list_blobs.return_value = []
+            existencia_gcs._listar("a/b/")
+        self.assertEqual(existencia_gcs.estadisticas_existencia()["rutas"], 1)
+        self.assertEqual(existencia_gcs.estadisticas_existencia()["listados_en_cache"], 1)
+
+        self.reloj.monotonic.return_value = 1061.0
+        existencia_gcs.marcar_existencia("c/d/2.docx")
+
+        datos = existencia_gcs.estadisticas_existencia()
+        self.assertEqual((datos["rutas"], datos["listados_en_cache"]), (1, 0))
+        self.assertEqual(existencia_gcs._rutas, {"c/d/2.docx": (True, 1121.0)})
+
+    def test_a_lo_mas_una_purga_por_ttl(self):
+        self.reloj.monotonic.return_value = 1000.0
+        existencia_gcs.marcar_existencia("a/1")
+
+        # a/1 vence en 1060, pero la próxima purga toca recién en 1060
+        self.reloj.monotonic.return_value = 1030.0
+        existencia_gcs.marcar_existencia("a/2")
+        self.reloj.monotonic.return_value = 1059.0
+        existencia_gcs.marcar_existencia("a/3")
+        self.assertEqual(len(existencia_gcs._rutas), 3)
+
+        self.reloj.monotonic.return_value = 1061.0
+        existencia_gcs.marcar_existencia("a/4")
+        self.assertEqual(sorted(existencia_gcs._rutas), ["a/2", "a/3", "a/4"])
@@ -0,0 +1,50 @@
+import json
+import zlib
+
+from django.test import SimpleTestCase
+
+from plantillas_documentos_tecnicos.formato_estructura import (
+    FORMATO_COMPACTO,
+    desempaquetar,
+    empaquetar,
+)
+from plantillas_documentos_tecnicos.tests.datos import tabla_prueba
+
+
+# ======================================================================
+# FORMATO COMPACTO
+# ======================================================================
+class FormatoEstructuraTests(SimpleTestCase):
+
+    def test_ida_y_vuelta(self):
+        estructura = {
+            "controles": [
+                {"alias": "Cliente", "tag": "cli", "tipo": "texto"},
+                {"alias": "Fecha", "tipo": "fecha"},
+                {"alias": None, "tag": "x", "extra": [1, 2]},
+            ],
+            "tablas_word": [tabla_prueba(12), tabla_prueba(3, index=2)],
+            "matriz_irregular": [["a", "b", "c"], ["d"], [], [1, None, "ñ"]],
+            "claves_propias": {"@t": "no es una tabla compacta", "@s": [1]},
+            "vacios": {"lista": [], "dict": {}, "texto": ""},
+            "numeros": [1, 2.5, True, None],
+        }
+        self.assertEqual(desempaquetar(empaquetar(estructura)), estructura)
+
+    def test_conserva_el_orden_de_las_claves(self):
+        estructura = {"z": 1, "a": [{"y": 1, "b": 2}, {"b": 3, "y": 4}]}
+        resultado = desempaquetar(empaquetar(estructura))
+        self.assertEqual(list(resultado), ["z", "a"])
+        self.assertEqual([list(d) for d in resultado["a"]], [["y", "b"], ["b", "y"]])
+
+    def test_estructura_vacia(self):
+        self.assertEqual(desempaquetar(empaquetar({})), {})
+
+    def test_acepta_memoryview(self):
+        estructura = {"tablas_word": [tabla_prueba(5)]}
+        self.assertEqual(desempaquetar(memoryview(empaquetar(estructura))), estructura)
+
+    def test_version_distinta(self):
+        datos = zlib.compress(json.dumps({"v": FORMATO_COMPACTO + 1, "s": [], "e": {}}).encode())
+        with self.assertRaises(ValueError):
+            desempaquetar(datos)
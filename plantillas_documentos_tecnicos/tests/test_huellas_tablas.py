@@ -0,0 +1,62 @@
+from django.test import SimpleTestCase
+
+from plantillas_documentos_tecnicos.huellas_tablas import (
+    MAX_BLOQUES,
+    MUESTRA_FIN,
+    MUESTRA_INICIO,
+    clave_tabla,
+    con_huellas,
+    fila_encabezado,
+    huella_tabla,
+)
+from plantillas_documentos_tecnicos.tests.datos import tabla_prueba
+
+
+# ======================================================================
+# HUELLAS DE TABLAS
+# ======================================================================
+class HuellasTablasTests(SimpleTestCase):
+
+    def test_misma_clave_con_filas_y_con_huellas(self):
+        tabla = tabla_prueba(40)
+        reducida = con_huellas(tabla)
+        self.assertNotIn("filas", reducida)
+        self.assertEqual(clave_tabla(tabla), clave_tabla(reducida))
+        self.assertEqual(huella_tabla(tabla), huella_tabla(reducida))
+
+    def test_con_huellas_no_reprocesa(self):
+        reducida = con_huellas(tabla_prueba(10))
+        self.assertIs(con_huellas(reducida), reducida)
+
+    def test_muestra_y_bloques_acotados(self):
+        reducida = con_huellas(tabla_prueba(1000))
+        self.assertEqual(len(reducida["muestra"]["inicio"]), MUESTRA_INICIO)
+        self.assertEqual(len(reducida["muestra"]["fin"]), MUESTRA_FIN)
+        self.assertEqual(reducida["muestra"]["fin"][-1], ["f999c0", "f999c1", "f999c2"])
+        self.assertLessEqual(len(reducida["huellas"]["bloques"]), MAX_BLOQUES)
+        fpb = reducida["huellas"]["filas_por_bloque"]
+        self.assertGreaterEqual(fpb * len(reducida["huellas"]["bloques"]), 1000)
+
+    def test_tabla_chica_sin_bloques(self):
+        reducida = con_huellas(tabla_prueba(MUESTRA_INICIO + MUESTRA_FIN))
+        self.assertEqual(reducida["huellas"]["bloques"], [])
+
+    def test_tabla_vacia(self):
+        tabla = {"index": 1, "filas": [], "n_filas": 0, "n_columnas": 0}
+        reducida = con_huellas(tabla)
+        self.assertEqual(reducida["huellas"]["bloques"], [])
+        self.assertEqual(reducida["muestra"], {"inicio": [], "fin": []})
+        self.assertEqual(fila_encabezado(reducida), [])
+        self.assertEqual(clave_tabla(tabla), clave_tabla(reducida))
+
+    def test_una_fila_cambia_un_solo_bloque(self):
+        a, b = tabla_prueba(200), tabla_prueba(200)
+        b["filas"][150][1] = "otro"
+        bloques_a = con_huellas(a)["huellas"]["bloques"]
+        bloques_b = con_huellas(b)["huellas"]["bloques"]
+        self.assertNotEqual(huella_tabla(a), huella_tabla(b))
+        self.assertEqual(sum(x != y for x, y in zip(bloques_a, bloques_b)), 1)
+
+    def test_encabezado_desde_la_muestra(self):
+        tabla = tabla_prueba(20)
+        self.assertEqual(fila_encabezado(con_huellas(tabla)), tabla["filas"][0])
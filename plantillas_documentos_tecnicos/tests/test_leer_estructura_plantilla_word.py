@@ -0,0 +1,189 @@
+import glob
+import io
+import json
+import os
+import pickle
+import zipfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from plantillas_documentos_tecnicos import leer_estructura_plantilla_word as lector
+from plantillas_documentos_tecnicos.leer_estructura_plantilla_word import (
+    PERFILES,
+    SECCIONES,
+    EstructuraDocumento,
+    backend_xml,
+    generar_estructura,
+    generar_estructura_incremental,
+    resolver_perfil,
+)
+from plantillas_documentos_tecnicos.tests.datos import ACTA, CORPUS, documento
+
+
+# ======================================================================
+# PERFILES Y SECCIONES PEREZOSAS
+# ======================================================================
+class PerfilesExtraccionTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.ruta = documento(*ACTA)
+        cls.completa = generar_estructura(cls.ruta)
+
+    def test_resolver_perfil(self):
+        self.assertEqual(resolver_perfil(None), PERFILES["full"])
+        self.assertEqual(resolver_perfil("validation"), {"tablas_word", "excels", "imagenes"})
+        self.assertEqual(resolver_perfil("parrafos"), {"parrafos"})
+        self.assertEqual(resolver_perfil(["controles", "imagenes"]), {"controles", "imagenes"})
+        with self.assertRaises(ValueError):
+            resolver_perfil("otro")
+        with self.assertRaises(ValueError):
+            resolver_perfil(["controles", "otra"])
+
+    def test_perfil_completo_es_un_dict_comun(self):
+        self.assertIs(type(self.completa), dict)
+        self.assertEqual(
+            set(self.completa), {"controles", "tablas_word", "excels", "imagenes", "metadata"}
+        )
+
+    def test_perfil_parcial_solo_extrae_lo_pedido(self):
+        with mock.patch.object(lector, "_extraer_estructura_zip",
+                               wraps=lector._extraer_estructura_zip) as extraer:
+            estructura = generar_estructura(self.ruta, "validation")
+
+        self.assertIsInstance(estructura, EstructuraDocumento)
+        extraer.assert_called_once()
+        self.assertEqual(extraer.call_args.args[1], PERFILES["validation"])
+        self.assertEqual(estructura.pendientes, set(SECCIONES) - PERFILES["validation"])
+        self.assertNotIn("controles", dict.keys(estructura))
+        self.assertEqual(estructura["tablas_word"], self.completa["tablas_word"])
+
+    def test_seccion_pendiente_se_extrae_al_primer_acceso(self):
+        estructura = generar_estructura(self.ruta, "validation")
+
+        with mock.patch.object(lector, "_extraer_estructura_zip",
+                               wraps=lector._extraer_estructura_zip) as extraer:
+            self.assertEqual(estructura["controles"], self.completa["controles"])
+            self.assertEqual(estructura.get("controles"), self.completa["controles"])
+            self.assertEqual(
+                estructura["metadata"]["parrafos"], self.completa["metadata"]["parrafos"]
+            )
+
+        secciones = [c.args[1] for c in extraer.call_args_list]
+        self.assertEqual(secciones, [{"controles"}, {"parrafos"}])
+        self.assertNotIn("controles", estructura.pendientes)
+
+    def test_materializar_y_serializar_dan_la_completa(self):
+        estructura = generar_estructura(self.ruta, "signature").materializar()
+        self.assertEqual(estructura.pendientes, frozenset())
+        self.assertEqual(json.loads(json.dumps(estructura)), self.completa)
+
+        copia = pickle.loads(pickle.dumps(generar_estructura(self.ruta, "validation")))
+        self.assertIs(type(copia), dict)
+        self.assertEqual(copia, self.completa)
+
+    def test_clave_desconocida(self):
+        estructura = generar_estructura(self.ruta, "validation")
+        with self.assertRaises(KeyError):
+            estructura["no_existe"]
+        self.assertIsNone(estructura.get("no_existe"))
+
+
+# ======================================================================
+# EXTRACCIÓN INCREMENTAL
+# ======================================================================
+EXCEL_1 = "word/embeddings/Microsoft_Excel_Worksheet1.xlsx"
+EXCEL_2 = "word/embeddings/Microsoft_Excel_Worksheet2.xlsx"
+
+
+def _reemplazar(ruta, reemplazos):
+    """Copia en memoria del .docx con algunos miembros reemplazados."""
+    salida = io.BytesIO()
+    with zipfile.ZipFile(ruta) as origen, \
+            zipfile.ZipFile(salida, "w", zipfile.ZIP_DEFLATED) as destino:
+        for info in origen.infolist():
+            destino.writestr(info, reemplazos.get(info.filename) or origen.read(info))
+    return salida.getvalue()
+
+
+class ExtraccionIncrementalTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.ruta = documento(*ACTA)
+        cls.previa, cls.manifiesto = generar_estructura_incremental(cls.ruta)
+
+    def test_sin_version_anterior_es_la_extraccion_completa(self):
+        self.assertEqual(self.previa, generar_estructura(self.ruta))
+        self.assertEqual(self.manifiesto["reutilizadas"], [])
+
+    def test_mismo_archivo_reutiliza_todo(self):
+        with mock.patch.object(lector, "tablas_excel_embebido") as excel:
+            estructura, manifiesto = generar_estructura_incremental(
+                self.ruta, self.previa, self.manifiesto
+            )
+        excel.assert_not_called()
+        self.assertEqual(estructura, self.previa)
+        self.assertIn("word/document.xml", manifiesto["reutilizadas"])
+        self.assertIn(EXCEL_1, manifiesto["reutilizadas"])
+
+    def test_solo_se_vuelve_a_leer_el_excel_que_cambio(self):
+        with zipfile.ZipFile(self.ruta) as z:
+            otro_excel = z.read(EXCEL_2)
+        nuevo = _reemplazar(self.ruta, {EXCEL_1: otro_excel})
+
+        with mock.patch.object(lector, "tablas_excel_embebido",
+                               wraps=lector.tablas_excel_embebido) as excel:
+            estructura, manifiesto = generar_estructura_incremental(
+                nuevo, self.previa, self.manifiesto, nombre="nuevo.docx"
+            )
+
+        self.assertEqual([c.args[1] for c in excel.call_args_list], [EXCEL_1])
+        self.assertNotIn(EXCEL_1, manifiesto["reutilizadas"])
+        self.assertIn("word/document.xml", manifiesto["reutilizadas"])
+        self.assertEqual(estructura, generar_estructura(nuevo, nombre="nuevo.docx"))
+
+    def test_estructura_previa_perezosa(self):
+        cargar = mock.Mock(return_value=self.previa)
+        otra_version = dict(self.manifiesto, version_extractor="0")
+
+        estructura, manifiesto = generar_estructura_incremental(self.ruta, cargar, otra_version)
+
+        cargar.assert_not_called()
+        self.assertEqual(manifiesto["reutilizadas"], [])
+        self.assertEqual(estructura, self.previa)
+
+    def test_un_resumen_no_se_reutiliza(self):
+        resumen = dict(self.previa, metadata={"resumen": True})
+        _, manifiesto = generar_estructura_incremental(self.ruta, resumen, self.manifiesto)
+        self.assertEqual(manifiesto["reutilizadas"], [])
+
+
+# ======================================================================
+# BACKENDS XML
+# ======================================================================
+class BackendXmlTests(SimpleTestCase):
+
+    def test_backend_desde_settings(self):
+        with override_settings(ESTRUCTURA_BACKEND_XML="lxml"):
+            self.assertEqual(backend_xml(), "lxml")
+        with override_settings(ESTRUCTURA_BACKEND_XML="sax"):
+            with self.assertRaises(ValueError):
+                backend_xml()
+
+    def test_etree_y_lxml_dan_la_misma_estructura(self):
+        rutas = sorted(glob.glob(os.path.join(CORPUS, "**", "*.docx"), recursive=True))
+        self.assertTrue(rutas)
+        for ruta in rutas:
+            for huellas in (False, True):
+                with self.subTest(documento=os.path.basename(ruta), huellas=huellas):
+                    with override_settings(ESTRUCTURA_BACKEND_XML="etree"):
+                        con_etree = generar_estructura(ruta, huellas=huellas)
+                    with override_settings(ESTRUCTURA_BACKEND_XML="lxml"):
+                        with mock.patch.object(lector.ET, "iterparse") as etree_iterparse:
+                            con_lxml = generar_estructura(ruta, huellas=huellas)
+                        etree_iterparse.assert_not_called()
+                    self.assertEqual(con_lxml, con_etree)
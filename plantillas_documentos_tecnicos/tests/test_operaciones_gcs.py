@@ -0,0 +1,144 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from google.api_core.exceptions import ServiceUnavailable
+
+from plantillas_documentos_tecnicos import operaciones_gcs
+from plantillas_documentos_tecnicos.models import MovimientoCarpetaGCS
+from plantillas_documentos_tecnicos.operaciones_gcs import (
+    MovimientoEnConflicto,
+    borrar_blobs,
+    copiar_blob,
+    eliminar_objetos,
+    mover_prefijo,
+)
+from plantillas_documentos_tecnicos.tests.gcs_falso import BucketFalso, ClienteFalso
+
+
+class _ConBucketFalso:
+
+    def usar_bucket(self, objetos):
+        self.bucket = BucketFalso(objetos)
+        parches = [
+            mock.patch.object(operaciones_gcs, "obtener_bucket", return_value=self.bucket),
+            mock.patch.object(operaciones_gcs, "cliente_para_lotes",
+                              side_effect=lambda: ClienteFalso(self.bucket)),
+        ]
+        for parche in parches:
+            parche.start()
+            self.addCleanup(parche.stop)
+        return self.bucket
+
+
+# ======================================================================
+# MOVER CARPETA
+# ======================================================================
+@override_settings(GCS_LOTE_BATCH=2, GCS_HILOS_OPERACIONES=2)
+class MoverPrefijoTests(_ConBucketFalso, TestCase):
+
+    def setUp(self):
+        self.usar_bucket({
+            "A/1.docx": b"uno",
+            "A/sub/2.docx": b"dos",
+            "A/3.docx": b"tres",
+            "A/4.docx": b"cuatro",
+            "AB/no.docx": b"otro prefijo",
+        })
+
+    def test_mueve_con_nombres_relativos_y_cierra_el_checkpoint(self):
+        resultado = mover_prefijo("A/", "Z/")
+
+        self.assertEqual((resultado["movidos"], resultado["total"]), (4, 4))
+        self.assertEqual(sorted(self.bucket.objetos), [
+            "AB/no.docx", "Z/1.docx", "Z/3.docx", "Z/4.docx", "Z/sub/2.docx",
+        ])
+        self.assertEqual(self.bucket.objetos["Z/sub/2.docx"], b"dos")
+        self.assertEqual([len(lote) for lote in self.bucket.lotes], [2, 2])
+        mov = MovimientoCarpetaGCS.objects.get()
+        self.assertEqual(
+            (mov.estado, mov.movidos, mov.total), (MovimientoCarpetaGCS.COMPLETADO, 4, 4)
+        )
+
+    def test_prefijos_invalidos_no_tocan_nada(self):
+        for origen, destino in (("", "Z/"), ("A/", "A/"), ("A/", "A/dentro/")):
+            with self.subTest(origen=origen, destino=destino):
+                with self.assertRaises(ValueError):
+                    mover_prefijo(origen, destino)
+        self.assertFalse(MovimientoCarpetaGCS.objects.exists())
+        self.assertEqual(self.bucket.listados, [])
+
+    def test_se_retoma_despues_de_un_error(self):
+        self.bucket.fallar_rewrite.add("A/4.docx")
+        with self.assertRaises(RuntimeError):
+            mover_prefijo("A/", "Z/")
+
+        mov = MovimientoCarpetaGCS.objects.get()
+        self.assertEqual(
+            (mov.estado, mov.movidos, mov.total), (MovimientoCarpetaGCS.ERROR, 2, 4)
+        )
+        self.assertIn("A/4.docx", mov.ultimo_error)
+        self.assertEqual(self.bucket.objetos["A/4.docx"], b"cuatro")
+
+        self.bucket.fallar_rewrite.clear()
+        resultado = mover_prefijo("A/", "Z/")
+
+        self.assertEqual((resultado["movidos"], resultado["total"]), (4, 4))
+        self.assertFalse([n for n in self.bucket.objetos if n.startswith("A/")])
+        mov.refresh_from_db()
+        self.assertEqual((mov.estado, mov.ultimo_error), (MovimientoCarpetaGCS.COMPLETADO, ""))
+
+    def test_movimiento_abierto_hacia_otro_destino(self):
+        MovimientoCarpetaGCS.objects.create(prefijo_origen="A/", prefijo_destino="Y/")
+        with self.assertRaises(MovimientoEnConflicto):
+            mover_prefijo("A/", "Z/")
+        self.assertIn("A/1.docx", self.bucket.objetos)
+
+    def test_rewrite_en_varias_llamadas(self):
+        self.bucket.objetos["C/grande.bin"] = b"x" * (BucketFalso.REWRITE_POR_LLAMADA + 1)
+        destino = copiar_blob("C/grande.bin", "D/grande.bin", content_type="application/pdf")
+
+        self.assertEqual(destino.content_type, "application/pdf")
+        self.assertEqual(self.bucket.objetos["D/grande.bin"], self.bucket.objetos["C/grande.bin"])
+        self.assertEqual(self.bucket.llamadas_rewrite,
+                         [("C/grande.bin", None), ("C/grande.bin", "siguiente")])
+
+
+# ======================================================================
+# BORRADO POR LOTES
+# ======================================================================
+@override_settings(GCS_LOTE_BATCH=3, GCS_HILOS_OPERACIONES=4)
+class BorradoPorLotesTests(_ConBucketFalso, SimpleTestCase):
+
+    def setUp(self):
+        self.usar_bucket({f"P/{i:02}.docx": b"x" for i in range(8)})
+
+    def test_borra_en_lotes(self):
+        blobs = [self.bucket.blob(f"P/{i:02}.docx") for i in range(8)]
+        self.assertEqual(borrar_blobs(blobs), 8)
+        self.assertEqual(self.bucket.objetos, {})
+        self.assertEqual(sorted(len(lote) for lote in self.bucket.lotes), [2, 3, 3])
+
+    def test_un_404_no_es_error(self):
+        self.assertEqual(borrar_blobs([self.bucket.blob("P/no_existe.docx")]), 1)
+
+    def test_falla_de_un_delete_se_informa(self):
+        self.bucket.fallar_delete.add("P/01.docx")
+        blobs = [self.bucket.blob(f"P/{i:02}.docx") for i in range(3)]
+
+        with self.assertRaises(ServiceUnavailable) as error:
+            borrar_blobs(blobs)
+
+        self.assertIn("1 de 3 deletes fallaron (primero P/01.docx)", str(error.exception))
+        self.assertEqual(sorted(self.bucket.objetos)[:2], ["P/01.docx", "P/03.docx"])
+
+    def test_eliminar_objetos_lista_cada_prefijo_una_vez(self):
+        self.bucket.objetos.update({"Q/a.docx": b"", "R/suelto.docx": b""})
+
+        resultado = eliminar_objetos(
+            nombres=["P/00.docx", "R/suelto.docx", "R/ya_no_esta.docx", ""],
+            prefijos=["P/", "P/sub/", ""],
+        )
+
+        self.assertEqual(self.bucket.listados, ["P/"])
+        self.assertEqual(sorted(self.bucket.objetos), ["Q/a.docx"])
+        self.assertEqual((resultado["objetos"], resultado["lotes"]), (10, 4))
@@ -0,0 +1,184 @@
+import io
+import json
+import zipfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from plantillas_documentos_tecnicos import planes_validacion
+from plantillas_documentos_tecnicos.formato_estructura import resumir_estructura
+from plantillas_documentos_tecnicos.leer_estructura_plantilla_word import generar_estructura
+from plantillas_documentos_tecnicos.planes_validacion import PlanValidacion
+from plantillas_documentos_tecnicos.tests.datos import ACTA, SDI, documento
+
+CORPUS_EXTRA = (
+    ("Reunion de inicio", "REUNIÓN INICIO.docx"),
+    ("Reporte Diario", "REPORTE.docx"),
+)
+
+
+def _subida(partes):
+    """Estructura como la de un archivo subido, como dict plano."""
+    estructura = generar_estructura(documento(*partes), "validation", huellas=True)
+    return json.loads(json.dumps(estructura))
+
+
+# ======================================================================
+# PLAN COMPILADO
+# ======================================================================
+class PlanValidacionTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.base = generar_estructura(documento(*ACTA))
+        cls.plan = PlanValidacion(resumir_estructura(cls.base), version_id=1)
+
+    def test_mismo_documento_ok(self):
+        dif = self.plan.validar(_subida(ACTA))
+        self.assertEqual(dif["status"], "OK")
+        self.assertEqual(dif["detalles"], [])
+
+    def test_resumen_y_estructura_completa_dan_el_mismo_plan(self):
+        completo = PlanValidacion(self.base)
+        sdi = _subida(SDI)
+        self.assertEqual(completo.validar(sdi), self.plan.validar(sdi))
+        self.assertEqual(self.plan.validar(sdi)["status"], "ERROR")
+
+    def test_tabla_excel_con_otro_tamano(self):
+        subida = _subida(ACTA)
+        excel = subida["excels"][0]
+        tabla = excel["tablas"][0]
+        tabla["n_filas"] += 1
+        tabla["muestra"]["inicio"][0].append("EMPRESA")
+
+        dif = self.plan.validar(subida)
+
+        nombre = f"Excel {excel['excel']} > Tabla {tabla['tabla']}"
+        self.assertEqual(dif["status"], "ERROR")
+        self.assertEqual(dif["detalles"], [
+            f"{nombre}: distinta cantidad de columnas.",
+            f"{nombre}: distinta cantidad de filas.",
+        ])
+
+    def test_faltantes_y_sobrantes(self):
+        subida = _subida(ACTA)
+        quitado = subida["excels"].pop()["excel"]
+        subida["imagenes"].append({"nombre": "extra.png"})
+
+        dif = self.plan.validar(subida)
+
+        self.assertEqual(dif["excels"]["faltantes"], [quitado])
+        self.assertEqual(dif["imagenes"]["sobrantes"], ["extra.png"])
+        self.assertEqual(dif["status"], "ERROR")
+
+
+# ======================================================================
+# CACHE DE PLANES
+# ======================================================================
+@override_settings(VALIDACION_RQ_TTL_S=60)
+class CachePlanesTests(SimpleTestCase):
+
+    def setUp(self):
+        parches = [
+            mock.patch.object(planes_validacion, "connection"),
+            mock.patch.object(planes_validacion, "_planes", planes_validacion.OrderedDict()),
+            mock.patch.object(planes_validacion, "_versiones_rq", planes_validacion.OrderedDict()),
+        ]
+        self.connection = parches[0].start()
+        for parche in parches[1:]:
+            parche.start()
+        for parche in parches:
+            self.addCleanup(parche.stop)
+        self.cursor = self.connection.cursor.return_value.__enter__.return_value
+
+    def _reloj(self, ahora):
+        return mock.patch.object(planes_validacion, "time", mock.Mock(**{"monotonic.return_value": ahora}))
+
+    def test_plan_se_compila_una_vez_por_version(self):
+        with mock.patch.object(planes_validacion, "cargar_resumen_version",
+                               return_value={"imagenes": [{"nombre": "a.png"}]}) as cargar:
+            plan = planes_validacion.plan_validacion(7)
+            self.assertIs(planes_validacion.plan_validacion(7), plan)
+            self.assertEqual(cargar.call_count, 1)
+
+            planes_validacion.invalidar_plan(7)
+            self.assertIsNot(planes_validacion.plan_validacion(7), plan)
+            self.assertEqual(cargar.call_count, 2)
+
+    def test_version_sin_estructura(self):
+        with mock.patch.object(planes_validacion, "cargar_resumen_version", return_value=None):
+            with self.assertRaises(ValueError):
+                planes_validacion.plan_validacion(7)
+
+    def test_requerimiento_version_vence(self):
+        self.cursor.fetchone.return_value = (7,)
+        with self._reloj(1000.0):
+            self.assertEqual(planes_validacion.version_plantilla_requerimiento(3), 7)
+            self.assertEqual(planes_validacion.version_plantilla_requerimiento(3), 7)
+        self.assertEqual(self.cursor.execute.call_count, 1)
+
+        self.cursor.fetchone.return_value = (8,)
+        with self._reloj(1061.0):
+            self.assertEqual(planes_validacion.version_plantilla_requerimiento(3), 8)
+        self.assertEqual(self.cursor.execute.call_count, 2)
+
+
+# ======================================================================
+# SOLO ESTADO (FAIL-FAST)
+# ======================================================================
+class EstadoPlanTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.plan = PlanValidacion(resumir_estructura(generar_estructura(documento(*ACTA))))
+
+    def _docx_sin(self, partes, quitar):
+        """Copia en memoria del .docx sin los miembros que empiezan con quitar."""
+        salida = io.BytesIO()
+        with zipfile.ZipFile(documento(*partes)) as origen, \
+                zipfile.ZipFile(salida, "w", zipfile.ZIP_DEFLATED) as destino:
+            for info in origen.infolist():
+                if not info.filename.startswith(quitar):
+                    destino.writestr(info, origen.read(info))
+        return salida.getvalue()
+
+    def test_mismo_status_que_validar(self):
+        for partes in (ACTA, SDI, *CORPUS_EXTRA):
+            with self.subTest(documento=partes[-1]):
+                self.assertEqual(
+                    self.plan.estado(documento(*partes))["status"],
+                    self.plan.validar(_subida(partes))["status"],
+                )
+
+    def test_mismo_documento_sin_error(self):
+        self.assertEqual(
+            self.plan.estado(documento(*ACTA)), {"status": "OK", "primer_error": None}
+        )
+
+    def test_corta_antes_de_parsear_el_documento(self):
+        docx = self._docx_sin(ACTA, "word/media/")
+        with mock.patch.object(planes_validacion, "recorrer_tablas_word") as recorrer, \
+                mock.patch.object(planes_validacion, "tablas_excel_embebido") as excel:
+            estado = self.plan.estado(docx)
+
+        self.assertEqual(estado["status"], "ERROR")
+        self.assertEqual(estado["primer_error"]["seccion"], "imagenes")
+        self.assertEqual(estado["primer_error"]["tipo"], "faltante")
+        recorrer.assert_not_called()
+        excel.assert_not_called()
+
+    def test_excel_faltante(self):
+        docx = self._docx_sin(ACTA, "word/embeddings/Microsoft_Excel_Worksheet1.xlsx")
+        estado = self.plan.estado(docx)
+        self.assertEqual(estado["primer_error"], {
+            "seccion": "excels",
+            "tipo": "faltante",
+            "item": "word/embeddings/Microsoft_Excel_Worksheet1.xlsx",
+            "mensaje": "Falta el Excel embebido word/embeddings/Microsoft_Excel_Worksheet1.xlsx.",
+        })
+
+    def test_no_es_docx(self):
+        with self.assertRaises(ValueError):
+            self.plan.estado(self._docx_sin(ACTA, "word/document.xml"))
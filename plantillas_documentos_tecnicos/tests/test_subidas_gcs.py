@@ -0,0 +1,125 @@
+import base64
+import hashlib
+import io
+from unittest import mock
+
+import google_crc32c
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from google.api_core.exceptions import PreconditionFailed
+
+from plantillas_documentos_tecnicos import subidas_gcs
+from plantillas_documentos_tecnicos.models import ArchivoSubidoGCS
+from plantillas_documentos_tecnicos.subidas_gcs import ErrorSubida, SubidaGCS, duplicados
+from plantillas_documentos_tecnicos.tests.gcs_falso import BucketFalso
+
+DATOS = b"PK" + bytes(range(256)) * 40
+
+
+class _SoloLectura(io.RawIOBase):
+    """Stream que no se puede rebobinar (p.ej. el body de la request)."""
+
+    def __init__(self, datos):
+        self._datos = io.BytesIO(datos)
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        leido = self._datos.read(len(destino))
+        destino[:len(leido)] = leido
+        return len(leido)
+
+
+@override_settings(GCS_SUBIDA_CHUNK_BYTES=300 * 1024)
+class SubidaGCSTests(TestCase):
+
+    def setUp(self):
+        self.bucket = BucketFalso()
+        parches = [
+            mock.patch.object(subidas_gcs, "obtener_bucket", return_value=self.bucket),
+            mock.patch.object(subidas_gcs, "marcar_existencia"),
+            mock.patch.object(subidas_gcs, "blobs_existentes",
+                              side_effect=lambda nombres: set(nombres) & set(self.bucket.objetos)),
+        ]
+        self.marcar_existencia = parches[1].start()
+        for parche in (parches[0], parches[2]):
+            parche.start()
+        for parche in parches:
+            self.addCleanup(parche.stop)
+
+    def test_consumir_una_pasada_sin_subir(self):
+        archivo = SimpleUploadedFile("a.docx", DATOS)
+        with SubidaGCS("P/a.docx") as subida:
+            subida.consumir(archivo)
+
+            self.assertIs(subida.fuente, archivo)
+            self.assertEqual(subida.sha256, hashlib.sha256(DATOS).hexdigest())
+            self.assertEqual(subida.tamano, len(DATOS))
+            self.assertEqual(subida.fuente.tell(), 0)
+        self.assertEqual(self.bucket.subidas, [])
+        self.assertFalse(ArchivoSubidoGCS.objects.exists())
+
+    def test_stream_sin_seek_queda_en_un_buffer(self):
+        with SubidaGCS("P/a.docx") as subida:
+            subida.consumir(_SoloLectura(DATOS))
+            self.assertEqual(subida.fuente.read(), DATOS)
+            subida.confirmar()
+        self.assertEqual(self.bucket.objetos["P/a.docx"], DATOS)
+
+    def test_confirmar_sube_y_registra(self):
+        with SubidaGCS(content_type="application/pdf") as subida:
+            subida.consumir(SimpleUploadedFile("a.docx", DATOS))
+            blob = subida.confirmar("P/a.docx")
+
+        crc = base64.b64encode(google_crc32c.Checksum(DATOS).digest()).decode()
+        self.assertEqual(self.bucket.objetos["P/a.docx"], DATOS)
+        self.assertEqual(self.bucket.subidas, [{
+            "nombre": "P/a.docx", "chunk_size": 256 * 1024, "tamano": len(DATOS),
+            "content_type": "application/pdf", "checksum": "crc32c",
+        }])
+        self.assertEqual((subida.crc32c, subida.confirmada), (crc, True))
+        self.assertEqual(subida.fuente.tell(), 0)
+        self.marcar_existencia.assert_called_once_with("P/a.docx")
+
+        registro = ArchivoSubidoGCS.objects.get(blob_name="P/a.docx")
+        self.assertEqual(registro.sha256, subida.sha256)
+        self.assertEqual((registro.crc32c, registro.generacion), (crc, blob.generation))
+        self.assertEqual(duplicados(subida.sha256), ["P/a.docx"])
+
+    def test_sin_sobrescribir_falla_si_ya_existe(self):
+        self.bucket.objetos["P/a.docx"] = b"anterior"
+        with SubidaGCS("P/a.docx", sobrescribir=False) as subida:
+            subida.consumir(SimpleUploadedFile("a.docx", DATOS))
+            with self.assertRaises(PreconditionFailed):
+                subida.confirmar()
+
+        self.assertEqual(self.bucket.objetos["P/a.docx"], b"anterior")
+        self.assertFalse(subida.confirmada)
+        self.assertFalse(ArchivoSubidoGCS.objects.exists())
+
+    def test_crc_distinto(self):
+        self.bucket.corromper.add("P/a.docx")
+        with SubidaGCS("P/a.docx") as subida:
+            subida.consumir(SimpleUploadedFile("a.docx", DATOS))
+            with self.assertRaises(ErrorSubida):
+                subida.confirmar()
+        self.assertNotIn("P/a.docx", self.bucket.objetos)
+
+    def test_confirmar_mal_usado(self):
+        with self.assertRaises(ValueError):
+            SubidaGCS("P/a.docx").confirmar()
+        subida = SubidaGCS("P/a.docx").consumir(SimpleUploadedFile("a.docx", DATOS))
+        with self.assertRaises(ValueError):
+            subida.confirmar("P/otro.docx")
+        with self.assertRaises(ValueError):
+            SubidaGCS().consumir(SimpleUploadedFile("a.docx", DATOS)).confirmar()
+
+    def test_duplicados_solo_los_que_siguen_en_el_bucket(self):
+        for nombre in ("P/a.docx", "P/b.docx"):
+            with SubidaGCS(nombre) as subida:
+                subida.consumir(SimpleUploadedFile("a.docx", DATOS))
+                subida.confirmar()
+        del self.bucket.objetos["P/b.docx"]
+
+        self.assertEqual(duplicados(hashlib.sha256(DATOS).hexdigest()), ["P/a.docx"])
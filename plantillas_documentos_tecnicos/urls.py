@@ -27,6 +27,9 @@ urlpatterns = [
     path("descargar/<path:path>/", views.descargar_gcs, name="descargar_gcs"),
 
     path("version/<int:version_id>/eliminar/", views.eliminar_version, name="eliminar_version"),
+    path("version/<int:version_id>/estructura/", views.estructura_version_json, name="estructura_version_json"),
+    path("version/<int:version_id>/diff/<int:version_anterior_id>/", views.diff_versiones, name="diff_versiones"),
     path("ajax/detectar-controles/", views.detectar_controles_ajax, name="ajax_detectar_controles"),
+    path("ajax/cache-estructuras/", views.estadisticas_cache_estructuras, name="estadisticas_cache_estructuras"),
 
 ]
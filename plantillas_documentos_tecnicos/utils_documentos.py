@@ -3,7 +3,10 @@
 from datetime import timedelta
 import urllib.parse
 from django.db import connection
-import json
+from plantillas_documentos_tecnicos.formato_estructura import cargar_estructura_version
+from plantillas_documentos_tecnicos.operaciones_gcs import copiar_blob
+
+
 def obtener_plantilla_usada(requerimiento_id):
     """
     Devuelve la versión de plantilla realmente usada por el RQ.
@@ -121,23 +124,11 @@ def obtener_estructura_plantilla_usada(requerimiento_id):
 
     # Obtener estructura JSON asociada a esa versión
     with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT estructura_json
-            FROM plantilla_estructura_version
-            WHERE version_id = %s
-            LIMIT 1
-        """, [version_id])
+        estructura_json = cargar_estructura_version(cursor, version_id)
 
-        row = cursor.fetchone()
-
-    if not row:
+    if estructura_json is None:
         raise ValueError(f"No existe estructura registrada para version_id={version_id}")
 
-    estructura_json = row[0]
-
-    if isinstance(estructura_json, str):
-        estructura_json = json.loads(estructura_json)
-
     return estructura_json, version_id
 
 
@@ -239,19 +230,60 @@ def insertar_documento_generado(
 # CREAR VERSION INICIAL v0.0.1 DEL REQUERIMIENTO
 # ============================================================
 
+def plantillas_vigentes(cursor, tipo_documento_ids, memo=None) -> dict:
+    """
+    {tipo_documento_id: (version_actual_id, gcs_path, formato_id)} de
+    cada tipo, en UNA consulta; None para los tipos sin plantilla.
+
+    memo: dict que vive lo que dura la request (p.ej. el loop de
+    crear_proyecto). Solo se consultan los tipos que no están en él y el
+    resultado queda guardado ahí.
+    """
+    if memo is None:
+        memo = {}
+
+    ids = {int(t) for t in tipo_documento_ids}
+    faltan = [t for t in ids if t not in memo]
+    if faltan:
+        cursor.execute(
+            """
+            SELECT
+                T.id,
+                P.version_actual_id,
+                V.gcs_path,
+                T.formato_id
+            FROM tipo_documentos_tecnicos T
+            JOIN plantilla_tipo_doc P
+              ON P.tipo_documento_id = T.id
+            JOIN plantilla_tipo_doc_versiones V
+              ON V.id = P.version_actual_id
+            WHERE T.id = ANY(%s);
+            """,
+            [faltan],
+        )
+        encontrados = {r[0]: tuple(r[1:]) for r in cursor.fetchall()}
+        for t in faltan:
+            memo[t] = encontrados.get(t)
+
+    return {t: memo[t] for t in ids}
+
+
 def inicializar_version_inicial(
     cursor,
     bucket,
     requerimiento_id: int,
     ruta_plantilla: str,
     codigo_documento: str,
+    plantillas=None,
 ):
     """
     Crea la versión inicial v0.0.1 para un RQ dado,
     copiando la última plantilla disponible del tipo de documento.
 
     - Obtiene proyecto, tipo_documento, formato y plantilla actual
-    - Copia la plantilla a:
+      (plantillas: memo de plantillas_vigentes compartido por los RQ de
+      una misma request)
+    - Copia la plantilla a (rewrite en GCS, sin descargarla):
         {ruta_plantilla}/"v0.0.1 - {codigo_documento}.docx"
     - Inserta en version_documento_tecnico
     - Inserta en documentos_generados
@@ -259,49 +291,37 @@ def inicializar_version_inicial(
     Devuelve:
         version_id (id en version_documento_tecnico)
     """
-
     # -----------------------------------------------------------
     # 1) Obtener datos del requerimiento + tipo_doc + plantilla
     # -----------------------------------------------------------
     cursor.execute(
         """
-        SELECT
-            R.proyecto_id,
-            R.tipo_documento_id,
-            T.formato_id,
-            P.version_actual_id,
-            V.gcs_path
+        SELECT R.proyecto_id, R.tipo_documento_id
         FROM requerimiento_documento_tecnico R
-        JOIN tipo_documentos_tecnicos T
-          ON R.tipo_documento_id = T.id
-        JOIN plantilla_tipo_doc P
-          ON P.tipo_documento_id = T.id
-        JOIN plantilla_tipo_doc_versiones V
-          ON V.id = P.version_actual_id
         WHERE R.id = %s
         LIMIT 1;
         """,
         [requerimiento_id],
     )
     row = cursor.fetchone()
-    if not row:
+    plantilla = None
+    if row:
+        proyecto_id, tipo_documento_id = row
+        plantilla = plantillas_vigentes(cursor, [tipo_documento_id], plantillas)[tipo_documento_id]
+
+    if not plantilla:
         raise Exception(
             "⚠ No se pudo obtener datos de RQ + tipo_documento + plantilla."
         )
 
-    proyecto_id, tipo_documento_id, formato_id, plantilla_version_id, gcs_path = row
+    plantilla_version_id, gcs_path, formato_id = plantilla
 
     if not plantilla_version_id or not gcs_path:
         raise Exception("⚠ No hay versión_actual de plantilla configurada.")
 
     # -----------------------------------------------------------
-    # 2) Descargar plantilla base
-    # -----------------------------------------------------------
-    blob_origen = bucket.blob(extract_blob_name_from_gcs_path(gcs_path))
-    contenido = blob_origen.download_as_bytes()
-
-    # -----------------------------------------------------------
-    # 3) Subir a carpeta del requerimiento (Plantilla/)
+    # 2-3) Copiar plantilla base a la carpeta del requerimiento
+    #      (Plantilla/) del lado del servidor
     # -----------------------------------------------------------
     if not ruta_plantilla.endswith("/"):
         ruta_plantilla += "/"
@@ -309,12 +329,13 @@ def inicializar_version_inicial(
     nombre_final = f"v0.0.1 - {codigo_documento}.docx"
     blob_destino_name = f"{ruta_plantilla}{nombre_final}"
 
-    blob_destino = bucket.blob(blob_destino_name)
-    blob_destino.upload_from_string(
-        contenido,
+    blob_destino = copiar_blob(
+        extract_blob_name_from_gcs_path(gcs_path),
+        blob_destino_name,
         content_type=(
             "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
         ),
+        bucket=bucket,
     )
 
     # -----------------------------------------------------------
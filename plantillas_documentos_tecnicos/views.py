@@ -1,29 +1,56 @@
 # plantillas_documentos_tecnicos/views.py
 
-from django.http import HttpResponse, JsonResponse, Http404
+from django.http import JsonResponse, Http404
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect
-from django.db import connection
+from django.db import DatabaseError, connection
 from django.contrib import messages
-from django.conf import settings
-
-from psycopg.types.json import Json
 
+from plantillas_documentos_tecnicos.formato_estructura import (
+    cargar_estructura_version,
+    cargar_manifiesto_version,
+    cargar_resumen_version,
+    guardar_estructura_version,
+)
+from plantillas_documentos_tecnicos.leer_estructura_plantilla_word import (
+    claves_seccion,
+    digest_firma,
+)
+from plantillas_documentos_tecnicos.cliente_gcs import obtener_bucket
+from plantillas_documentos_tecnicos.descargas_gcs import respuesta_descarga
+from plantillas_documentos_tecnicos.existencia_gcs import (
+    blobs_existentes,
+    marcar_existencia,
+)
+from plantillas_documentos_tecnicos.operaciones_gcs import eliminar_objetos, mover_prefijo
+from plantillas_documentos_tecnicos.diff_estructuras import (
+    arbol_estructura,
+    diff_excels,
+    diff_tablas_word,
+)
+from plantillas_documentos_tecnicos.planes_validacion import invalidar_plan
+from plantillas_documentos_tecnicos.diffs_versiones import (
+    borrar_diffs_version,
+    calcular_diff_versiones,
+    guardar_diff_versiones,
+    obtener_diff_versiones,
+)
+
+import logging
 import urllib.parse
 import re
-import os
-import tempfile
 from zipfile import ZipFile
 from datetime import timedelta
 import json
 
-from google.cloud import storage
 from unidecode import unidecode
 from lxml import etree
 
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 
+logger = logging.getLogger(__name__)
+
 
 # =============================================================================
 # UTILIDADES BÁSICAS
@@ -51,20 +78,17 @@ def clean(texto):
 
 def gcs_exists(path: str) -> bool:
     """
-    Verifica existencia de un blob en GCS.
+    Verifica existencia de un blob en GCS (con la cache de existencia_gcs;
+    para varias rutas usar blobs_existentes).
     """
-    client = storage.Client.from_service_account_json(settings.GCP_SERVICE_ACCOUNT_JSON)
-    bucket = client.bucket(settings.GCP_BUCKET_NAME)
-    blob = bucket.blob(path)
-    return blob.exists()
+    return path in blobs_existentes([path])
 
 
 def generar_url_previa(blob_path: str) -> str | None:
     """
     Genera URL temporal firmada (3 horas) para visualizar/descargar el archivo.
     """
-    client = storage.Client.from_service_account_json(settings.GCP_SERVICE_ACCOUNT_JSON)
-    bucket = client.bucket(settings.GCP_BUCKET_NAME)
+    bucket = obtener_bucket()
     blob = bucket.blob(blob_path)
 
     try:
@@ -88,18 +112,11 @@ def office_or_download_url(preview_url: str) -> str:
 
 def mover_carpeta_gcs(old_prefix: str, new_prefix: str) -> bool:
     """
-    Mueve (copia + borra) todos los blobs cuyo nombre parte con old_prefix a new_prefix.
+    Mueve todos los blobs cuyo nombre parte con old_prefix a new_prefix
+    (rewrite en el servidor, en paralelo, con checkpoint: si se corta, la
+    misma llamada lo retoma). Ver operaciones_gcs.mover_prefijo.
     """
-    client = storage.Client.from_service_account_json(settings.GCP_SERVICE_ACCOUNT_JSON)
-    bucket = client.bucket(settings.GCP_BUCKET_NAME)
-
-    blobs = list(bucket.list_blobs(prefix=old_prefix))
-    for b in blobs:
-        old_name = b.name
-        new_name = old_name.replace(old_prefix, new_prefix, 1)
-        bucket.copy_blob(b, bucket, new_name)
-        b.delete()
-
+    mover_prefijo(old_prefix, new_prefix)
     return True
 
 
@@ -107,16 +124,21 @@ def mover_carpeta_gcs(old_prefix: str, new_prefix: str) -> bool:
 # UTILIDADES DE ESTADÍSTICAS / ESTRUCTURA
 # =============================================================================
 
-def calcular_stats_versiones(versiones):
+def calcular_stats_versiones(versiones, existentes=None):
     """
     versiones: lista de dicts {id, gcs_path, version, creado_en}
+    existentes: set de rutas que existen en GCS (blobs_existentes), si ya
+    se consultó; si no, se consulta aquí en un solo lote.
     """
     total = len(versiones)
     disponibles = 0
     rotas = 0
 
+    if existentes is None:
+        existentes = blobs_existentes(v["gcs_path"] for v in versiones)
+
     for v in versiones:
-        if gcs_exists(v["gcs_path"]):
+        if v["gcs_path"] in existentes:
             disponibles += 1
         else:
             rotas += 1
@@ -172,7 +194,26 @@ def evaluar_calidad_estructura(estructura: dict | None) -> str:
     return "baja"
 
 
-def comparar_estructuras(estructura_actual, estructura_anterior):
+def _digests_guardados(estructura):
+    if isinstance(estructura, dict) and isinstance(estructura.get("digests"), dict):
+        return estructura["digests"]
+    return None
+
+
+def sin_cambios_estructurales(digests_a, digests_b):
+    """True si los digests (de resumen_json) dicen que no hay nada que comparar."""
+    if not digests_a or not digests_b:
+        return False
+    if not digests_a.get("secciones") or not digests_b.get("secciones"):
+        return False
+    return (
+        digests_a.get("firma") == digests_b.get("firma")
+        and digests_a["secciones"] == digests_b["secciones"]
+    )
+
+
+def comparar_estructuras(estructura_actual, estructura_anterior,
+                         digests_actual=None, digests_anterior=None):
     """
     Compara estructuras JSON profundas:
     - controles
@@ -181,11 +222,18 @@ def comparar_estructuras(estructura_actual, estructura_anterior):
     - imagenes
     - firma estructural
 
+    digests_actual / digests_anterior: digests precalculados de cada
+    versión (cargar_digests_version, con su "arbol"). Las secciones con el
+    mismo digest no se recorren; en tablas y excels se baja por el árbol
+    de hashes (diff_estructuras) solo donde difiere.
+
     Devuelve una estructura ALINEADA con el template:
       stats_diferencias = {
         "controles": {"nuevos": [...], "eliminados": [...]},
-        "tablas_word": {"nuevas": [...], "eliminadas": [...]},
-        "excels": {"nuevos": [...], "eliminados": [...]},
+        "tablas_word": {"nuevas": [...], "eliminadas": [...],
+                        "modificadas": [diff por fila / columna]},
+        "excels": {"nuevos": [...], "eliminados": [...],
+                   "modificados": [{"excel", "nuevas", "eliminadas", "modificadas"}]},
         "imagenes": {"nuevas": [...], "eliminadas": [...]},
         "signature_cambios": True/False,
       }
@@ -207,122 +255,62 @@ def comparar_estructuras(estructura_actual, estructura_anterior):
     ea = normalize(estructura_actual)
     eb = normalize(estructura_anterior)
 
-    # ===================================================
-    # FUNCIONES AUXILIARES SEGURO-ROBUSTAS
-    # ===================================================
-
-    def safe_list(value):
-        """Siempre devuelve lista."""
-        if isinstance(value, list):
-            return value
-        return []
-
-    def hash_dict(d):
-        """Convierte un dict → string hash estable."""
-        if not isinstance(d, dict):
-            return None
-        try:
-            return json.dumps(d, sort_keys=True)
-        except Exception:
-            return str(d)
-
-    # ---------- CONTROLES ----------
-
-    def get_aliases(e):
-        """Extrae alias/tag de forma resiliente."""
-        if not isinstance(e, dict):
-            return []
-        controles = e.get("controles", [])
-        if isinstance(controles, str):
-            return []
-        if not isinstance(controles, list):
-            return []
-
-        out = []
-        for item in controles:
-            if isinstance(item, dict):
-                alias = item.get("alias") or item.get("tag")
-                if alias:
-                    out.append(alias)
-            elif isinstance(item, str):
-                if item.strip():
-                    out.append(item.strip())
-        return out
-
-    a_controles = set(get_aliases(ea))
-    b_controles = set(get_aliases(eb))
-
-    # ---------- TABLAS WORD ----------
-    def key_tabla_word(t):
-        """Hash para tabla_word (dict)."""
-        return hash_dict(t)
-
-    a_tablas = {
-        key_tabla_word(t) for t in safe_list(ea.get("tablas_word"))
-        if key_tabla_word(t)
-    }
-    b_tablas = {
-        key_tabla_word(t) for t in safe_list(eb.get("tablas_word"))
-        if key_tabla_word(t)
-    }
-
-    # ---------- EXCELS ----------
-    def key_excel(e):
-        return hash_dict(e)
-
-    a_excels = {
-        key_excel(x) for x in safe_list(ea.get("excels"))
-        if key_excel(x)
-    }
-    b_excels = {
-        key_excel(x) for x in safe_list(eb.get("excels"))
-        if key_excel(x)
-    }
-
-    # ---------- IMÁGENES ----------
-    def key_imagen(img):
-        return hash_dict(img)
+    da = digests_actual or _digests_guardados(ea)
+    db = digests_anterior or _digests_guardados(eb)
+    secciones_a = (da or {}).get("secciones") or {}
+    secciones_b = (db or {}).get("secciones") or {}
+
+    # ---------- POR SECCIÓN ----------
+    def igual(seccion):
+        digest = secciones_a.get(seccion)
+        return digest is not None and digest == secciones_b.get(seccion)
+
+    def diferencia(seccion):
+        """(nuevas, eliminadas) de la sección; vacío si el digest coincide."""
+        if igual(seccion):
+            return [], []
+        a = claves_seccion(ea, seccion)
+        b = claves_seccion(eb, seccion)
+        return sorted(a - b), sorted(b - a)
+
+    controles_n, controles_e = diferencia("controles")
+    imgs_n, imgs_e = diferencia("imagenes")
+
+    # ---------- TABLAS / EXCELS (árbol de hashes) ----------
+    arbol_a = arbol_b = None
+    if not (igual("tablas_word") and igual("excels")):
+        arbol_a = (da or {}).get("arbol") or arbol_estructura(ea)
+        arbol_b = (db or {}).get("arbol") or arbol_estructura(eb)
+
+    if igual("tablas_word"):
+        tablas = {"nuevas": [], "eliminadas": [], "modificadas": []}
+    else:
+        tablas = diff_tablas_word(ea, eb, arbol_a, arbol_b)
 
-    a_imgs = {
-        key_imagen(i) for i in safe_list(ea.get("imagenes"))
-        if key_imagen(i)
-    }
-    b_imgs = {
-        key_imagen(i) for i in safe_list(eb.get("imagenes"))
-        if key_imagen(i)
-    }
+    if igual("excels"):
+        excels = {"nuevos": [], "eliminados": [], "modificados": []}
+    else:
+        excels = diff_excels(ea, eb, arbol_a, arbol_b)
 
     # ---------- FIRMA ESTRUCTURAL ----------
-    from plantillas_documentos_tecnicos.leer_estructura_plantilla_word import (
-        extract_structural_signature
-    )
-
-    sig_a = extract_structural_signature(ea)
-    sig_b = extract_structural_signature(eb)
-
-    firma_cambiada = (
-        json.dumps(sig_a, sort_keys=True) != json.dumps(sig_b, sort_keys=True)
-    )
+    if da and db and da.get("firma") and db.get("firma"):
+        firma_cambiada = da["firma"] != db["firma"]
+    else:
+        firma_cambiada = digest_firma(ea) != digest_firma(eb)
 
     # ===================================================
     # RESULTADO FINAL ALINEADO CON EL TEMPLATE
     # ===================================================
     return {
         "controles": {
-            "nuevos": sorted(a_controles - b_controles),
-            "eliminados": sorted(b_controles - a_controles),
-        },
-        "tablas_word": {
-            "nuevas": sorted(a_tablas - b_tablas),
-            "eliminadas": sorted(b_tablas - a_tablas),
-        },
-        "excels": {
-            "nuevos": sorted(a_excels - b_excels),
-            "eliminados": sorted(b_excels - a_excels),
+            "nuevos": controles_n,
+            "eliminados": controles_e,
         },
+        "tablas_word": tablas,
+        "excels": excels,
         "imagenes": {
-            "nuevas": sorted(a_imgs - b_imgs),
-            "eliminadas": sorted(b_imgs - a_imgs),
+            "nuevas": imgs_n,
+            "eliminadas": imgs_e,
         },
         "signature_cambios": firma_cambiada,
     }
@@ -373,18 +361,9 @@ def detectar_controles_ajax(request):
     if not file.name.lower().endswith(".docx"):
         return JsonResponse({"ok": False, "error": "Formato inválido"})
 
-    # Guardar temporal
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as tmp:
-        for chunk in file.chunks():
-            tmp.write(chunk)
-        local_path = tmp.name
-
-    try:
-        from plantillas_documentos_tecnicos.leer_estructura_plantilla_word import generar_estructura
-        estructura = generar_estructura(local_path)
-    finally:
-        if os.path.exists(local_path):
-            os.remove(local_path)
+    # Se lee directo desde el archivo subido (sin temporal en disco)
+    from plantillas_documentos_tecnicos.cache_estructuras import generar_estructura_cacheada
+    estructura = generar_estructura_cacheada(file)
 
     controles_alias = extract_aliases_from_estructura(estructura)
 
@@ -395,6 +374,52 @@ def detectar_controles_ajax(request):
     })
 
 
+@login_required
+def estadisticas_cache_estructuras(request):
+    """
+    Hit/miss de la cache de estructuras, estado del pool de extracción
+    (cola, procesos, rechazos, timeouts), planes de validación y cache
+    de existencia en GCS del proceso actual.
+    """
+    from plantillas_documentos_tecnicos.cache_estructuras import estadisticas_cache
+    from plantillas_documentos_tecnicos.ejecutor_extraccion import metricas_ejecutor
+    from plantillas_documentos_tecnicos.existencia_gcs import estadisticas_existencia
+    from plantillas_documentos_tecnicos.planes_validacion import estadisticas_planes
+
+    datos = estadisticas_cache()
+    datos["ejecutor"] = metricas_ejecutor()
+    datos["planes_validacion"] = estadisticas_planes()
+    datos["existencia_gcs"] = estadisticas_existencia()
+    return JsonResponse(datos)
+
+
+@login_required
+def diff_versiones(request, version_id, version_anterior_id):
+    """
+    Diff estructural entre dos versiones de la misma plantilla (guardado;
+    si el par no se había pedido antes se calcula y queda guardado).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT COUNT(DISTINCT plantilla_id), COUNT(*)
+            FROM plantilla_tipo_doc_versiones
+            WHERE id IN (%s, %s)
+        """, [version_id, version_anterior_id])
+        plantillas, versiones = cursor.fetchone()
+
+    if versiones != 2 or plantillas != 1:
+        return JsonResponse(
+            {"error": "Las versiones no existen o son de plantillas distintas."},
+            status=404,
+        )
+
+    return JsonResponse({
+        "version_id": version_id,
+        "version_anterior_id": version_anterior_id,
+        "diferencias": obtener_diff_versiones(version_id, version_anterior_id),
+    })
+
+
 # =============================================================================
 # LISTADO GENERAL DE TIPOS
 # =============================================================================
@@ -467,9 +492,9 @@ def lista_plantillas(request):
         """)
         paths = [r[0] for r in cursor.fetchall()]
 
-        for ruta in paths:
-            if not gcs_exists(ruta):
-                rotas += 1
+    # Un solo listado del bucket para todas las versiones
+    existentes = blobs_existentes(paths)
+    rotas = sum(1 for ruta in paths if ruta not in existentes)
 
     stats_globales = {
         "total_tipos": total_tipos,
@@ -623,26 +648,24 @@ def tipo_detalle(request, tipo_id):
     archivo_existe = False
     preview_url = None
     estructura_actual = {}
-    estructura_anterior = {}
+
+    # Existencia en GCS de la versión actual y de todo el historial, en un lote
+    existentes = blobs_existentes(
+        ([plantilla["gcs_path"]] if plantilla else [])
+        + [v["gcs_path"] for v in versiones]
+    )
 
     if plantilla:
         ruta = plantilla["gcs_path"]
 
-        if gcs_exists(ruta):
+        if ruta in existentes:
             archivo_existe = True
             preview_url = generar_url_previa(ruta)
 
-            # JSON estructural asociado a esta versión
+            # Resumen estructural (conteos / digests); el JSON completo lo
+            # pide el visor a estructura_version_json
             with connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT estructura_json
-                    FROM plantilla_estructura_version
-                    WHERE version_id = %s
-                    ORDER BY id DESC LIMIT 1
-                """, [plantilla["id"]])
-                row = cursor.fetchone()
-
-            estructura_actual = row[0] if row else {}
+                estructura_actual = cargar_resumen_version(cursor, plantilla["id"]) or {}
         else:
             # No existe el archivo en GCS
             plantilla = None
@@ -650,38 +673,19 @@ def tipo_detalle(request, tipo_id):
     office_url = office_or_download_url(preview_url) if preview_url else None
 
     # ============================================================
-    # 3) Obtener estructura anterior (para comparar)
+    # 3-4) Diferencias con la versión anterior (guardadas al subir;
+    #      las de versiones antiguas se calculan la primera vez)
     # ============================================================
-    if len(versiones) >= 2:
+    stats_diferencias = None
+    if plantilla and len(versiones) >= 2:
         penult = versiones[1]
-
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT estructura_json
-                FROM plantilla_estructura_version
-                WHERE version_id = %s
-                ORDER BY id DESC LIMIT 1
-            """, [penult["id"]])
-            row_prev = cursor.fetchone()
-
-        estructura_anterior = row_prev[0] if row_prev else {}
-
-    else:
-        estructura_anterior = {}
-
-    # ============================================================
-    # 4) Comparación profunda de estructura (NUEVO)
-    # ============================================================
-    stats_diferencias = comparar_estructuras(
-        estructura_actual,
-        estructura_anterior
-    )
+        stats_diferencias = obtener_diff_versiones(plantilla["id"], penult["id"])
 
     # ============================================================
     # 5) Estadísticas generales de versiones
     # ============================================================
     stats_versiones = (
-        calcular_stats_versiones(versiones)
+        calcular_stats_versiones(versiones, existentes)
         if versiones else {"total_versiones": 0, "versiones_ok": 0, "versiones_rotas": 0}
     )
 
@@ -698,7 +702,7 @@ def tipo_detalle(request, tipo_id):
         data = v.copy()
         gp = v["gcs_path"]
 
-        if gp and gcs_exists(gp):
+        if gp and gp in existentes:
             prev = generar_url_previa(gp)
             data["office_url"] = office_or_download_url(prev) if prev else None
         else:
@@ -726,9 +730,8 @@ def tipo_detalle(request, tipo_id):
         "preview_url": preview_url,
         "office_url": office_url,
 
-        # Estructura profunda
-        "estructura_json": estructura_actual,
-        "estructura_anterior": estructura_anterior,
+        # Estructura profunda (el visor la carga aparte)
+        "estructura_resumen": estructura_actual,
 
         # Comparación avanzada
         "stats_diferencias": stats_diferencias,
@@ -850,11 +853,9 @@ def versionar_plantilla_json(version_actual, estructura_antes, estructura_despue
     Versionamiento real basado en diferencias profundas del JSON estructural.
 
     Usa extract_structural_signature() definido en leer_estructura_plantilla_word.py
-    para comparar solo la “forma” de la plantilla.
+    para comparar solo la “forma” de la plantilla (digest precalculado en
+    el resumen de la versión, si lo hay).
     """
-    from plantillas_documentos_tecnicos.leer_estructura_plantilla_word import (
-        extract_structural_signature
-    )
 
     # Primera versión
     if not version_actual:
@@ -865,10 +866,10 @@ def versionar_plantilla_json(version_actual, estructura_antes, estructura_despue
     except Exception:
         major, minor = 1, 0
 
-    sig1 = extract_structural_signature(estructura_antes or {})
-    sig2 = extract_structural_signature(estructura_despues or {})
+    sig1 = digest_firma(estructura_antes or {})
+    sig2 = digest_firma(estructura_despues or {})
 
-    if json.dumps(sig1, sort_keys=True) != json.dumps(sig2, sort_keys=True):
+    if sig1 != sig2:
         # Cambios estructurales → major
         return f"{major + 1}.0"
 
@@ -905,8 +906,7 @@ def subir_plantilla(request, tipo_id):
 
         base_path = f"Plantillas/Documentos_Tecnicos/{categoria_clean}/{tipo_clean}/"
 
-        client = storage.Client.from_service_account_json(settings.GCP_SERVICE_ACCOUNT_JSON)
-        bucket = client.bucket(settings.GCP_BUCKET_NAME)
+        bucket = obtener_bucket()
 
         # 2) Buscar maestro existente
         with connection.cursor() as cursor:
@@ -925,17 +925,16 @@ def subir_plantilla(request, tipo_id):
             version_anterior = anterior["version"]
             version_actual_id = anterior["version_id"]
 
-            # Obtener JSON estructural anterior (dict)
+            # Resumen estructural anterior (basta para la firma) y el
+            # manifiesto de parts. La estructura completa se carga solo si
+            # generar_estructura_incremental encuentra parts reutilizables
             with connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT estructura_json
-                    FROM plantilla_estructura_version
-                    WHERE version_id = %s
-                    ORDER BY id DESC LIMIT 1
-                """, [version_actual_id])
-                row = cursor.fetchone()
-
-            estructura_antes = row[0] if row else None
+                estructura_antes = cargar_resumen_version(cursor, version_actual_id)
+                manifiesto_antes = cargar_manifiesto_version(cursor, version_actual_id)
+
+            def estructura_previa(version_id=version_actual_id):
+                with connection.cursor() as cursor:
+                    return cargar_estructura_version(cursor, version_id)
         else:
             # Crear maestro si no existe
             with connection.cursor() as cursor:
@@ -946,18 +945,19 @@ def subir_plantilla(request, tipo_id):
                 """, [tipo_id])
                 plantilla_id = cursor.fetchone()[0]
 
-            version_anterior = None
+            version_anterior = version_actual_id = None
             estructura_antes = None
+            manifiesto_antes = estructura_previa = None
 
-        # 3) Guardar archivo local temporalmente
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as tmp:
-            for chunk in archivo.chunks():
-                tmp.write(chunk)
-            nuevo_local = tmp.name
-
-        # 4) Generar nueva estructura JSON (dict)
-        from plantillas_documentos_tecnicos.leer_estructura_plantilla_word import generar_estructura
-        estructura_despues = generar_estructura(nuevo_local)
+        # 3-4) Generar nueva estructura JSON (dict) desde el archivo subido
+        #      (queda rebobinado para subirlo a GCS). Solo se parsean los
+        #      parts que cambiaron respecto de la versión anterior.
+        from plantillas_documentos_tecnicos.leer_estructura_plantilla_word import (
+            generar_estructura_incremental
+        )
+        estructura_despues, manifiesto = generar_estructura_incremental(
+            archivo, estructura_previa, manifiesto_antes
+        )
 
         # 5) Calcular nueva versión (major/minor real)
         nueva_version = versionar_plantilla_json(
@@ -972,11 +972,9 @@ def subir_plantilla(request, tipo_id):
         filename = archivo.name
         blob_name = f"{version_folder}{filename}"
 
-        bucket.blob(blob_name).upload_from_filename(nuevo_local)
-
-        # Limpieza temp
-        if os.path.exists(nuevo_local):
-            os.remove(nuevo_local)
+        archivo.seek(0)
+        bucket.blob(blob_name).upload_from_file(archivo, rewind=True)
+        marcar_existencia(blob_name)
 
         # 6) Registrar nueva versión en BD (SIN COLUMNA controles)
         with connection.cursor() as cursor:
@@ -994,15 +992,26 @@ def subir_plantilla(request, tipo_id):
                 WHERE id = %s
             """, [new_version_id, plantilla_id])
 
-            # 7) Guardar JSON estructural profundo
-            cursor.execute("""
-                INSERT INTO plantilla_estructura_version
-                (version_id, estructura_json)
-                VALUES (%s, %s)
-            """, [
-                new_version_id,
-                Json(estructura_despues)   # dict → JSONB
-            ])
+            # 7) Guardar JSON estructural profundo (formato compacto + resumen)
+            guardar_estructura_version(
+                cursor, new_version_id, estructura_despues, manifiesto
+            )
+
+            # 8) Diff contra la versión reemplazada (tipo_detalle lo lee tal cual)
+            if version_anterior and version_actual_id:
+                try:
+                    guardar_diff_versiones(
+                        new_version_id,
+                        version_actual_id,
+                        calcular_diff_versiones(
+                            cursor, new_version_id, version_actual_id, estructura_despues
+                        ),
+                    )
+                except DatabaseError:
+                    # La versión ya quedó; el diff se calcula al abrir el detalle
+                    logger.exception(
+                        "No se pudo guardar el diff %s → %s", version_actual_id, new_version_id
+                    )
 
         messages.success(request, f"✔ Plantilla subida (versión {nueva_version}).")
         return redirect("plantillas:detalle_tipo", tipo_id=tipo_id)
@@ -1010,22 +1019,28 @@ def subir_plantilla(request, tipo_id):
     return render(request, "subir_plantilla.html", {"tipo": tipo})
 
 
+# =============================================================================
+# JSON ESTRUCTURAL COMPLETO DE UNA VERSIÓN (visor de tipo_detalle)
+# =============================================================================
+
+@login_required
+def estructura_version_json(request, version_id):
+    with connection.cursor() as cursor:
+        estructura = cargar_estructura_version(cursor, version_id)
+    if estructura is None:
+        raise Http404("Versión sin estructura registrada.")
+    return JsonResponse(estructura)
+
+
 # =============================================================================
 # DESCARGAR ARCHIVO DESDE GCS
 # =============================================================================
 
 @login_required
 def descargar_gcs(request, path):
-    client = storage.Client.from_service_account_json(settings.GCP_SERVICE_ACCOUNT_JSON)
-    bucket = client.bucket(settings.GCP_BUCKET_NAME)
-    blob = bucket.blob(path)
-
-    if not blob.exists():
+    response = respuesta_descarga(request, path, content_type="application/octet-stream")
+    if response is None:
         raise Http404("Archivo no encontrado.")
-
-    contenido = blob.download_as_bytes()
-    response = HttpResponse(contenido, content_type="application/octet-stream")
-    response['Content-Disposition'] = f'attachment; filename="{os.path.basename(path)}"'
     return response
 
 
@@ -1157,9 +1172,6 @@ def eliminar_version(request, version_id):
     version_folder = "/".join(gcs_path.split("/")[:-1]) + "/"
     base_folder = "/".join(version_folder.split("/")[:-2]) + "/"
 
-    client = storage.Client.from_service_account_json(settings.GCP_SERVICE_ACCOUNT_JSON)
-    bucket = client.bucket(settings.GCP_BUCKET_NAME)
-
     # Verificar si esta versión está en uso por documentos_generados
     with connection.cursor() as cursor:
         cursor.execute("""
@@ -1177,17 +1189,18 @@ def eliminar_version(request, version_id):
         )
         return redirect("plantillas:detalle_tipo", tipo_id=tipo_id)
 
-    # 1) Borrar archivos de la versión en GCS
-    for blob in list(bucket.list_blobs(prefix=version_folder)):
-        try:
-            blob.delete()
-        except Exception:
-            pass
+    # 1) Borrar archivos de la versión en GCS (en lotes)
+    try:
+        eliminar_objetos(prefijos=[version_folder])
+    except Exception:
+        pass
 
     with connection.cursor() as cursor:
 
         # 2) Borrar versión en BD
         cursor.execute("DELETE FROM plantilla_tipo_doc_versiones WHERE id = %s", [version_id])
+        borrar_diffs_version(version_id)
+        invalidar_plan(version_id)
 
         # 3) Consultar cuántas versiones quedan
         cursor.execute("""
@@ -1200,11 +1213,10 @@ def eliminar_version(request, version_id):
         # Si no queda ninguna versión, eliminar maestro + carpeta
         if quedan == 0:
 
-            for blob in list(bucket.list_blobs(prefix=base_folder)):
-                try:
-                    blob.delete()
-                except Exception:
-                    pass
+            try:
+                eliminar_objetos(prefijos=[base_folder])
+            except Exception:
+                pass
 
             cursor.execute("""
                 DELETE FROM plantilla_tipo_doc